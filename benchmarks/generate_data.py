@@ -0,0 +1,195 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# -------------------------------
+# Seeded synthetic generator for the six raw tables
+# -------------------------------
+# Named scales: rows per fact table (enrollments, activity, payments)
+SCALES = {
+    "50k": 50_000,
+    "1m": 1_000_000,
+    "10m": 10_000_000
+}
+
+# Dimension sizes relative to the fact row count
+DIMENSION_RATIOS = {
+    "students": 1.0,
+    "instructors": 0.02,
+    "courses": 0.1
+}
+
+CHUNK_ROWS = 1_000_000
+
+# USD per unit on the first day of fx_rates.csv; every later business day moves by a small random step
+FX_START_RATES = {
+    "EUR": 1.08,
+    "INR": 0.012
+}
+
+FIRST_NAMES = ["Mary", "Hiroshi", "Dario", "Olivier", "Aisha", "Liam", "Sofia", "Wei", "Priya", "Lucas",
+               "Fatima", "Noah", "Elena", "Kenji", "Amara", "Mateo", "Chloe", "Arjun", "Ingrid", "Omar"]
+LAST_NAMES = ["Ivanov", "Johansson", "Delgado", "Castillo", "Khan", "Smith", "Rossi", "Chen", "Patel", "Silva",
+              "Mensah", "Novak", "Garcia", "Tanaka", "Okafor", "Muller", "Dubois", "Singh", "Larsen", "Haddad"]
+COUNTRIES = ["India", "USA", "Germany", "Singapore", "UK", "France", "Brazil", "Japan", "Canada", "Australia",
+             "Spain", "Italy", "Mexico", "Nigeria", "Kenya", "China", "Sweden", "Netherlands", "UAE", "South Africa"]
+EXPERTISE = ["DevOps", "Data Science", "Web Development", "Cloud", "Machine Learning", "Cybersecurity",
+             "Mobile", "Databases", "UI/UX", "Networking", "Blockchain", "Game Development",
+             "Project Management", "Marketing", "Finance", "Design"]
+DIFFICULTY = ["Beginner", "Intermediate", "Advanced"]
+
+
+ID_PREFIXES = {
+    "students": "S",
+    "instructors": "I",
+    "courses": "C",
+    "enrollments": "E",
+    "activity": "A",
+    "payments": "P"
+}
+
+
+def format_ids(prefix, numbers, width):
+    return pd.Series(numbers).astype(str).str.zfill(width).radd(prefix)
+
+
+def random_dates(rng, count, start, end):
+    start_day = np.datetime64(start, "D")
+    span = (np.datetime64(end, "D") - start_day).astype(int)
+    return (start_day + rng.integers(0, span + 1, count)).astype(str)
+
+
+def random_names(rng, count):
+    first = np.array(FIRST_NAMES)[rng.integers(0, len(FIRST_NAMES), count)]
+    last = np.array(LAST_NAMES)[rng.integers(0, len(LAST_NAMES), count)]
+    return np.char.add(np.char.add(first, " "), last)
+
+
+def id_width(count):
+    # Zero-padded wide enough that IDs still sort correctly as text
+    return max(6, len(str(count)))
+
+
+def generate_chunk(table, rng, start, count, sizes):
+    ids = format_ids(ID_PREFIXES[table], np.arange(start + 1, start + count + 1), id_width(sizes[table]))
+
+    def pick(dimension):
+        # Foreign keys always point at rows that exist in the dimension
+        numbers = rng.integers(1, sizes[dimension] + 1, count)
+        return format_ids(ID_PREFIXES[dimension], numbers, id_width(sizes[dimension]))
+
+    if table == "students":
+        return pd.DataFrame({
+            "student_id": ids,
+            "name": random_names(rng, count),
+            "age": rng.integers(16, 66, count),
+            "gender": rng.choice(["M", "F", "O"], count),
+            "country": rng.choice(COUNTRIES, count),
+            "signup_date": random_dates(rng, count, "2020-01-01", "2024-12-31"),
+            "subscription_type": rng.choice(["Monthly", "Free", "Annual"], count)
+        })
+    if table == "instructors":
+        return pd.DataFrame({
+            "instructor_id": ids,
+            "name": random_names(rng, count),
+            "expertise_area": rng.choice(EXPERTISE, count),
+            "rating": rng.uniform(3.0, 5.0, count).round(2),
+            "join_date": random_dates(rng, count, "2020-01-01", "2024-12-31")
+        })
+    if table == "courses":
+        area = pd.Series(rng.choice(EXPERTISE, count))
+        level = pd.Series(rng.choice(DIFFICULTY, count))
+        return pd.DataFrame({
+            "course_id": ids,
+            "course_title": area + " " + level + " #" + ids,
+            "category": area,
+            "difficulty_level": level,
+            "duration_hours": rng.integers(2, 120, count),
+            "price": rng.uniform(10, 500, count).round(2),
+            "instructor_id": pick("instructors")
+        })
+    if table == "enrollments":
+        return pd.DataFrame({
+            "enrollment_id": ids,
+            "student_id": pick("students"),
+            "course_id": pick("courses"),
+            "enrollment_date": random_dates(rng, count, "2023-01-01", "2024-12-31"),
+            "status": rng.choice(["Active", "Completed", "Dropped"], count),
+            "progress_percent": rng.integers(0, 101, count)
+        })
+    if table == "activity":
+        return pd.DataFrame({
+            "activity_id": ids,
+            "student_id": pick("students"),
+            "course_id": pick("courses"),
+            "video_watched_min": rng.integers(1, 301, count),
+            "quiz_score": rng.integers(0, 101, count),
+            "assignment_score": rng.integers(0, 101, count),
+            "timestamp": random_dates(rng, count, "2024-01-01", "2024-12-31")
+        })
+    return pd.DataFrame({
+        "payment_id": ids,
+        "student_id": pick("students"),
+        "course_id": pick("courses"),
+        "amount": rng.uniform(10, 200, count).round(2),
+        "currency": rng.choice(["USD", "EUR", "INR"], count),
+        "payment_date": random_dates(rng, count, "2024-01-01", "2024-12-31"),
+        "status": rng.choice(["Pending", "Success", "Failed"], count)
+    })
+
+
+def generate_fx_rates(rng, start, end):
+    days = pd.bdate_range(start, end)
+    return pd.concat([
+        pd.DataFrame({
+            "currency": currency,
+            "rate_date": days.strftime("%Y-%m-%d"),
+            "usd_rate": (rate * np.exp(np.cumsum(rng.normal(0, 0.004, len(days))))).round(8)
+        })
+        for currency, rate in FX_START_RATES.items()
+    ], ignore_index=True)
+
+
+def table_sizes(fact_rows, courses=None):
+    sizes = {table: max(1, int(fact_rows * ratio)) for table, ratio in DIMENSION_RATIOS.items()}
+    if courses:
+        # A fixed catalogue: many facts per course and day, as in a real shop
+        sizes["courses"] = courses
+    sizes.update({"enrollments": fact_rows, "activity": fact_rows, "payments": fact_rows})
+    return sizes
+
+
+def generate(output_folder, fact_rows, seed=42, courses=None):
+    """Write <table>_raw.csv for all six tables, plus fx_rates.csv; returns {table: rows}."""
+    os.makedirs(output_folder, exist_ok=True)
+    sizes = table_sizes(fact_rows, courses)
+
+    for index, (table, total) in enumerate(sizes.items()):
+        # One seeded stream per table, so output is reproducible for a given seed and scale
+        rng = np.random.default_rng([seed, index])
+        path = os.path.join(output_folder, f"{table}_raw.csv")
+        for start in range(0, total, CHUNK_ROWS):
+            chunk = generate_chunk(table, rng, start, min(CHUNK_ROWS, total - start), sizes)
+            chunk.to_csv(path, mode="w" if start == 0 else "a", header=start == 0, index=False)
+        print(f"✅ {table}_raw.csv: {total} rows")
+
+    # Business days only: weekend payments convert at Friday's rate
+    rates = generate_fx_rates(np.random.default_rng([seed, len(sizes)]), "2023-01-01", "2024-12-31")
+    rates.to_csv(os.path.join(output_folder, "fx_rates.csv"), index=False)
+    print(f"✅ fx_rates.csv: {len(rates)} rows")
+
+    return sizes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic raw CSVs with consistent foreign keys")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="50k", help="rows per fact table")
+    parser.add_argument("--rows", type=int, help="explicit rows per fact table (overrides --scale)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--courses", type=int, help="fixed number of courses instead of 10%% of the fact rows")
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+    args = parser.parse_args()
+
+    generate(args.output, args.rows or SCALES[args.scale], seed=args.seed, courses=args.courses)
@@ -0,0 +1,140 @@
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BENCH_DIR, ".."))
+from benchmarks.generate_data import SCALES, generate
+from benchmarks.run_benchmark import RESULTS_DIR, reset_database
+
+# -------------------------------
+# Gold queries from the silver facts vs. from the daily rollups
+# -------------------------------
+# Every gold table with a rollup form is computed both ways on the same data: the results
+# must be identical and not empty, and the best of --repeat runs is compared.
+
+
+def select_of(sql):
+    # "DROP TABLE IF EXISTS gold.x; CREATE TABLE gold.x AS SELECT ...;" -> "SELECT ..."
+    return re.sub(r"^\s*DROP TABLE IF EXISTS \S+;\s*CREATE TABLE \S+ AS", "", sql).strip().rstrip(";")
+
+
+def query_pairs():
+    """{gold table: (SELECT from silver, SELECT from the rollups)}"""
+    from gold import etl as gold_etl
+    from gold import gold_table_build
+    from gold.etl import KeyScope
+
+    pairs = {}
+    for table in gold_table_build.GOLD_TABLES:
+        if table.name in gold_table_build.ROLLUP_SQL:
+            pairs[f"gold_table_build.{table.name}"] = (
+                select_of(table.sql), select_of(gold_table_build.ROLLUP_SQL[table.name])
+            )
+    for name, sql in gold_etl.ROLLUP_KEYED_SQL.items():
+        pairs[f"etl.{name}"] = (gold_etl.KEYED_GOLD_TABLES[name][1].format(scope=KeyScope()),
+                                sql.format(scope=KeyScope()))
+    pairs["etl.top5_courses_by_revenue"] = (gold_etl.TOP5_COURSES_SQL, gold_etl.TOP5_COURSES_FROM_ROLLUP_SQL)
+    return pairs
+
+
+def timed_rows(cur, sql, repeat):
+    best, rows = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cur.execute(sql)
+        rows = cur.fetchall()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rows
+
+
+def same_rows(left, right, ordered):
+    # LIMIT queries can break ties differently; only their ordered values must agree
+    if ordered:
+        return [row[-1] for row in left] == [row[-1] for row in right]
+    key = lambda row: tuple(str(value) for value in row)
+    return sorted(left, key=key) == sorted(right, key=key)
+
+
+def run_rollup_benchmark(repeat=3):
+    from db import connection, get_engine
+    from silver.rollups import ROLLUP_SCHEMA, ROLLUPS, ensure_rollups, rebuild_rollup
+
+    engine = get_engine()
+    ensure_rollups(engine)
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        rollup_rows = {name: rebuild_rollup(conn, name) for name in ROLLUPS}
+    rebuild_seconds = time.perf_counter() - start
+
+    results = []
+    with connection() as conn, conn.cursor() as cur:
+        sizes = {}
+        for name, rollup in ROLLUPS.items():
+            cur.execute(f"SELECT COUNT(*) FROM silver.{rollup.source}")
+            sizes[name] = cur.fetchone()[0]
+            print(f"   {ROLLUP_SCHEMA}.{name:<24} {rollup_rows[name]:>10} rows "
+                  f"(silver.{rollup.source}: {sizes[name]} rows)")
+        print(f"   ⏱️ full rollup rebuild {rebuild_seconds:.2f}s")
+
+        for name, (silver_sql, rollup_sql) in query_pairs().items():
+            silver_seconds, silver_rows = timed_rows(cur, silver_sql, repeat)
+            rollup_seconds, rollup_rows_ = timed_rows(cur, rollup_sql, repeat)
+            # Two empty results agree trivially, which proves nothing
+            identical = bool(silver_rows) and same_rows(silver_rows, rollup_rows_, "LIMIT" in silver_sql)
+            speedup = silver_seconds / rollup_seconds if rollup_seconds else None
+            results.append({"table": name, "rows": len(silver_rows), "silver_seconds": round(silver_seconds, 4),
+                            "rollup_seconds": round(rollup_seconds, 4),
+                            "speedup": round(speedup, 2) if speedup else None, "identical": identical})
+            print(f"{'✅' if identical else '❌'} {name:<44} {len(silver_rows):>7} rows silver {silver_seconds:>8.4f}s "
+                  f"rollups {rollup_seconds:>8.4f}s  x{speedup or 0:>6.2f}")
+
+    total_silver = sum(result["silver_seconds"] for result in results)
+    total_rollup = sum(result["rollup_seconds"] for result in results)
+    print(f"   ⏱️ all queries: silver {total_silver:.3f}s, rollups {total_rollup:.3f}s "
+          f"(x{total_silver / total_rollup if total_rollup else 0:.2f})")
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "repeat": repeat,
+        "fact_rows": sizes,
+        "rollup_rows": rollup_rows,
+        "rollup_rebuild_seconds": round(rebuild_seconds, 3),
+        "queries": results
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the gold queries on the silver facts vs. the daily rollups")
+    parser.add_argument("--scale", choices=sorted(SCALES), help="generate and load this many rows per fact table first")
+    parser.add_argument("--rows", type=int, help="explicit rows per fact table to load first (overrides --scale)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--courses", type=int, default=100,
+                        help="courses in the generated data; rollups shrink with the facts per course and day")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per query; the fastest is reported")
+    args = parser.parse_args()
+
+    fact_rows = args.rows or (SCALES[args.scale] if args.scale else None)
+    if fact_rows:
+        import etl
+
+        data_dir = os.path.join(BENCH_DIR, "data", f"{fact_rows}_{args.courses}_courses")
+        if not os.path.exists(os.path.join(data_dir, "payments_raw.csv")):
+            generate(data_dir, fact_rows, seed=args.seed, courses=args.courses)
+        reset_database()
+        etl.build_silver(full_refresh=True, csv_folder=data_dir)
+
+    result = run_rollup_benchmark(repeat=args.repeat)
+    if not all(query["identical"] for query in result["queries"]):
+        print("❌ Rollup results differ from the fact-table results, or are empty.")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    output = os.path.join(RESULTS_DIR, f"rollups_{stamp}.json")
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"✅ Results saved to {output}")
@@ -0,0 +1,196 @@
+import argparse
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import psycopg2
+import psycopg2.extensions
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BENCH_DIR, ".."))
+from benchmarks.generate_data import SCALES, generate, table_sizes
+from gold.etl import BACKENDS
+from run_metrics import run_events, run_log_path, start_run
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+STAGES = ["bronze", "silver", "gold"]
+
+# -------------------------------
+# DB round-trip counting (every psycopg2 connection, incl. SQLAlchemy's)
+# -------------------------------
+COUNTS = {"connects": 0, "statements": 0}
+_counts_lock = threading.Lock()
+
+
+def _count(name):
+    with _counts_lock:
+        COUNTS[name] += 1
+
+
+class CountingCursor(psycopg2.extensions.cursor):
+    def execute(self, query, vars=None):
+        _count("statements")
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        _count("statements")
+        return super().executemany(query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        _count("statements")
+        return super().copy_expert(sql, file, size)
+
+
+def install_counters():
+    original_connect = psycopg2.connect
+
+    def counting_connect(*args, **kwargs):
+        _count("connects")
+        kwargs.setdefault("cursor_factory", CountingCursor)
+        return original_connect(*args, **kwargs)
+
+    psycopg2.connect = counting_connect
+
+
+# -------------------------------
+# Stages
+# -------------------------------
+def reset_database():
+    # Benchmarks start from empty silver tables and no load state
+    import db
+    import etl
+    from silver.schema import SILVER_DDL, ensure_silver_tables
+    from watermarks import ensure_state_table, STATE_TABLE
+    from changed_keys import ensure_changed_keys_table, CHANGED_KEYS_TABLE
+    from load_cache import ensure_cache_table, CACHE_TABLE
+    from silver.rollups import ROLLUP_SCHEMA, ROLLUPS, ensure_rollups
+    from silver.surrogate_keys import clear_key_cache
+
+    engine = db.get_engine()
+    ensure_silver_tables(engine)
+    ensure_state_table(engine)
+    ensure_changed_keys_table(engine)
+    ensure_cache_table(engine)
+    ensure_rollups(engine)
+    tables = ", ".join([f"silver.{table}" for table in SILVER_DDL] + [f"{ROLLUP_SCHEMA}.{name}" for name in ROLLUPS])
+    etl.run_sql(f"TRUNCATE {tables}, {STATE_TABLE}, {CHANGED_KEYS_TABLE}, {CACHE_TABLE} RESTART IDENTITY;")
+    # Keys cached by this process were just truncated away
+    clear_key_cache()
+    # Close pooled connections before the stage processes start
+    db.dispose()
+
+
+def stage_rows_out(stage):
+    # Rows the stage wrote, from its run_metrics events; the gold table builds record theirs
+    # per table, not on the stage event
+    events = run_events()
+    stage_events = [event for event in events if event["kind"] == "stage" and event["name"] == stage]
+    if stage_events and stage_events[-1]["rows_out"] is not None:
+        return stage_events[-1]["rows_out"]
+    table_rows = [event["rows_out"] for event in events if event["kind"] == "gold_table" and event["rows_out"] is not None]
+    return sum(table_rows) if table_rows else None
+
+
+def run_stage(stage, data_dir, gold_backend="tables"):
+    """Run one stage in this (fresh) process and return its measurements."""
+    install_counters()
+    # A run of its own, so the stage's events are told apart from the other stages'
+    start_run(run_log_path())
+    import etl
+    from gold.etl import build_gold
+
+    start = time.perf_counter()
+    if stage == "bronze":
+        etl.build_bronze(full_refresh=True, csv_folder=data_dir)
+    elif stage == "silver":
+        etl.build_silver(full_refresh=True, csv_folder=data_dir)
+    else:
+        build_gold(backend=gold_backend)
+    seconds = time.perf_counter() - start
+
+    # ru_maxrss is in kilobytes on Linux
+    peak_kb = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return {
+        "seconds": round(seconds, 3),
+        "rows_out": stage_rows_out(stage),
+        "peak_rss_mb": round(peak_kb / 1024, 1),
+        "db_round_trips": COUNTS["statements"],
+        "db_connects": COUNTS["connects"]
+    }
+
+
+def run_benchmark(fact_rows, data_dir, seed=42, regenerate=False, gold_backend="tables"):
+    if regenerate or not os.path.exists(os.path.join(data_dir, "payments_raw.csv")):
+        generate(data_dir, fact_rows, seed=seed)
+    sizes = table_sizes(fact_rows)
+
+    reset_database()
+
+    results = []
+    for stage in STAGES:
+        # A fresh process per stage keeps peak RSS and round-trip counts per stage
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            measured = executor.submit(run_stage, stage, data_dir, gold_backend).result()
+        measured["stage"] = stage
+        rows = measured["rows_out"]
+        measured["rows_per_sec"] = round(rows / measured["seconds"], 1) if rows and measured["seconds"] else None
+        results.append(measured)
+        print(f"⏱️ {stage:<7} {measured['seconds']:>9.2f}s {rows or 0:>10,} rows {measured['rows_per_sec'] or 0:>12,.0f} rows/s "
+              f"{measured['peak_rss_mb']:>8.1f} MB {measured['db_round_trips']:>9} round trips "
+              f"{measured['db_connects']:>5} connects")
+
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "fact_rows": fact_rows,
+        "seed": seed,
+        "gold_backend": gold_backend,
+        "table_rows": sizes,
+        "stages": results
+    }
+
+
+def compare(current, baseline):
+    previous = {stage["stage"]: stage for stage in baseline["stages"]}
+    print(f"Compared with run from {baseline['started_at']} ({baseline['fact_rows']} fact rows, "
+          f"gold backend {baseline.get('gold_backend', 'tables')}):")
+    for stage in current["stages"]:
+        before = previous.get(stage["stage"])
+        if not before or not before["seconds"]:
+            continue
+        change = (stage["seconds"] - before["seconds"]) / before["seconds"] * 100
+        marker = "⚠️" if change > 10 else "  "
+        print(f"{marker} {stage['stage']:<7} {before['seconds']:>9.2f}s -> {stage['seconds']:>9.2f}s ({change:+.1f}%)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the bronze, silver and gold stages on synthetic data")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="50k", help="rows per fact table")
+    parser.add_argument("--rows", type=int, help="explicit rows per fact table (overrides --scale)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--regenerate", action="store_true", help="regenerate the CSVs even if present")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    parser.add_argument("--gold-backend", choices=BACKENDS, default="tables",
+                        help="gold backend to time (compare a tables run against a matviews run)")
+    args = parser.parse_args()
+
+    fact_rows = args.rows or SCALES[args.scale]
+    data_dir = os.path.join(BENCH_DIR, "data", str(fact_rows))
+    result = run_benchmark(fact_rows, data_dir, seed=args.seed, regenerate=args.regenerate,
+                           gold_backend=args.gold_backend)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    output = os.path.join(RESULTS_DIR, f"{fact_rows}_{stamp}.json")
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"✅ Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(result, json.load(f))
@@ -0,0 +1,136 @@
+import os
+from contextlib import contextmanager
+
+from bronze.stream_load import BRONZE_DTYPES
+from load_cache import file_signature
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# ---------------------------
+# Typed Arrow IPC copy of each raw CSV (written by bronze, memory-mapped by silver)
+# ---------------------------
+# Uncompressed Arrow files can be memory-mapped, so numeric columns reach pandas without
+# a parse or a copy. Each file carries the source CSV's signature in its schema metadata;
+# a copy whose content hash no longer matches the CSV is ignored. Without pyarrow the
+# cache is simply not written, and silver parses the CSV as before.
+ARROW_CACHE_DIR = os.environ.get(
+    "ETL_ARROW_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cache", "arrow")
+)
+
+
+def arrow_path(csv_path):
+    return os.path.join(ARROW_CACHE_DIR, os.path.splitext(os.path.basename(csv_path))[0] + ".arrow")
+
+
+def _typed(df, csv_path):
+    dtypes = BRONZE_DTYPES.get(os.path.splitext(os.path.basename(csv_path))[0], {})
+    return df.astype({column: dtype for column, dtype in dtypes.items() if column in df.columns})
+
+
+@contextmanager
+def arrow_writer(csv_path, signature=None):
+    """Yields write(df) for the raw rows of csv_path, chunk by chunk; the file only
+    replaces the previous copy once every chunk was written. Yields None without pyarrow."""
+    if pa is None:
+        yield None
+        return
+
+    signature = signature or file_signature(csv_path)
+    metadata = {f"source_{key}": str(value) for key, value in signature.items()}
+    target = arrow_path(csv_path)
+    os.makedirs(ARROW_CACHE_DIR, exist_ok=True)
+    state = {"writer": None, "schema": None, "failed": False}
+
+    def abandon():
+        if state["writer"] is not None:
+            state["writer"].close()
+            os.remove(target + ".tmp")
+            state["writer"] = None
+
+    def write(df):
+        if state["failed"]:
+            return
+        try:
+            batch = pa.Table.from_pandas(_typed(df, csv_path), preserve_index=False)
+            if state["writer"] is None:
+                # The first chunk fixes the schema; BRONZE_DTYPES keeps later chunks identical
+                state["schema"] = batch.schema.remove_metadata().with_metadata(metadata)
+                state["writer"] = pa.ipc.new_file(target + ".tmp", state["schema"])
+            state["writer"].write_table(batch.cast(state["schema"]))
+        except (ValueError, TypeError, pa.ArrowException) as e:
+            # Values that don't fit the typed schema (e.g. text in a numeric column) are
+            # silver's to validate; the copy is dropped and silver parses the CSV instead
+            print(f"⚠️ No Arrow copy of {os.path.basename(csv_path)}: {e}")
+            state["failed"] = True
+            abandon()
+
+    try:
+        yield write
+    except Exception:
+        abandon()
+        raise
+    if state["writer"] is not None:
+        state["writer"].close()
+        os.replace(target + ".tmp", target)
+
+
+def _matching_reader(source, csv_path, signature=None):
+    """The IPC file reader over `source`, or None if the copy doesn't match the CSV's
+    current contents."""
+    reader = pa.ipc.open_file(source)
+    stored = {key.decode().removeprefix("source_"): value.decode()
+              for key, value in (reader.schema.metadata or {}).items()}
+    if "content_hash" not in stored:
+        return None
+    previous = {"path": stored["path"], "size": int(stored["size"]), "mtime": float(stored["mtime"]),
+                "content_hash": stored["content_hash"]}
+    # Same path, size and mtime: the stored hash is trusted, so the CSV is not re-read
+    signature = signature or file_signature(csv_path, previous)
+    if signature["content_hash"] != stored["content_hash"]:
+        return None
+    return reader
+
+
+def read_arrow(csv_path, categoricals=(), signature=None):
+    """The raw rows of csv_path from its memory-mapped Arrow copy, or None if there is
+    no copy that matches the CSV's current contents."""
+    target = arrow_path(csv_path)
+    if pa is None or not os.path.exists(target):
+        return None
+
+    with pa.memory_map(target, "r") as source:
+        reader = _matching_reader(source, csv_path, signature)
+        if reader is None:
+            return None
+        table = reader.read_all()
+    # Numeric columns without nulls stay views on the mapped buffers (split_blocks)
+    return table.to_pandas(categories=[c for c in categoricals if c in table.column_names], split_blocks=True)
+
+
+def iter_arrow(csv_path, chunksize, categoricals=(), signature=None):
+    """Like read_arrow, but an iterator of frames of at most chunksize rows, one record
+    batch (or slice of one) at a time; None if no copy matches."""
+    target = arrow_path(csv_path)
+    if pa is None or not os.path.exists(target):
+        return None
+
+    source = pa.memory_map(target, "r")
+    reader = _matching_reader(source, csv_path, signature)
+    if reader is None:
+        source.close()
+        return None
+    categories = [c for c in categoricals if c in reader.schema.names]
+
+    def frames():
+        try:
+            for index in range(reader.num_record_batches):
+                batch = reader.get_batch(index)
+                for offset in range(0, batch.num_rows, chunksize):
+                    yield batch.slice(offset, chunksize).to_pandas(categories=categories, split_blocks=True)
+        finally:
+            source.close()
+
+    return frames()
@@ -1,14 +1,12 @@
-import psycopg2
-
-# connection details
-connection = psycopg2.connect(
-    dbname="mydb",          # your database name
-    user="keerthana.s",      # your username
-    password="MyStrongPassword123",  # replace with your actual password
-    host="localhost",       # since DB is on your machine
-    port="5432"             # default PostgreSQL port
-)
-
-print("✅ Connected to PostgreSQL successfully!")
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from db import SETTINGS, connect
+
+# connection details come from db.ini / ETL_DB_* environment variables (see db.py)
+connection = connect()
+
+print(f"✅ Connected to PostgreSQL successfully! ({SETTINGS['user']}@{SETTINGS['host']}:{SETTINGS['port']}/{SETTINGS['dbname']})")
 
 connection.close()
\ No newline at end of file
@@ -1,6 +1,11 @@
+import argparse
 import os
+import sys
 import pandas as pd
-from sqlalchemy import create_engine
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from db import get_engine
+from bronze.stream_load import stream_csv_to_table, DEFAULT_CHUNKSIZE
 
 # Function to load CSV files relative to the script's location
 def load_csv(filename):
@@ -10,34 +15,30 @@ def load_csv(filename):
         raise FileNotFoundError(f"CSV file not found: {path}")
     return pd.read_csv(path)
 
-# Database connection setup
-def get_engine():
-    # Replace with your actual database credentials
-    user = "keerthana.s"
-    password = "MyStrongPassword123"
-    host = "localhost"
-    port = "5432"
-    database = "mydb"
-
-    engine = create_engine(f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{database}")
-    return engine
+TABLES = {
+    "students": "students_raw.csv",
+    "courses": "courses_raw.csv",
+    "instructors": "instructors_raw.csv",
+    "enrollments": "enrollments_raw.csv",
+    "payments": "payments_raw.csv",
+    "activity": "activity_raw.csv"
+}
 
-# Load CSV files
-df_students = load_csv("students_raw.csv")
-df_courses = load_csv("courses_raw.csv")
-df_instructors = load_csv("instructors_raw.csv")
-df_enrollments = load_csv("enrollments_raw.csv")
-df_payments = load_csv("payments_raw.csv")
-df_activity = load_csv("activity_raw.csv")
+parser = argparse.ArgumentParser(description="Load the raw CSV files into the database")
+parser.add_argument("--stream", action="store_true", help="load each CSV in fixed-size chunks with COPY")
+parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="rows per chunk when streaming")
+args = parser.parse_args()
 
-# Load into database
 engine = get_engine()
 
-df_students.to_sql("students", engine, if_exists="replace", index=False)
-df_courses.to_sql("courses", engine, if_exists="replace", index=False)
-df_instructors.to_sql("instructors", engine, if_exists="replace", index=False)
-df_enrollments.to_sql("enrollments", engine, if_exists="replace", index=False)
-df_payments.to_sql("payments", engine, if_exists="replace", index=False)
-df_activity.to_sql("activity", engine, if_exists="replace", index=False)
+if args.stream:
+    # Bounded memory: each file is read and copied chunk by chunk
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    for table_name, filename in TABLES.items():
+        stream_csv_to_table(engine, os.path.join(script_dir, filename), table_name,
+                            schema="public", chunksize=args.chunksize)
+else:
+    for table_name, filename in TABLES.items():
+        load_csv(filename).to_sql(table_name, engine, if_exists="replace", index=False)
 
 print("All CSV files loaded successfully into the database.")
@@ -0,0 +1,118 @@
+import io
+import os
+import resource
+import sys
+import time
+
+import pandas as pd
+
+from run_metrics import track
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# ---------------------------
+# Streaming CSV -> table loader (fixed-size chunks + COPY)
+# ---------------------------
+DEFAULT_CHUNKSIZE = 50000
+
+# Explicit dtypes per raw file, so pandas never has to guess (or re-guess per chunk)
+BRONZE_DTYPES = {
+    "students_raw": {
+        "student_id": "string", "name": "string", "age": "float64", "gender": "string",
+        "country": "string", "signup_date": "string", "subscription_type": "string"
+    },
+    "instructors_raw": {
+        "instructor_id": "string", "name": "string", "expertise_area": "string",
+        "rating": "float64", "join_date": "string"
+    },
+    "courses_raw": {
+        "course_id": "string", "course_title": "string", "category": "string", "difficulty_level": "string",
+        "duration_hours": "float64", "price": "float64", "instructor_id": "string"
+    },
+    "enrollments_raw": {
+        "enrollment_id": "string", "student_id": "string", "course_id": "string",
+        "enrollment_date": "string", "status": "string", "progress_percent": "float64"
+    },
+    "activity_raw": {
+        "activity_id": "string", "student_id": "string", "course_id": "string", "video_watched_min": "float64",
+        "quiz_score": "float64", "assignment_score": "float64", "timestamp": "string"
+    },
+    "payments_raw": {
+        "payment_id": "string", "student_id": "string", "course_id": "string", "amount": "float64",
+        "currency": "string", "payment_date": "string", "status": "string"
+    }
+}
+
+
+def rss_mb():
+    """Resident memory of the whole process in MB, Arrow and libpq buffers included: the current
+    RSS with psutil, else the process peak so far (ru_maxrss: kilobytes on Linux, bytes on macOS)."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 2 ** 20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (2 ** 20 if sys.platform == "darwin" else 2 ** 10)
+
+
+def stream_csv_to_table(engine, path, table_name, schema="bronze", chunksize=DEFAULT_CHUNKSIZE,
+                        replace=True, watermark_column=None, mark=None, on_chunk=None):
+    """Load a CSV into schema.table_name one chunk at a time, so memory stays
+    bounded by chunksize rather than by file size.
+
+    With watermark_column set, only rows past `mark` are loaded.
+    on_chunk, if given, receives every parsed chunk before any filtering.
+    Returns (rows loaded, new high-water mark or None).
+    """
+    dtypes = BRONZE_DTYPES.get(os.path.splitext(os.path.basename(path))[0])
+    start = time.perf_counter()
+    rows = 0
+    high_water = None
+
+    with track("copy", f"{schema}.{table_name}", bytes_read=os.path.getsize(path)) as event:
+        event["rows_in"] = 0
+        # Sampled after each chunk's COPY, while the chunk and its buffer are still alive
+        event["peak_rss_mb"] = round(rss_mb(), 1)
+        # The table is created (or replaced) in the COPY's own transaction, so a failed
+        # load leaves the previous table in place
+        with engine.begin() as conn:
+            cur = conn.connection.cursor()
+            try:
+                for i, chunk in enumerate(pd.read_csv(path, chunksize=chunksize, dtype=dtypes)):
+                    event["rows_in"] += len(chunk)
+                    if on_chunk:
+                        on_chunk(chunk)
+                    if i == 0:
+                        # Create (or replace) the table from the typed, empty frame
+                        chunk.head(0).to_sql(table_name, conn, schema=schema,
+                                             if_exists="replace" if replace else "append", index=False)
+                        event["statements"] += 1
+
+                    if watermark_column:
+                        if mark is not None:
+                            chunk = chunk[chunk[watermark_column].astype(str) > mark]
+                        if not chunk.empty:
+                            chunk_max = chunk[watermark_column].dropna().astype(str).max()
+                            if pd.notna(chunk_max) and (high_water is None or chunk_max > high_water):
+                                high_water = chunk_max
+
+                    if chunk.empty:
+                        continue
+
+                    columns = ", ".join(f'"{col}"' for col in chunk.columns)
+                    buffer = io.StringIO()
+                    chunk.to_csv(buffer, index=False, header=False)
+                    buffer.seek(0)
+                    cur.copy_expert(f'COPY {schema}."{table_name}" ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+                    event["statements"] += 1
+                    event["peak_rss_mb"] = max(event["peak_rss_mb"], round(rss_mb(), 1))
+                    rows += len(chunk)
+            finally:
+                cur.close()
+        event["rows_out"] = rows
+
+    elapsed = time.perf_counter() - start
+    rate = rows / elapsed if elapsed else 0
+    print(f"✅ {table_name}: {rows} rows in {elapsed:.2f}s ({rate:,.0f} rows/s, peak RSS {event['peak_rss_mb']:.0f} MB)")
+    return rows, high_water
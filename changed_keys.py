@@ -0,0 +1,44 @@
+import pandas as pd
+from sqlalchemy import text
+
+from silver.bulk_upsert import bulk_upsert
+
+# ---------------------------
+# Keys touched by the latest silver load (consumed by incremental gold)
+# ---------------------------
+CHANGED_KEYS_SCHEMA = "meta"
+CHANGED_KEYS_TABLE = f"{CHANGED_KEYS_SCHEMA}.changed_keys"
+
+# Gold-facing key columns carried by each silver table
+CHANGED_KEY_COLUMNS = {
+    "students": ["student_id"],
+    "instructors": ["instructor_id"],
+    "courses": ["course_id", "instructor_id"],
+    "enrollments": ["student_id", "course_id"],
+    "activity": ["student_id", "course_id"],
+    "payments": ["student_id", "course_id"]
+}
+
+
+def ensure_changed_keys_table(engine):
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {CHANGED_KEYS_SCHEMA}"))
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {CHANGED_KEYS_TABLE} (
+                key_name TEXT NOT NULL,
+                key_value TEXT NOT NULL,
+                PRIMARY KEY (key_name, key_value)
+            )
+        """))
+
+
+def record_changed_keys(engine, table_name, df):
+    frames = [
+        pd.DataFrame({"key_name": column, "key_value": df[column].dropna().astype(str).unique()})
+        for column in CHANGED_KEY_COLUMNS[table_name] if column in df.columns
+    ]
+    if not frames:
+        return 0
+    keys = pd.concat(frames, ignore_index=True)
+    inserted, _ = bulk_upsert(engine, keys, "changed_keys", ["key_name", "key_value"], schema=CHANGED_KEYS_SCHEMA)
+    return inserted
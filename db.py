@@ -0,0 +1,114 @@
+import configparser
+import os
+import threading
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import ThreadedConnectionPool
+from sqlalchemy import create_engine
+
+# ---------------------------
+# Shared, pooled database access for every layer
+# ---------------------------
+# Settings come from the [database] section of an INI file (ETL_DB_CONFIG, default db.ini next to
+# this file), and ETL_DB_<KEY> environment variables override the file, e.g. ETL_DB_HOST, ETL_DB_POOL_SIZE.
+CONFIG_FILE = os.environ.get("ETL_DB_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "db.ini"))
+
+DEFAULTS = {
+    "host": "localhost",
+    "port": "5432",
+    "dbname": "mydb",
+    "user": "keerthana.s",
+    "password": "MyStrongPassword123",
+    "pool_size": "5",
+    "statement_timeout_ms": "0"     # 0 = no timeout
+}
+
+_connects = 0
+_connects_lock = threading.Lock()
+_engine = None
+_engine_pid = None
+
+
+def load_settings(path=CONFIG_FILE):
+    settings = dict(DEFAULTS)
+    if os.path.exists(path):
+        parser = configparser.ConfigParser()
+        parser.read(path)
+        if parser.has_section("database"):
+            settings.update(parser["database"])
+    for key in DEFAULTS:
+        value = os.environ.get(f"ETL_DB_{key.upper()}")
+        if value is not None:
+            settings[key] = value
+    return settings
+
+
+SETTINGS = load_settings()
+POOL_SIZE = int(SETTINGS["pool_size"])
+STATEMENT_TIMEOUT_MS = int(SETTINGS["statement_timeout_ms"])
+
+
+class CountedConnection(psycopg2.extensions.connection):
+    # Every physical connection, however it was opened, goes through here
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        add_connects(1)
+
+
+def add_connects(count):
+    global _connects
+    with _connects_lock:
+        _connects += count
+
+
+def connect_count():
+    """Physical connections opened by this process so far."""
+    return _connects
+
+
+def connect_kwargs():
+    kwargs = {key: SETTINGS[key] for key in ("host", "port", "dbname", "user", "password")}
+    if STATEMENT_TIMEOUT_MS:
+        kwargs["options"] = f"-c statement_timeout={STATEMENT_TIMEOUT_MS}"
+    kwargs["connection_factory"] = CountedConnection
+    return kwargs
+
+
+def connect():
+    """A new, unpooled connection. Prefer get_engine() / connection() / get_pool()."""
+    return psycopg2.connect(**connect_kwargs())
+
+
+def get_engine():
+    """The process-wide SQLAlchemy engine, holding up to POOL_SIZE connections."""
+    global _engine, _engine_pid
+    # A forked worker must not reuse the parent's sockets, so each process gets its own engine
+    if _engine is None or _engine_pid != os.getpid():
+        _engine = create_engine("postgresql+psycopg2://", creator=connect, pool_size=POOL_SIZE,
+                                max_overflow=0, pool_pre_ping=True)
+        _engine_pid = os.getpid()
+    return _engine
+
+
+@contextmanager
+def connection():
+    """Borrow a raw psycopg2 connection from the engine pool; it goes back on exit."""
+    conn = get_engine().raw_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def get_pool(workers):
+    """A thread-safe pool of `workers` connections for code that hands connections to threads."""
+    return ThreadedConnectionPool(1, workers, **connect_kwargs())
+
+
+def dispose():
+    global _engine
+    if _engine is not None and _engine_pid == os.getpid():
+        _engine.dispose()
+    _engine = None
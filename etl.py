@@ -1,180 +1,409 @@
-import sys
+import argparse
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
-import psycopg2
-from sqlalchemy import create_engine, Table, MetaData
-from sqlalchemy.dialects.postgresql import insert as pg_insert
-from sqlalchemy import text
+
+from db import get_engine, connection, connect_count, add_connects
+from silver.bulk_upsert import bulk_upsert, DEFAULT_BATCH_SIZE
+from silver.cleaning import SILVER_SPECS, read_raw, clean_frame
+from silver.validation import validate_frame, reference_keys, quarantine
+from silver.schema import (
+    SILVER_PRIMARY_KEYS, SILVER_UNIQUE_IDS, ensure_silver_tables, ensure_primary_keys, drop_silver_indexes,
+    create_silver_indexes, stored_frame
+)
+from silver.partitions import ensure_partitions_for, detached_before
+from silver.fx import fx_rates, add_amount_usd, load_fx_rates
+from silver.surrogate_keys import add_surrogate_keys
+from silver.rollups import ensure_rollups, refresh_rollups_for
+from bronze.stream_load import stream_csv_to_table, DEFAULT_CHUNKSIZE
+from bronze.arrow_cache import arrow_writer, read_arrow
+from gold.gold_dag import GoldTable, run_dag, stale_tables, subset, DEFAULT_WORKERS
+from gold.frames import build_gold_frames, check_parity
+from changed_keys import ensure_changed_keys_table, record_changed_keys
+from load_cache import ensure_cache_table, changed_files, record_load
+from run_metrics import track, statement_name, start_run, run_failed, write_prometheus_textfile
+from watermarks import (
+    WATERMARK_COLUMNS, ensure_state_table, get_watermark, set_watermark, high_water, rows_past_watermark
+)
 
 # ---------------------------
-# Database connection
+# Database connection (pooled, see db.py)
 # ---------------------------
-DB_CONFIG = {
-    "host": "localhost",
-    "database": "mydb",
-    "user": "keerthana.s",
-    "password": "MyStrongPassword123"
-}
+def run_sql(sql):
+    with connection() as conn:
+        cur = conn.cursor()
+        try:
+            # Failures are still printed, but now also land in the run log as status "error"
+            with track("sql", statement_name(sql), statements=1) as event:
+                cur.execute(sql)
+                event["rows_out"] = cur.rowcount if cur.rowcount >= 0 else None
+                conn.commit()
+            return True
+        except Exception as e:
+            print(f"Error: {e}")
+            conn.rollback()
+            return False
+        finally:
+            cur.close()
+
+# ---------------------------
+# Per-table jobs (sequential or one process per table)
+# ---------------------------
+def counted_job(func, job):
+    # Runs in the worker process; reports the connections it opened back to the parent
+    before = connect_count()
+    result = func(**job)
+    return result, connect_count() - before
+
+def run_table_jobs(func, jobs, workers=1):
+    """Run func(**job) for every job, in `workers` processes when workers > 1,
+    then print per-table timings slowest first."""
+    start = time.perf_counter()
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(counted_job, func, job) for job in jobs]
+            results = []
+            for future in futures:
+                result, connects = future.result()
+                results.append(result)
+                add_connects(connects)
+    else:
+        engine = get_engine()
+        results = [func(engine=engine, **job) for job in jobs]
+    wall = time.perf_counter() - start
 
-def get_connection():
-    return psycopg2.connect(
-        host=DB_CONFIG["host"],
-        database=DB_CONFIG["database"],
-        user=DB_CONFIG["user"],
-        password=DB_CONFIG["password"]
-    )
+    for table_name, rows, seconds in sorted(results, key=lambda result: result[2], reverse=True):
+        print(f"   ⏱️ {table_name:<16} {rows:>10} rows {seconds:>8.2f}s")
+    print(f"   ⏱️ wall time {wall:.2f}s with {workers} worker(s)")
+    return results
 
-def run_sql(sql):
-    conn = get_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute(sql)
-        conn.commit()
-    except Exception as e:
-        print(f"Error: {e}")
-        conn.rollback()
-    finally:
-        cur.close()
-        conn.close()
+def run_cached_jobs(func, jobs, layer, workers=1, force=False):
+    """Run only the jobs whose input file changed since its last successful load,
+    then record the loaded files. Returns (results, names of the tables loaded)."""
+    engine = get_engine()
+    ensure_cache_table(engine)
+    changed, unchanged = changed_files(engine, layer, {job["table_name"]: job["path"] for job in jobs}, force=force)
+    for table_name in unchanged:
+        print(f"⏭️ {table_name} unchanged since its last load, skipped")
+
+    # The signature travels with the job, so the loader never hashes the file again
+    results = run_table_jobs(func, [{**job, "signature": changed[job["table_name"]]}
+                                    for job in jobs if job["table_name"] in changed], workers=workers)
+    for table_name, rows, _ in results:
+        record_load(engine, layer, table_name, changed[table_name], rows)
+    return results, set(changed)
 
 # ---------------------------
 # Bronze Layer
 # ---------------------------
-def build_bronze():
+BRONZE_TABLES = {
+    "students_raw": "students_raw.csv",
+    "instructors_raw": "instructors_raw.csv",
+    "courses_raw": "courses_raw.csv",
+    "enrollments_raw": "enrollments_raw.csv",
+    "activity_raw": "activity_raw.csv",
+    "payments_raw": "payments_raw.csv"
+}
+
+def load_bronze_table(table_name, path, full_refresh=False, stream=False, chunksize=DEFAULT_CHUNKSIZE, engine=None,
+                      signature=None):
+    start = time.perf_counter()
+    engine = engine or get_engine()
+    column = WATERMARK_COLUMNS[table_name.removesuffix("_raw")]
+
+    # Every parsed row also goes to the Arrow copy that silver memory-maps instead of re-parsing
+    with track("table_load", f"bronze.{table_name}", bytes_read=os.path.getsize(path)) as event, \
+            arrow_writer(path, signature) as write_arrow:
+        mark = None if full_refresh else get_watermark(engine, "bronze", table_name)
+
+        if stream:
+            # Chunked read + COPY: memory stays flat regardless of file size
+            rows, new_mark = stream_csv_to_table(engine, path, table_name, schema="bronze", chunksize=chunksize,
+                                                 replace=mark is None, watermark_column=column, mark=mark,
+                                                 on_chunk=write_arrow)
+            if new_mark is not None:
+                set_watermark(engine, "bronze", table_name, column, new_mark)
+            event["rows_out"] = rows
+            return table_name, rows, time.perf_counter() - start
+
+        df = pd.read_csv(path)
+        event["rows_in"] = len(df)
+        if write_arrow:
+            write_arrow(df)
+        if mark is None:
+            df.to_sql(table_name, engine, schema="bronze", if_exists="replace", index=False)
+        else:
+            # Incremental: only append rows past the stored high-water mark
+            df = rows_past_watermark(df, column, mark)
+            df.to_sql(table_name, engine, schema="bronze", if_exists="append", index=False)
+        event["statements"] += 1
+
+        if not df.empty:
+            set_watermark(engine, "bronze", table_name, column, high_water(df, column))
+        event["rows_out"] = len(df)
+        print(f"✅ {table_name} loaded into Bronze ({len(df)} rows)")
+        return table_name, len(df), time.perf_counter() - start
+
+def build_bronze(full_refresh=False, stream=False, chunksize=DEFAULT_CHUNKSIZE, workers=1, csv_folder=None,
+                 force=False):
     print("Building Bronze layer...")
 
-    engine = create_engine(
-        f"postgresql+psycopg2://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:5432/{DB_CONFIG['database']}"
-    )
+    ensure_state_table(get_engine())
 
     # Relative path to bronze CSVs
-    csv_folder = os.path.join(os.path.dirname(__file__), "..", "bronze")
+    csv_folder = csv_folder or os.path.join(os.path.dirname(__file__), "..", "bronze")
 
     # Create bronze schema if not exists
     run_sql("CREATE SCHEMA IF NOT EXISTS bronze;")
 
-    tables = {
-        "students_raw": "students_raw.csv",
-        "instructors_raw": "instructors_raw.csv",
-        "courses_raw": "courses_raw.csv",
-        "enrollments_raw": "enrollments_raw.csv",
-        "activity_raw": "activity_raw.csv",
-        "payments_raw": "payments_raw.csv"
-    }
-
-    for table_name, file_name in tables.items():
-        path = os.path.join(csv_folder, file_name)
-        if not os.path.exists(path):
-            print(f"CSV not found: {path}, skipping...")
-            continue
-        df = pd.read_csv(path)
-        df.to_sql(table_name, engine, schema="bronze", if_exists="replace", index=False)
-        print(f"✅ {table_name} loaded into Bronze")
+    with track("stage", "bronze") as stage:
+        jobs = []
+        for table_name, file_name in BRONZE_TABLES.items():
+            path = os.path.join(csv_folder, file_name)
+            if not os.path.exists(path):
+                print(f"CSV not found: {path}, skipping...")
+                continue
+            jobs.append({"table_name": table_name, "path": path, "full_refresh": full_refresh,
+                         "stream": stream, "chunksize": chunksize})
+
+        # A full refresh reloads everything, like --force
+        results, _ = run_cached_jobs(load_bronze_table, jobs, "bronze", workers=workers,
+                                     force=force or full_refresh)
+        stage["rows_out"] = sum(rows for _, rows, _ in results)
 
 # ---------------------------
 # Silver Layer
 # ---------------------------
-def build_silver():
+SILVER = "silver"
+SILVER_CSV_FOLDER = os.path.join(os.path.dirname(__file__), "..", "bronze_inputs")
+
+def load_silver_table(table_name, path, batch_size=DEFAULT_BATCH_SIZE, full_refresh=False, engine=None,
+                      signature=None):
+    start = time.perf_counter()
+    engine = engine or get_engine()
+    spec = SILVER_SPECS[table_name]
+    conflict_cols = SILVER_PRIMARY_KEYS[table_name]
+    column = WATERMARK_COLUMNS[table_name]
+
+    with track("table_load", f"silver.{table_name}", bytes_read=os.path.getsize(path)) as event:
+        # Read the bronze file (memory-mapped Arrow copy when it matches the CSV), keeping only
+        # rows past the silver high-water mark
+        df = read_arrow(path, spec["categoricals"], signature)
+        event["source"] = "csv" if df is None else "arrow"
+        if df is None:
+            df = read_raw(path, spec)
+        event["rows_in"] = len(df)
+        if not full_refresh:
+            df = rows_past_watermark(df, column, get_watermark(engine, SILVER, table_name))
+        # The watermark covers quarantined rows too, so they are not re-rejected on every run
+        mark = high_water(df, column)
+
+        # Rows that fail a type, range, enum or reference check, or fall in a detached month,
+        # go to silver.<table>_rejects
+        df, rejects = validate_frame(df, table_name, reference_keys(engine, os.path.dirname(path), table_name),
+                                     detached_before(engine, table_name))
+        event["rows_rejected"] = quarantine(engine, table_name, rejects, schema=SILVER)
+        df = add_amount_usd(clean_frame(df, spec), spec, fx_rates(engine))
+        # Integer keys next to the student, course and instructor IDs (the fact tables store
+        # only the keys; the IDs stay in the frame for the changed keys)
+        df = add_surrogate_keys(engine, df)
+
+        # Upsert (COPY into staging + one INSERT ... ON CONFLICT); the fact tables route
+        # each row to its month's partition, created here if the batch needs a new one
+        ensure_partitions_for(engine, table_name, df)
+        inserted, skipped = bulk_upsert(engine, stored_frame(df, table_name), table_name, conflict_cols, schema=SILVER,
+                                        batch_size=batch_size, unique_cols=SILVER_UNIQUE_IDS.get(table_name))
+        # Keys and rollup days come from every row read, not only the ones inserted: if an
+        # earlier run committed the upsert but failed before these, the rerun inserts nothing
+        # and would otherwise never record them (both steps are idempotent)
+        record_changed_keys(engine, table_name, df)
+        refresh_rollups_for(engine, table_name, df)
+        if mark is not None:
+            set_watermark(engine, SILVER, table_name, column, mark)
+        event["rows_out"] = inserted
+        print(f"✅ {table_name}: {inserted} inserted, {skipped} skipped")
+        return table_name, len(df), time.perf_counter() - start
+
+def build_silver(batch_size=DEFAULT_BATCH_SIZE, full_refresh=False, workers=1, csv_folder=None, force=False):
+    """Load every changed silver table; returns the names of the tables that were loaded."""
     print("Building Silver layer...")
 
-    engine = create_engine(
-        f"postgresql+psycopg2://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:5432/{DB_CONFIG['database']}"
-    )
-    SILVER = "silver"
-    metadata = MetaData(schema=SILVER)
-
-    # Create silver schema if not exists
-    run_sql(f"CREATE SCHEMA IF NOT EXISTS {SILVER};")
-
-    csv_folder = os.path.join(os.path.dirname(__file__), "..", "bronze_inputs")
-
-    # Load Bronze tables
-    df_students = pd.read_csv(os.path.join(csv_folder, "students_raw.csv")).drop_duplicates(subset=["student_id"]).fillna({
-        "name": "Unknown", "age": 0, "gender": "Unknown", "country": "Unknown", "subscription_type": "free"
-    })
-
-    df_instructors = pd.read_csv(os.path.join(csv_folder, "instructors_raw.csv")).drop_duplicates(subset=["instructor_id"]).fillna({
-        "name": "Unknown", "expertise_area": "General", "rating": 0
-    })
-
-    df_courses = pd.read_csv(os.path.join(csv_folder, "courses_raw.csv")).drop_duplicates(subset=["course_id"]).fillna({
-        "category": "General", "difficulty_level": "Beginner", "duration_hours": 0, "price": 0
-    })
-
-    df_enrollments = pd.read_csv(os.path.join(csv_folder, "enrollments_raw.csv")).drop_duplicates(subset=["enrollment_id"]).fillna({
-        "status": "active", "progress_percent": 0
-    })
-
-    df_activity = pd.read_csv(os.path.join(csv_folder, "activity_raw.csv")).drop_duplicates(subset=["activity_id"]).fillna({
-        "video_watched_min": 0, "quiz_score": 0, "assignment_score": 0
-    })
-
-    df_payments = pd.read_csv(os.path.join(csv_folder, "payments_raw.csv")).drop_duplicates(subset=["payment_id"]).fillna({
-        "amount": 0, "currency": "USD"
-    })
-
-    # Upsert function
-    def append_safely(df, table_name, conflict_cols=None):
-        table = Table(table_name, metadata, autoload_with=engine)
-        with engine.begin() as conn:
-            for _, row in df.iterrows():
-                stmt = pg_insert(table).values(**row.to_dict())
-                if conflict_cols:
-                    stmt = stmt.on_conflict_do_nothing(index_elements=conflict_cols)
-                conn.execute(stmt)
-
-    append_safely(df_students, "students", conflict_cols=["student_id"])
-    append_safely(df_instructors, "instructors", conflict_cols=["instructor_id"])
-    append_safely(df_courses, "courses", conflict_cols=["course_id"])
-    append_safely(df_enrollments, "enrollments", conflict_cols=["enrollment_id"])
-    append_safely(df_activity, "activity", conflict_cols=["activity_id"])
-    append_safely(df_payments, "payments", conflict_cols=["payment_id"])
+    engine = get_engine()
+    ensure_state_table(engine)
+    ensure_changed_keys_table(engine)
+
+    # Create silver schema, tables and keys if not exists
+    ensure_silver_tables(engine)
+    ensure_primary_keys(engine)
+    ensure_rollups(engine)
+    if full_refresh:
+        # Bulk load without secondary indexes; they are rebuilt once at the end
+        drop_silver_indexes(engine)
+
+    csv_folder = csv_folder or SILVER_CSV_FOLDER
+    # Rates first: the payments load converts amounts with them
+    load_fx_rates(engine, csv_folder)
+
+    with track("stage", "silver") as stage:
+        jobs = [
+            {"table_name": table_name, "path": os.path.join(csv_folder, spec["source"]), "batch_size": batch_size,
+             "full_refresh": full_refresh}
+            for table_name, spec in SILVER_SPECS.items()
+        ]
+        results, loaded = run_cached_jobs(load_silver_table, jobs, SILVER, workers=workers,
+                                          force=force or full_refresh)
+        stage["rows_out"] = sum(rows for _, rows, _ in results)
+
+        if loaded:
+            create_silver_indexes(engine)
 
     print("✅ Silver layer built successfully.")
+    return loaded
 
 # ---------------------------
 # Gold Layer
 # ---------------------------
-def build_gold():
-    print("Building Gold layer...")
-
-    run_sql("CREATE SCHEMA IF NOT EXISTS gold;")
+# Silver tables read by each gold table (gold-on-gold reads come from depends_on)
+GOLD_INPUTS = {
+    "student_payment_summary": ["payments"],
+    "student_activity_summary": ["activity"],
+    "student_dashboard": ["students"]
+}
 
+# Each table is dropped and recreated in one transaction, so a rebuild replaces stale rows
+GOLD_TABLES = [
     # Aggregate: total payments per student
-    run_sql("""
-        CREATE TABLE IF NOT EXISTS gold.student_payment_summary AS
-        SELECT student_id, SUM(amount) AS total_paid, COUNT(course_id) AS courses_enrolled
-        FROM silver.payments
-        GROUP BY student_id;
-    """)
+    GoldTable("student_payment_summary", """
+        DROP TABLE IF EXISTS gold.student_payment_summary;
+        CREATE TABLE gold.student_payment_summary AS
+        SELECT k.student_id, SUM(p.amount_usd) AS total_paid, COUNT(p.course_key) AS courses_enrolled
+        FROM silver.payments p
+        JOIN silver.student_keys k ON k.student_key = p.student_key
+        GROUP BY k.student_id;
+    """, []),
 
     # Aggregate: student activity summary
-    run_sql("""
-        CREATE TABLE IF NOT EXISTS gold.student_activity_summary AS
-        SELECT student_id, AVG(quiz_score) AS avg_quiz, AVG(assignment_score) AS avg_assignment, SUM(video_watched_min) AS total_video_minutes
-        FROM silver.activity
-        GROUP BY student_id;
-    """)
+    GoldTable("student_activity_summary", """
+        DROP TABLE IF EXISTS gold.student_activity_summary;
+        CREATE TABLE gold.student_activity_summary AS
+        SELECT k.student_id, AVG(a.quiz_score) AS avg_quiz, AVG(a.assignment_score) AS avg_assignment, SUM(a.video_watched_min) AS total_video_minutes
+        FROM silver.activity a
+        JOIN silver.student_keys k ON k.student_key = a.student_key
+        GROUP BY k.student_id;
+    """, []),
 
     # Dashboard table
-    run_sql("""
-        CREATE TABLE IF NOT EXISTS gold.student_dashboard AS
+    GoldTable("student_dashboard", """
+        DROP TABLE IF EXISTS gold.student_dashboard;
+        CREATE TABLE gold.student_dashboard AS
         SELECT p.student_id, sp.total_paid, sp.courses_enrolled, sa.avg_quiz, sa.avg_assignment, sa.total_video_minutes
         FROM silver.students p
         LEFT JOIN gold.student_payment_summary sp ON p.student_id = sp.student_id
         LEFT JOIN gold.student_activity_summary sa ON p.student_id = sa.student_id;
-    """)
+    """, ["student_payment_summary", "student_activity_summary"])
+]
+
+def existing_gold_tables(names):
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT relname FROM pg_class WHERE relnamespace = 'gold'::regnamespace AND relname = ANY(%s)",
+                    (list(names),))
+        return {name for (name,) in cur.fetchall()}
 
-    print("✅ Gold layer built successfully.")
+def build_gold(workers=DEFAULT_WORKERS, changed=None):
+    """Build the gold tables; with `changed` (silver tables loaded this run), tables whose
+    inputs are all unchanged and which already exist are skipped."""
+    print("Building Gold layer...")
+
+    run_sql("CREATE SCHEMA IF NOT EXISTS gold;")
+
+    tables = GOLD_TABLES
+    if changed is not None:
+        names = [table.name for table in tables]
+        rebuild = stale_tables(tables, GOLD_INPUTS, changed) | (set(names) - existing_gold_tables(names))
+        for name in names:
+            if name not in rebuild:
+                print(f"⏭️ {name} inputs unchanged, skipped")
+        tables = subset(tables, rebuild)
+
+    with track("stage", "gold", backend="sql"):
+        status = run_dag(tables, workers=workers)
+
+    failed = sorted(name for name, result in status.items() if result != "ok")
+    if failed:
+        print(f"❌ Gold layer finished with failures: {', '.join(failed)}")
+    else:
+        print("✅ Gold layer built successfully.")
+
+def build_gold_in_process(csv_folder=None, workers=1, output_folder=None, parity=False):
+    """The gold/etl.py aggregates computed with pandas straight from the cleaned CSVs."""
+    print("Building Gold layer in-process...")
+    gold = build_gold_frames(csv_folder or SILVER_CSV_FOLDER, workers=workers, output_folder=output_folder)
+    if parity:
+        with track("parity", "gold") as event:
+            differences = check_parity(gold, get_engine())
+            mismatched = sorted(name for name, difference in differences.items() if difference)
+            event["rows_out"] = len(differences) - len(mismatched)
+            if mismatched:
+                raise ValueError(f"in-process gold differs from the SQL build: {', '.join(mismatched)}")
+    return gold
 
 # ---------------------------
 # Main execution
 # ---------------------------
 if __name__ == "__main__":
-    if len(sys.argv) > 1 and sys.argv[1] == "all":
-        build_bronze()
-        build_silver()
-        build_gold()
-        print("🎉 ETL pipeline completed successfully!")
+    parser = argparse.ArgumentParser(description="Run the bronze -> silver -> gold ETL pipeline")
+    parser.add_argument("stage", choices=["all", "gold"], help="pipeline stage to run")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="rows per COPY batch during the silver load")
+    parser.add_argument("--full-refresh", action="store_true",
+                        help="ignore high-water marks and reload every table in full")
+    parser.add_argument("--force", action="store_true",
+                        help="reload tables even if their input file is unchanged since the last load")
+    parser.add_argument("--stream", action="store_true",
+                        help="load bronze CSVs in fixed-size chunks with COPY")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help="rows per chunk when streaming bronze CSVs")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes used to load bronze and silver tables in parallel")
+    parser.add_argument("--run-log", help="JSON-lines run log (default: logs/etl_runs.jsonl)")
+    parser.add_argument("--prometheus-textfile", help="also write run metrics in Prometheus textfile format")
+    parser.add_argument("--gold-workers", type=int, default=DEFAULT_WORKERS,
+                        help="gold tables built concurrently (sql) or processes for the fact tables (pandas)")
+    parser.add_argument("--gold-backend", choices=["sql", "pandas"], default="sql",
+                        help="pandas: compute the gold/etl.py aggregates in-process from the cleaned CSVs")
+    parser.add_argument("--csv-folder", help="raw CSVs for the silver load and the pandas gold backend")
+    parser.add_argument("--gold-output", help="pandas backend: write each gold table as CSV into this folder")
+    parser.add_argument("--parity", action="store_true",
+                        help="pandas backend: compare the result with the gold tables built by gold/etl.py")
+    args = parser.parse_args()
+
+    run_id = start_run(args.run_log)
+    changed = None
+    if args.stage == "all":
+        build_bronze(full_refresh=args.full_refresh, stream=args.stream, chunksize=args.chunksize,
+                     workers=args.workers, force=args.force)
+        changed = build_silver(batch_size=args.batch_size, full_refresh=args.full_refresh, workers=args.workers,
+                               csv_folder=args.csv_folder, force=args.force)
+
+    if args.gold_backend == "pandas":
+        try:
+            build_gold_in_process(args.csv_folder, workers=args.gold_workers, output_folder=args.gold_output,
+                                  parity=args.parity)
+        except ValueError as e:
+            # Already recorded as a failed "parity" event, so the run exits non-zero below
+            print(f"❌ {e}")
     else:
-        print("Usage: python etl.py all")
+        build_gold(workers=args.gold_workers, changed=None if args.force else changed)
+
+    with track("connections", "etl") as event:
+        event["connects"] = connect_count()
+    print(f"🔌 {connect_count()} database connection(s) opened")
+
+    if args.prometheus_textfile:
+        write_prometheus_textfile(args.prometheus_textfile, run_id)
+    if run_failed(run_id):
+        print(f"❌ ETL pipeline finished with errors, see run {run_id} in the run log.")
+        sys.exit(1)
+    print("🎉 ETL pipeline completed successfully!")
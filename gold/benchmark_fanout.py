@@ -0,0 +1,90 @@
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from db import connect
+from gold.etl import KEYED_GOLD_TABLES, KeyScope
+
+# -------------------------------
+# Previous definitions (join first, aggregate after)
+# -------------------------------
+LEGACY_SQL = {
+    "instructor_performance": """
+    SELECT
+        i.instructor_id,
+        i.name AS instructor_name,
+        COUNT(DISTINCT e.student_key) AS total_students,
+        SUM(p.amount_usd) AS total_revenue
+    FROM silver.courses c
+    JOIN silver.instructors i ON c.instructor_id = i.instructor_id
+    LEFT JOIN silver.enrollments e ON c.course_key = e.course_key
+    LEFT JOIN silver.payments p ON c.course_key = p.course_key
+    GROUP BY i.instructor_id, i.name
+    ORDER BY total_revenue DESC
+    """,
+    "student_dashboard": """
+    SELECT
+        s.student_id,
+        s.name AS student_name,
+        SUM(p.amount_usd) AS total_paid,
+        COUNT(DISTINCT e.course_key) AS courses_enrolled,
+        AVG(a.quiz_score) AS avg_quiz_score,
+        AVG(a.assignment_score) AS avg_assignment_score,
+        SUM(a.video_watched_min) AS total_video_minutes
+    FROM silver.students s
+    LEFT JOIN silver.payments p ON s.student_key = p.student_key
+    LEFT JOIN silver.enrollments e ON s.student_key = e.student_key
+    LEFT JOIN silver.activity a ON s.student_key = a.student_key
+    GROUP BY s.student_id, s.name
+    """
+}
+
+# Column whose grand total shows how much the fan-out inflates SUMs
+TOTAL_COLUMN = {
+    "instructor_performance": "total_revenue",
+    "student_dashboard": "total_paid"
+}
+
+
+def largest_node_rows(plan):
+    # Rows produced by the biggest node in the plan (the fan-out shows up here)
+    rows = plan["Actual Rows"] * plan.get("Actual Loops", 1)
+    return max([rows] + [largest_node_rows(child) for child in plan.get("Plans", [])])
+
+
+def profile(cur, select_sql):
+    cur.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {select_sql}")
+    result = cur.fetchone()[0]
+    if isinstance(result, str):
+        result = json.loads(result)
+    explain = result[0]
+    return largest_node_rows(explain["Plan"]), explain["Execution Time"]
+
+
+def grand_total(cur, select_sql, column):
+    cur.execute(f"SELECT SUM({column}) FROM ({select_sql}) q")
+    return cur.fetchone()[0]
+
+
+def run_benchmark():
+    conn = connect()
+    cur = conn.cursor()
+
+    print(f"{'table':<24}{'version':<10}{'peak rows':>14}{'time (ms)':>12}{'grand total':>20}")
+    for table, legacy_sql in LEGACY_SQL.items():
+        versions = {
+            "before": legacy_sql,
+            "after": KEYED_GOLD_TABLES[table][1].format(scope=KeyScope())
+        }
+        for version, select_sql in versions.items():
+            peak_rows, elapsed_ms = profile(cur, select_sql)
+            total = grand_total(cur, select_sql, TOTAL_COLUMN[table])
+            print(f"{table:<24}{version:<10}{peak_rows:>14,}{elapsed_ms:>12.1f}{str(total):>20}")
+
+    cur.close()
+    conn.close()
+
+
+if __name__ == "__main__":
+    run_benchmark()
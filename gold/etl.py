@@ -1,68 +1,119 @@
-import psycopg2
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from changed_keys import CHANGED_KEYS_TABLE
+from db import connection, get_engine
+from gold.gold_dag import GoldTable, run_dag, DEFAULT_WORKERS
+from gold.matviews import MatView, matview_dag, drop_matviews
+from gold.publish import publish_gold, DEFAULT_MAX_SHRINK
+from run_metrics import track, statement_name
+from silver.rollups import ensure_rollups
+from silver.surrogate_keys import KEY_COLUMNS
 
 # Utility function to run SQL queries
 def run_sql(query):
     try:
-        conn = psycopg2.connect(
-            dbname="mydb",
-            user="keerthana.s",
-            password="MyStrongPassword123",
-            host="localhost",
-            port="5432"
-        )
-        cur = conn.cursor()
-        cur.execute(query)
-        conn.commit()
-        cur.close()
-        conn.close()
+        # Borrowed from the shared pool, so repeated statements reuse one session
+        with connection() as conn:
+            cur = conn.cursor()
+            try:
+                with track("sql", statement_name(query), statements=1) as event:
+                    cur.execute(query)
+                    event["rows_out"] = cur.rowcount if cur.rowcount >= 0 else None
+                    conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cur.close()
         print("✅ Query executed successfully.")
+        return True
     except Exception as e:
         print(f"❌ Error: {e}")
+        return False
 
-def build_gold():
-    # Create schema
-    run_sql("CREATE SCHEMA IF NOT EXISTS gold;")
+# Utility function to fetch a single value
+def fetch_value(query):
+    with connection() as conn:
+        cur = conn.cursor()
+        try:
+            with track("sql", statement_name(query), statements=1):
+                cur.execute(query)
+                row = cur.fetchone()
+        finally:
+            cur.close()
+        return row[0] if row else None
+
+# -------------------------------
+# Keys touched by the latest silver load
+# -------------------------------
+TOUCHED_KEYS = {
+    "student_id": f"SELECT key_value FROM {CHANGED_KEYS_TABLE} WHERE key_name = 'student_id'",
+    "course_id": f"SELECT key_value FROM {CHANGED_KEYS_TABLE} WHERE key_name = 'course_id'",
+    # An instructor is touched directly, or through any course whose facts changed
+    "instructor_id": f"""
+        SELECT key_value FROM {CHANGED_KEYS_TABLE} WHERE key_name = 'instructor_id'
+        UNION
+        SELECT c.instructor_id FROM silver.courses c
+        JOIN {CHANGED_KEYS_TABLE} k ON k.key_name = 'course_id' AND k.key_value = c.course_id
+    """
+}
+
+class KeyScope(dict):
+    """Renders {scope[<column>]} as a WHERE on the touched keys, or as nothing for a full rebuild.
+    A surrogate key column (student_key, ...) is matched against the keys of the touched IDs."""
+
+    def __init__(self, touched=None):
+        super().__init__()
+        self.touched = touched
 
-    # -------------------------------
+    def __missing__(self, column):
+        if not self.touched:
+            return ""
+        name = column.split(".")[-1]
+        if name in KEY_COLUMNS:
+            table, id_column = KEY_COLUMNS[name]
+            return f"WHERE {column} IN (SELECT {name} FROM silver.{table} WHERE {id_column} IN ({self.touched}))"
+        return f"WHERE {column} IN ({self.touched})"
+
+# -------------------------------
+# Per-key gold aggregates: name -> (key, SELECT)
+# Fact tables are aggregated per key before joining, so no join multiplies rows; facts join
+# the dimensions on the integer surrogate keys, the text IDs are only read for the output.
+# -------------------------------
+KEYED_GOLD_TABLES = {
     # Total payments per course
-    # -------------------------------
-    run_sql("""
-    DROP TABLE IF EXISTS gold.payments_per_course;
-    CREATE TABLE gold.payments_per_course AS
+    "payments_per_course": ("course_id", """
     SELECT
         c.course_id,
         c.course_title,
-        SUM(p.amount) AS total_revenue,
-        COUNT(DISTINCT p.student_id) AS total_students
+        SUM(p.amount_usd) AS total_revenue,
+        COUNT(DISTINCT p.student_key) AS total_students
     FROM silver.payments p
-    JOIN silver.courses c ON p.course_id = c.course_id
+    JOIN silver.courses c ON p.course_key = c.course_key
+    {scope[c.course_id]}
     GROUP BY c.course_id, c.course_title
-    ORDER BY total_revenue DESC;
-    """)
+    ORDER BY total_revenue DESC
+    """),
 
-    # -------------------------------
     # Enrollments per course
-    # -------------------------------
-    run_sql("""
-    DROP TABLE IF EXISTS gold.enrollments_per_course;
-    CREATE TABLE gold.enrollments_per_course AS
+    "enrollments_per_course": ("course_id", """
     SELECT
         c.course_id,
         c.course_title,
         COUNT(e.enrollment_id) AS total_enrollments,
         AVG(e.progress_percent) AS avg_progress
     FROM silver.enrollments e
-    JOIN silver.courses c ON e.course_id = c.course_id
+    JOIN silver.courses c ON e.course_key = c.course_key
+    {scope[c.course_id]}
     GROUP BY c.course_id, c.course_title
-    ORDER BY total_enrollments DESC;
-    """)
+    ORDER BY total_enrollments DESC
+    """),
 
-    # -------------------------------
     # Activity summary per student
-    # -------------------------------
-    run_sql("""
-    DROP TABLE IF EXISTS gold.student_activity_summary;
-    CREATE TABLE gold.student_activity_summary AS
+    "student_activity_summary": ("student_id", """
     SELECT
         s.student_id,
         s.name AS student_name,
@@ -70,75 +121,149 @@ def build_gold():
         AVG(a.quiz_score) AS avg_quiz_score,
         AVG(a.assignment_score) AS avg_assignment_score
     FROM silver.activity a
-    JOIN silver.students s ON a.student_id = s.student_id
+    JOIN silver.students s ON a.student_key = s.student_key
+    {scope[s.student_id]}
     GROUP BY s.student_id, s.name
-    ORDER BY total_video_minutes DESC;
-    """)
+    ORDER BY total_video_minutes DESC
+    """),
 
-    # -------------------------------
-    # Instructor performance
-    # -------------------------------
-    run_sql("""
-    DROP TABLE IF EXISTS gold.instructor_performance;
-    CREATE TABLE gold.instructor_performance AS
+    # Instructor performance (instructors with at least one course)
+    "instructor_performance": ("instructor_id", """
     SELECT
         i.instructor_id,
         i.name AS instructor_name,
-        COUNT(DISTINCT e.student_id) AS total_students,
-        SUM(p.amount) AS total_revenue
-    FROM silver.courses c
-    JOIN silver.instructors i ON c.instructor_id = i.instructor_id
-    LEFT JOIN silver.enrollments e ON c.course_id = e.course_id
-    LEFT JOIN silver.payments p ON c.course_id = p.course_id
-    GROUP BY i.instructor_id, i.name
-    ORDER BY total_revenue DESC;
-    """)
+        COALESCE(es.total_students, 0) AS total_students,
+        ps.total_revenue
+    FROM silver.instructors i
+    JOIN (
+        SELECT DISTINCT c.instructor_key
+        FROM silver.courses c
+        {scope[c.instructor_id]}
+    ) ci ON ci.instructor_key = i.instructor_key
+    LEFT JOIN (
+        SELECT c.instructor_key, COUNT(DISTINCT e.student_key) AS total_students
+        FROM silver.enrollments e
+        JOIN silver.courses c ON e.course_key = c.course_key
+        {scope[c.instructor_id]}
+        GROUP BY c.instructor_key
+    ) es ON es.instructor_key = i.instructor_key
+    LEFT JOIN (
+        SELECT c.instructor_key, SUM(p.amount_usd) AS total_revenue
+        FROM silver.payments p
+        JOIN silver.courses c ON p.course_key = c.course_key
+        {scope[c.instructor_id]}
+        GROUP BY c.instructor_key
+    ) ps ON ps.instructor_key = i.instructor_key
+    ORDER BY total_revenue DESC
+    """),
 
-    # -------------------------------
     # Dashboard table
-    # -------------------------------
-    run_sql("""
-    DROP TABLE IF EXISTS gold.student_dashboard;
-    CREATE TABLE gold.student_dashboard AS
+    "student_dashboard": ("student_id", """
     SELECT
         s.student_id,
         s.name AS student_name,
-        SUM(p.amount) AS total_paid,
-        COUNT(DISTINCT e.course_id) AS courses_enrolled,
-        AVG(a.quiz_score) AS avg_quiz_score,
-        AVG(a.assignment_score) AS avg_assignment_score,
-        SUM(a.video_watched_min) AS total_video_minutes
+        p.total_paid,
+        COALESCE(e.courses_enrolled, 0) AS courses_enrolled,
+        a.avg_quiz_score,
+        a.avg_assignment_score,
+        a.total_video_minutes
     FROM silver.students s
-    LEFT JOIN silver.payments p ON s.student_id = p.student_id
-    LEFT JOIN silver.enrollments e ON s.student_id = e.student_id
-    LEFT JOIN silver.activity a ON s.student_id = a.student_id
-    GROUP BY s.student_id, s.name;
+    LEFT JOIN (
+        SELECT student_key, SUM(amount_usd) AS total_paid
+        FROM silver.payments
+        {scope[student_key]}
+        GROUP BY student_key
+    ) p ON p.student_key = s.student_key
+    LEFT JOIN (
+        SELECT student_key, COUNT(DISTINCT course_key) AS courses_enrolled
+        FROM silver.enrollments
+        {scope[student_key]}
+        GROUP BY student_key
+    ) e ON e.student_key = s.student_key
+    LEFT JOIN (
+        SELECT
+            student_key,
+            AVG(quiz_score) AS avg_quiz_score,
+            AVG(assignment_score) AS avg_assignment_score,
+            SUM(video_watched_min) AS total_video_minutes
+        FROM silver.activity
+        {scope[student_key]}
+        GROUP BY student_key
+    ) a ON a.student_key = s.student_key
+    {scope[s.student_id]}
     """)
+}
 
-    # -------------------------------
-    # Top 5 courses by revenue
-    # -------------------------------
-    run_sql("""
-    DROP TABLE IF EXISTS gold.top5_courses_by_revenue;
-    CREATE TABLE gold.top5_courses_by_revenue AS
+# -------------------------------
+# Whole-table gold aggregates, always rebuilt
+# -------------------------------
+# Top 5 courses by revenue
+TOP5_COURSES_SQL = """
     SELECT
         c.course_id,
         c.course_title,
-        SUM(p.amount) AS total_revenue
+        SUM(p.amount_usd) AS total_revenue
     FROM silver.courses c
-    JOIN silver.payments p ON c.course_id = p.course_id
+    JOIN silver.payments p ON c.course_key = p.course_key
     GROUP BY c.course_id, c.course_title
     ORDER BY total_revenue DESC
-    LIMIT 5;
-    """)
+    LIMIT 5
+"""
+
+# -------------------------------
+# Rollup forms: the same results from the daily rollups (silver/rollups.py)
+# -------------------------------
+# Sums and counts of the rollups add up to exactly what the fact scans give; averages are
+# SUM / COUNT of the non-null values, like AVG. SUM over BIGINT yields NUMERIC, hence the casts.
+# Tables that count distinct students, or aggregate per student, keep reading the facts.
+ROLLUP_KEYED_SQL = {
+    "enrollments_per_course": """
+    SELECT
+        c.course_id,
+        c.course_title,
+        SUM(e.enrollments)::BIGINT AS total_enrollments,
+        SUM(e.progress_sum) / NULLIF(SUM(e.progress_count), 0) AS avg_progress
+    FROM rollup.enrollments_daily e
+    JOIN silver.courses c ON e.course_key = c.course_key
+    {scope[c.course_id]}
+    GROUP BY c.course_id, c.course_title
+    ORDER BY total_enrollments DESC
+    """
+}
+
+TOP5_COURSES_FROM_ROLLUP_SQL = """
+    SELECT
+        c.course_id,
+        c.course_title,
+        SUM(p.amount_usd) AS total_revenue
+    FROM silver.courses c
+    JOIN rollup.payments_daily p ON c.course_key = p.course_key
+    GROUP BY c.course_id, c.course_title
+    ORDER BY total_revenue DESC
+    LIMIT 5
+"""
+
+SOURCES = ["rollups", "silver"]
+
+
+def keyed_gold_tables(source="rollups"):
+    """KEYED_GOLD_TABLES, reading the rollups where a table has a rollup form."""
+    if source == "silver":
+        return KEYED_GOLD_TABLES
+    return {table: (key, ROLLUP_KEYED_SQL.get(table, select_sql))
+            for table, (key, select_sql) in KEYED_GOLD_TABLES.items()}
 
-    # -------------------------------
-    # Student age distribution
-    # -------------------------------
-    run_sql("""
-    DROP TABLE IF EXISTS gold.age_distribution;
-    CREATE TABLE gold.age_distribution AS
-    SELECT 
+# Same ranking, read from the already-merged per-course revenue
+TOP5_COURSES_FROM_GOLD_SQL = """
+    SELECT course_id, course_title, total_revenue
+    FROM gold.payments_per_course
+    ORDER BY total_revenue DESC
+    LIMIT 5
+"""
+
+# Student age distribution
+AGE_DISTRIBUTION_SQL = """
+    SELECT
         CASE
             WHEN age BETWEEN 0 AND 18 THEN '0-18'
             WHEN age BETWEEN 19 AND 25 THEN '19-25'
@@ -148,11 +273,136 @@ def build_gold():
         COUNT(*) AS total_students
     FROM silver.students
     GROUP BY age_group
-    ORDER BY age_group;
-    """)
+    ORDER BY age_group
+"""
+
+
+def gold_tables_exist():
+    return all(
+        fetch_value(f"SELECT to_regclass('gold.{table}') IS NOT NULL;")
+        for table in list(KEYED_GOLD_TABLES) + ["top5_courses_by_revenue", "age_distribution"]
+    )
+
+
+def rebuild_sql(table, select_sql):
+    return f"""
+    DROP TABLE IF EXISTS gold.{table};
+    CREATE TABLE gold.{table} AS
+    {select_sql};
+    """
+
+
+def merge_sql(table, key, select_sql):
+    # DELETE + INSERT run in one transaction, so readers never see a half-merged table
+    touched = TOUCHED_KEYS[key]
+    return f"""
+    DELETE FROM gold.{table} WHERE {key} IN ({touched});
+    INSERT INTO gold.{table}
+    {select_sql.format(scope=KeyScope(touched))};
+    """
+
+
+def gold_dag(incremental=False, source="rollups"):
+    keyed = keyed_gold_tables(source)
+    if incremental:
+        tables = [
+            GoldTable(table, merge_sql(table, key, select_sql), [])
+            for table, (key, select_sql) in keyed.items()
+        ]
+        tables.append(GoldTable(
+            "top5_courses_by_revenue",
+            rebuild_sql("top5_courses_by_revenue", TOP5_COURSES_FROM_GOLD_SQL),
+            ["payments_per_course"]
+        ))
+    else:
+        tables = [
+            GoldTable(table, rebuild_sql(table, select_sql.format(scope=KeyScope())), [])
+            for table, (_, select_sql) in keyed.items()
+        ]
+        top5_sql = TOP5_COURSES_FROM_ROLLUP_SQL if source == "rollups" else TOP5_COURSES_SQL
+        tables.append(GoldTable("top5_courses_by_revenue", rebuild_sql("top5_courses_by_revenue", top5_sql), []))
+
+    # Students-only and small: a full recompute is cheaper than tracking buckets
+    tables.append(GoldTable("age_distribution", rebuild_sql("age_distribution", AGE_DISTRIBUTION_SQL), []))
+    return tables
+
+
+# -------------------------------
+# Materialized-view backend: same aggregates, refreshed concurrently
+# -------------------------------
+UNIQUE_KEYS = {
+    "top5_courses_by_revenue": ["course_id"],
+    "age_distribution": ["age_group"]
+}
+
+
+def gold_matviews(source="rollups"):
+    views = [
+        MatView(table, select_sql.format(scope=KeyScope()), [key], [])
+        for table, (key, select_sql) in keyed_gold_tables(source).items()
+    ]
+    views.append(MatView("top5_courses_by_revenue", TOP5_COURSES_FROM_GOLD_SQL,
+                         UNIQUE_KEYS["top5_courses_by_revenue"], ["payments_per_course"]))
+    views.append(MatView("age_distribution", AGE_DISTRIBUTION_SQL, UNIQUE_KEYS["age_distribution"], []))
+    return views
+
+
+BACKENDS = ["tables", "matviews"]
+
+
+def build_gold(incremental=False, workers=DEFAULT_WORKERS, backend="tables", publish=False,
+               max_shrink=DEFAULT_MAX_SHRINK, source="rollups"):
+    # Create schema
+    run_sql("CREATE SCHEMA IF NOT EXISTS gold;")
+    if source == "rollups":
+        ensure_rollups(get_engine())
+
+    if publish:
+        if backend != "tables":
+            raise ValueError("--publish builds tables into a shadow schema; it cannot be combined with matviews")
+        # A shadow schema starts empty, so everything is rebuilt in full
+        with track("stage", "gold", incremental=False, backend="publish"):
+            status = publish_gold(gold_dag(incremental=False, source=source), workers=workers,
+                                  max_shrink=max_shrink)
+    elif backend == "matviews":
+        # Views always refresh in full; a refresh covers every touched key
+        with track("stage", "gold", incremental=False, backend=backend):
+            status = run_dag(matview_dag(gold_matviews(source)), workers=workers)
+    else:
+        dropped = drop_matviews([view.name for view in gold_matviews()])
+        if dropped:
+            print(f"⚠️ Replacing materialized views with tables: {', '.join(dropped)}")
+        if incremental and not gold_tables_exist():
+            print("⚠️ Gold tables missing, falling back to a full rebuild.")
+            incremental = False
+        with track("stage", "gold", incremental=incremental, backend=backend):
+            status = run_dag(gold_dag(incremental, source), workers=workers)
+
+    # The touched keys are consumed once every gold table reflects them
+    failed = sorted(name for name, result in status.items() if result != "ok")
+    if failed:
+        print(f"❌ Gold layer finished with failures: {', '.join(failed)}")
+        return False
 
+    run_sql(f"TRUNCATE {CHANGED_KEYS_TABLE};")
     print("✅ Gold layer for silver schema built successfully.")
+    return True
 
 # Run the build process
 if __name__ == "__main__":
-    build_gold()
+    parser = argparse.ArgumentParser(description="Build the gold layer from the silver schema")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only recompute rows for keys touched by the latest silver load")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="gold tables built concurrently")
+    parser.add_argument("--backend", choices=BACKENDS, default="tables",
+                        help="tables: DROP + CREATE TABLE AS (or merge); matviews: REFRESH MATERIALIZED VIEW CONCURRENTLY")
+    parser.add_argument("--publish", action="store_true",
+                        help="build into a staging schema, validate row counts, then swap it in for gold")
+    parser.add_argument("--max-shrink", type=float, default=DEFAULT_MAX_SHRINK,
+                        help="with --publish, largest allowed drop in a table's row count (0.5 = 50%%)")
+    parser.add_argument("--source", choices=SOURCES, default="rollups",
+                        help="rollups: aggregate the daily rollups where possible; silver: scan the fact tables")
+    args = parser.parse_args()
+    build_gold(incremental=args.incremental, workers=args.workers, backend=args.backend, publish=args.publish,
+               max_shrink=args.max_shrink, source=args.source)
@@ -0,0 +1,95 @@
+import os
+import shutil
+
+import pandas as pd
+from sqlalchemy import text
+
+# -------------------------------
+# Parquet export of gold tables (server-side cursor, chunked)
+# -------------------------------
+DEFAULT_CHUNKSIZE = 100000
+DEFAULT_COMPRESSION = "snappy"
+
+# Tables written as a partitioned dataset (one directory per value)
+PARTITION_COLUMNS = {
+    "yearly_enrollments": ["year"],
+    "yearly_student_enrollments": ["year"],
+    "revenue_by_country": ["country"],
+    "students_per_country": ["country"]
+}
+
+
+def remove_path(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def swap_in(tmp, target):
+    """Put the finished export at tmp in target's place. A file is replaced atomically; a
+    directory can't be renamed over a non-empty one, so the old dataset is moved aside first
+    and deleted once the new one is in place."""
+    if not os.path.isdir(tmp):
+        os.replace(tmp, target)
+        return
+    old = target + ".old"
+    remove_path(old)
+    if os.path.exists(target):
+        os.replace(target, old)
+    os.replace(tmp, target)
+    remove_path(old)
+
+
+def export_table_parquet(engine, table, output_folder, chunksize=DEFAULT_CHUNKSIZE,
+                         compression=DEFAULT_COMPRESSION, partition_cols=None):
+    """Write gold.<table> to Parquet, reading it through a server-side cursor
+    chunk by chunk so memory stays bounded by chunksize.
+
+    Returns the number of rows written.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export needs pyarrow: pip install pyarrow")
+
+    if partition_cols is None:
+        partition_cols = PARTITION_COLUMNS.get(table)
+
+    if partition_cols:
+        target = os.path.join(output_folder, table)
+    else:
+        target = os.path.join(output_folder, f"{table}.parquet")
+    # Written next to the target and swapped in once complete, so a failed export leaves
+    # the previous one readable
+    tmp = target + ".tmp"
+    remove_path(tmp)
+
+    rows = 0
+    writer = None
+    try:
+        with engine.connect().execution_options(stream_results=True, max_row_buffer=chunksize) as conn:
+            try:
+                for chunk in pd.read_sql(text(f"SELECT * FROM gold.{table}"), conn, chunksize=chunksize):
+                    arrow_chunk = pa.Table.from_pandas(chunk, preserve_index=False)
+                    if partition_cols:
+                        pq.write_to_dataset(arrow_chunk, tmp, partition_cols=partition_cols, compression=compression)
+                    else:
+                        if writer is None:
+                            writer = pq.ParquetWriter(tmp, arrow_chunk.schema, compression=compression)
+                        writer.write_table(arrow_chunk.cast(writer.schema))
+                    rows += len(chunk)
+            finally:
+                if writer is not None:
+                    writer.close()
+    except Exception:
+        remove_path(tmp)
+        raise
+
+    if os.path.exists(tmp):
+        swap_in(tmp, target)
+    else:
+        # Nothing was written (no rows), so no stale export is left behind either
+        remove_path(target)
+    return rows
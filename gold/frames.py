@@ -0,0 +1,198 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from gold.etl import KEYED_GOLD_TABLES, UNIQUE_KEYS
+from run_metrics import track
+from silver.cleaning import SILVER_SPECS, load_raw, clean_frame
+from silver.fx import csv_fx_rates, add_amount_usd
+from silver.validation import validate_frame
+
+# -------------------------------
+# In-process gold: the gold/etl.py aggregates computed with pandas
+# -------------------------------
+# Same columns and values as the SQL definitions; facts are aggregated per key before
+# any join, and large fact tables are split by key across worker processes.
+PARALLEL_MIN_ROWS = 1_000_000
+ID_COLUMNS = ["student_id", "course_id", "instructor_id"]
+
+GOLD_KEYS = {table: [key] for table, (key, _) in KEYED_GOLD_TABLES.items()}
+GOLD_KEYS.update(UNIQUE_KEYS)
+
+
+def load_silver_frames(csv_folder):
+    frames, key_sets = {}, {}
+    # Dimensions come first in SILVER_SPECS, so facts are checked against the validated keys
+    for table_name, spec in SILVER_SPECS.items():
+        df, _ = validate_frame(load_raw(os.path.join(csv_folder, spec["source"]), spec), table_name, key_sets)
+        # Amounts in USD from the fx_rates.csv next to the raw files
+        df = add_amount_usd(clean_frame(df, spec), spec, csv_fx_rates(csv_folder))
+        key_sets[table_name] = pd.Index(df[spec["key"][0]].astype(str))
+        # Plain object IDs, so joins don't have to reconcile categories across tables
+        frames[table_name] = df.assign(**{column: df[column].astype(object)
+                                          for column in ID_COLUMNS if column in df.columns})
+    return frames
+
+
+def _aggregate(df, key, aggs):
+    # SQL joins never match a NULL key, so NULL groups never reach a gold table
+    return df.dropna(subset=[key]).groupby(key, sort=False).agg(**aggs).reset_index()
+
+
+def aggregate(df, key, aggs, pool=None, workers=1):
+    """df.groupby(key).agg(**aggs). With a pool and a large frame, rows are split by
+    a hash of the key, so every group lands whole in one partition."""
+    if pool is None or workers <= 1 or len(df) < PARALLEL_MIN_ROWS:
+        return _aggregate(df, key, aggs)
+    partition = pd.util.hash_pandas_object(df[key], index=False).to_numpy() % workers
+    parts = [df[partition == i] for i in range(workers)]
+    return pd.concat(pool.map(_aggregate, parts, repeat(key), repeat(aggs)), ignore_index=True)
+
+
+def age_group(age):
+    return np.select(
+        [age.between(0, 18), age.between(19, 25), age.between(26, 40)],
+        ["0-18", "19-25", "26-40"],
+        default="40+"
+    )
+
+
+def gold_frames(silver, pool=None, workers=1):
+    students, instructors, courses = silver["students"], silver["instructors"], silver["courses"]
+    enrollments, activity, payments = silver["enrollments"], silver["activity"], silver["payments"]
+    gold = {}
+
+    def build(name, compute):
+        with track("gold_table", name, backend="pandas") as event:
+            gold[name] = compute()
+            event["rows_out"] = len(gold[name])
+
+    # Per-key fact aggregates, each computed once and shared by the tables below
+    payments_by_course = aggregate(payments, "course_id", {
+        "total_revenue": ("amount_usd", "sum"), "total_students": ("student_id", "nunique")
+    }, pool, workers)
+    payments_by_student = aggregate(payments, "student_id", {"total_paid": ("amount_usd", "sum")}, pool, workers)
+    enrollments_by_course = aggregate(enrollments, "course_id", {
+        "total_enrollments": ("enrollment_id", "count"), "avg_progress": ("progress_percent", "mean")
+    }, pool, workers)
+    enrollments_by_student = aggregate(enrollments, "student_id", {
+        "courses_enrolled": ("course_id", "nunique")
+    }, pool, workers)
+    activity_by_student = aggregate(activity, "student_id", {
+        "total_video_minutes": ("video_watched_min", "sum"),
+        "avg_quiz_score": ("quiz_score", "mean"),
+        "avg_assignment_score": ("assignment_score", "mean")
+    }, pool, workers)
+
+    course_titles = courses[["course_id", "course_title"]]
+    course_instructors = courses[["course_id", "instructor_id"]].dropna(subset=["instructor_id"])
+    student_names = students[["student_id", "name"]].rename(columns={"name": "student_name"})
+
+    build("payments_per_course", lambda: course_titles.merge(payments_by_course, on="course_id")
+          .sort_values("total_revenue", ascending=False, ignore_index=True))
+
+    build("enrollments_per_course", lambda: course_titles.merge(enrollments_by_course, on="course_id")
+          .sort_values("total_enrollments", ascending=False, ignore_index=True))
+
+    build("student_activity_summary", lambda: student_names.merge(activity_by_student, on="student_id")
+          [["student_id", "student_name", "total_video_minutes", "avg_quiz_score", "avg_assignment_score"]]
+          .sort_values("total_video_minutes", ascending=False, ignore_index=True))
+
+    def instructor_performance():
+        # Distinct (course, student) pairs first: far smaller than the enrollments themselves
+        pairs = enrollments[["course_id", "student_id"]].dropna(subset=["course_id"]).drop_duplicates()
+        students_taught = _aggregate(pairs.merge(course_instructors, on="course_id"), "instructor_id",
+                                     {"total_students": ("student_id", "nunique")})
+        revenue = _aggregate(payments_by_course.merge(course_instructors, on="course_id"), "instructor_id",
+                             {"total_revenue": ("total_revenue", "sum")})
+        df = (instructors[["instructor_id", "name"]].rename(columns={"name": "instructor_name"})
+              .merge(course_instructors[["instructor_id"]].drop_duplicates(), on="instructor_id")
+              .merge(students_taught, on="instructor_id", how="left")
+              .merge(revenue, on="instructor_id", how="left"))
+        df["total_students"] = df["total_students"].fillna(0).astype("int64")
+        # PostgreSQL puts NULLs first in DESC order
+        return df.sort_values("total_revenue", ascending=False, na_position="first", ignore_index=True)
+
+    build("instructor_performance", instructor_performance)
+
+    def student_dashboard():
+        df = (student_names
+              .merge(payments_by_student, on="student_id", how="left")
+              .merge(enrollments_by_student, on="student_id", how="left")
+              .merge(activity_by_student, on="student_id", how="left"))
+        df["courses_enrolled"] = df["courses_enrolled"].fillna(0).astype("int64")
+        return df[["student_id", "student_name", "total_paid", "courses_enrolled",
+                   "avg_quiz_score", "avg_assignment_score", "total_video_minutes"]]
+
+    build("student_dashboard", student_dashboard)
+
+    build("top5_courses_by_revenue", lambda: gold["payments_per_course"]
+          [["course_id", "course_title", "total_revenue"]].head(5))
+
+    build("age_distribution", lambda: students.assign(age_group=age_group(students["age"]))
+          .groupby("age_group").size().rename("total_students").reset_index())
+
+    return gold
+
+
+def build_gold_frames(csv_folder, workers=1, output_folder=None):
+    """Clean the raw CSVs and compute every gold table in this process; nothing touches the database."""
+    start = time.perf_counter()
+    with track("stage", "gold", backend="pandas") as stage:
+        silver = load_silver_frames(csv_folder)
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                gold = gold_frames(silver, pool, workers)
+        else:
+            gold = gold_frames(silver)
+        stage["rows_out"] = sum(len(df) for df in gold.values())
+
+    if output_folder:
+        os.makedirs(output_folder, exist_ok=True)
+        for name, df in gold.items():
+            df.to_csv(os.path.join(output_folder, f"{name}.csv"), index=False)
+    print(f"✅ Gold computed in-process: {len(gold)} tables in {time.perf_counter() - start:.2f}s "
+          f"with {workers} worker(s)")
+    return gold
+
+
+def compare_frames(expected, actual, keys):
+    """Order-independent comparison; numbers match to 1e-9 relative (NUMERIC vs float sums)."""
+    if list(expected.columns) != list(actual.columns):
+        return f"columns differ: {list(expected.columns)} vs {list(actual.columns)}"
+    if len(expected) != len(actual):
+        return f"row count differs: {len(expected)} vs {len(actual)}"
+
+    expected = expected.sort_values(keys, key=lambda column: column.astype(str), ignore_index=True)
+    actual = actual.sort_values(keys, key=lambda column: column.astype(str), ignore_index=True)
+    for column in expected.columns:
+        left, right = expected[column], actual[column]
+        numeric_left, numeric_right = pd.to_numeric(left, errors="coerce"), pd.to_numeric(right, errors="coerce")
+        if numeric_left.notna().sum() == left.notna().sum() and numeric_right.notna().sum() == right.notna().sum():
+            same = np.isclose(numeric_left.astype(float), numeric_right.astype(float), rtol=1e-9, equal_nan=True)
+        else:
+            same = (left.isna() & right.isna()) | (left.astype(str) == right.astype(str))
+        if not same.all():
+            return f"{column} differs in {int((~same).sum())} row(s)"
+    return None
+
+
+def check_parity(gold, engine):
+    """Compare each in-process table with gold.<table> as built by gold/etl.py.
+    Returns {table: None if identical, else what differs}."""
+    differences = {}
+    for name, df in gold.items():
+        try:
+            stored = pd.read_sql(f"SELECT * FROM gold.{name}", engine)
+        except Exception as e:
+            differences[name] = f"not readable: {e}"
+            continue
+        differences[name] = compare_frames(stored, df, GOLD_KEYS[name])
+
+    for name, difference in differences.items():
+        print(f"{'✅' if difference is None else '❌'} {name}: {difference or 'identical'}")
+    return differences
@@ -0,0 +1,121 @@
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from db import get_pool
+from run_metrics import track
+
+# -------------------------------
+# Gold tables as a dependency DAG
+# -------------------------------
+# sql: statement(s) that (re)build the table, run in one transaction
+# depends_on: gold tables that must be built first
+GoldTable = namedtuple("GoldTable", ["name", "sql", "depends_on"])
+
+DEFAULT_WORKERS = 4
+
+
+def check_dag(tables):
+    """Validate the dependencies and return the table names in a valid build order."""
+    names = {table.name for table in tables}
+    for table in tables:
+        missing = set(table.depends_on) - names
+        if missing:
+            raise ValueError(f"{table.name} depends on undeclared tables: {sorted(missing)}")
+
+    # Kahn's algorithm: anything left over sits on a cycle
+    order = []
+    remaining = {table.name: set(table.depends_on) for table in tables}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"Dependency cycle between: {sorted(remaining)}")
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+        order.extend(ready)
+    return order
+
+
+def stale_tables(tables, inputs, changed):
+    """Names of tables that read a changed input ({table: [source tables]}), directly
+    or through an upstream gold table that has to be rebuilt."""
+    by_name = {table.name: table for table in tables}
+    stale = set()
+    for name in check_dag(tables):
+        if set(inputs.get(name, [])) & set(changed) or set(by_name[name].depends_on) & stale:
+            stale.add(name)
+    return stale
+
+
+def subset(tables, names):
+    # Dependencies outside the subset are already built, so they no longer gate anything
+    return [
+        GoldTable(table.name, table.sql, [dep for dep in table.depends_on if dep in names])
+        for table in tables if table.name in names
+    ]
+
+
+def run_dag(tables, workers=DEFAULT_WORKERS):
+    """Build every table once its dependencies succeeded, running independent
+    tables concurrently on a pool of `workers` connections.
+
+    Returns {table name: "ok" | "failed" | "skipped"}.
+    """
+    check_dag(tables)
+    pool = get_pool(workers)
+
+    def build(table):
+        conn = pool.getconn()
+        start = time.perf_counter()
+        try:
+            with track("gold_table", table.name) as event, conn.cursor() as cur:
+                cur.execute(table.sql)
+                event["statements"] = 1
+                event["rows_out"] = cur.rowcount if cur.rowcount >= 0 else None
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            pool.putconn(conn)
+        return time.perf_counter() - start
+
+    status = {}
+    pending = {table.name: table for table in tables}
+    running = {}
+    start = time.perf_counter()
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while pending or running:
+                # Skip anything downstream of a failure
+                for name, table in list(pending.items()):
+                    if any(status.get(dep) in ("failed", "skipped") for dep in table.depends_on):
+                        status[name] = "skipped"
+                        del pending[name]
+                        print(f"⏭️ {name} skipped (upstream failed)")
+
+                for name, table in list(pending.items()):
+                    if all(status.get(dep) == "ok" for dep in table.depends_on):
+                        running[executor.submit(build, table)] = name
+                        del pending[name]
+
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        elapsed = future.result()
+                        status[name] = "ok"
+                        print(f"✅ {name} built in {elapsed:.2f}s")
+                    except Exception as e:
+                        status[name] = "failed"
+                        print(f"❌ {name} failed: {e}")
+    finally:
+        pool.closeall()
+
+    print(f"⏱️ Gold DAG finished in {time.perf_counter() - start:.2f}s with {workers} workers")
+    return status
@@ -1,182 +1,358 @@
-import psycopg2
-
-# -------------------------------
-# Connect to PostgreSQL
-# -------------------------------
-connection = psycopg2.connect(
-    dbname="mydb",                # database name
-    user="keerthana.s",           # your username
-    password="MyStrongPassword123",  # your password
-    host="localhost",
-    port="5432"
-)
-connection.autocommit = True
-cursor = connection.cursor()
-print("✅ Connected to PostgreSQL successfully!")
+import argparse
+import os
+import sys
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from db import connection, dispose, get_engine
+from gold.gold_dag import GoldTable, run_dag, DEFAULT_WORKERS
+from gold.publish import publish_gold
+from silver.partitions import recent_since
+from silver.rollups import ensure_rollups
+from run_metrics import track, statement_name
 
 # -------------------------------
 # Helper function to run SQL
 # -------------------------------
 def run_sql(query: str):
     try:
-        cursor.execute(query)
+        with connection() as conn, conn.cursor() as cursor:
+            with track("sql", statement_name(query), statements=1):
+                cursor.execute(query)
+            conn.commit()
         print("✅ Query executed successfully!")
     except Exception as e:
         print(f"⚠️ Error running query: {e}")
 
 
 # -------------------------------
-# Build Gold Schema & Tables
+# Gold tables (all independent, so they build concurrently)
 # -------------------------------
-def build_gold():
-    # Create gold schema
-    run_sql("CREATE SCHEMA IF NOT EXISTS gold;")
-
+# Joins compare the integer surrogate keys (silver/surrogate_keys.py), not the text IDs.
+# Each table is dropped and recreated in one transaction, so a rebuild replaces stale rows.
+# Revenue counts paid payments: status 'Success' (the source also has Pending and Failed).
+GOLD_TABLES = [
     # 1. Total enrollments per course
-    run_sql("""
-    CREATE TABLE IF NOT EXISTS gold.enrollments_per_course AS
-    SELECT 
-        c.course_title,
-        COUNT(e.enrollment_id) AS total_enrollments
-    FROM silver.courses c
-    LEFT JOIN silver.enrollments e ON c.course_id = e.course_id
-    GROUP BY c.course_title
-    ORDER BY total_enrollments DESC;
-    """)
+    GoldTable("enrollments_per_course", """
+        DROP TABLE IF EXISTS gold.enrollments_per_course;
+        CREATE TABLE gold.enrollments_per_course AS
+        SELECT 
+            c.course_title,
+            COUNT(e.enrollment_id) AS total_enrollments
+        FROM silver.courses c
+        LEFT JOIN silver.enrollments e ON c.course_key = e.course_key
+        GROUP BY c.course_title
+        ORDER BY total_enrollments DESC;
+    """, []),
 
     # 2. Revenue per course
-    run_sql("""
-    CREATE TABLE IF NOT EXISTS gold.revenue_per_course AS
-    SELECT
-        c.course_title,
-        SUM(p.amount) AS total_revenue
-    FROM silver.courses c
-    JOIN silver.payments p ON c.course_id = p.course_id
-    WHERE p.status = 'completed'
-    GROUP BY c.course_title
-    ORDER BY total_revenue DESC;
-    """)
+    GoldTable("revenue_per_course", """
+        DROP TABLE IF EXISTS gold.revenue_per_course;
+        CREATE TABLE gold.revenue_per_course AS
+        SELECT
+            c.course_title,
+            SUM(p.amount_usd) AS total_revenue
+        FROM silver.courses c
+        JOIN silver.payments p ON c.course_key = p.course_key
+        WHERE p.status = 'Success'
+        GROUP BY c.course_title
+        ORDER BY total_revenue DESC;
+    """, []),
 
     # 3. Enrollments per instructor
-    run_sql("""
-    CREATE TABLE IF NOT EXISTS gold.enrollments_per_instructor AS
-    SELECT
-        i.name AS instructor_name,
-        i.expertise_area,
-        COUNT(e.enrollment_id) AS total_enrollments
-    FROM silver.instructors i
-    LEFT JOIN silver.courses c ON i.instructor_id = c.instructor_id
-    LEFT JOIN silver.enrollments e ON c.course_id = e.course_id
-    GROUP BY i.name, i.expertise_area
-    ORDER BY total_enrollments DESC;
-    """)
+    GoldTable("enrollments_per_instructor", """
+        DROP TABLE IF EXISTS gold.enrollments_per_instructor;
+        CREATE TABLE gold.enrollments_per_instructor AS
+        SELECT
+            i.name AS instructor_name,
+            i.expertise_area,
+            COUNT(e.enrollment_id) AS total_enrollments
+        FROM silver.instructors i
+        LEFT JOIN silver.courses c ON i.instructor_key = c.instructor_key
+        LEFT JOIN silver.enrollments e ON c.course_key = e.course_key
+        GROUP BY i.name, i.expertise_area
+        ORDER BY total_enrollments DESC;
+    """, []),
 
     # 4. Dashboard summary
-    run_sql("""
-    CREATE TABLE IF NOT EXISTS gold.dashboard_table AS
-    SELECT
-        COUNT(DISTINCT s.student_id) AS total_students,
-        COUNT(DISTINCT i.instructor_id) AS total_instructors,
-        COUNT(DISTINCT c.course_id) AS total_courses,
-        COUNT(DISTINCT e.enrollment_id) AS total_enrollments,
-        SUM(p.amount) AS total_revenue
-    FROM silver.students s
-    LEFT JOIN silver.enrollments e ON s.student_id = e.student_id
-    LEFT JOIN silver.courses c ON e.course_id = c.course_id
-    LEFT JOIN silver.instructors i ON c.instructor_id = i.instructor_id
-    LEFT JOIN silver.payments p ON e.course_id = p.course_id;
-    """)
+    GoldTable("dashboard_table", """
+        DROP TABLE IF EXISTS gold.dashboard_table;
+        CREATE TABLE gold.dashboard_table AS
+        SELECT
+            COUNT(DISTINCT s.student_id) AS total_students,
+            COUNT(DISTINCT i.instructor_id) AS total_instructors,
+            COUNT(DISTINCT c.course_id) AS total_courses,
+            COUNT(DISTINCT e.enrollment_id) AS total_enrollments,
+            SUM(p.amount_usd) AS total_revenue
+        FROM silver.students s
+        LEFT JOIN silver.enrollments e ON s.student_key = e.student_key
+        LEFT JOIN silver.courses c ON e.course_key = c.course_key
+        LEFT JOIN silver.instructors i ON c.instructor_key = i.instructor_key
+        LEFT JOIN silver.payments p ON e.course_key = p.course_key;
+    """, []),
 
     # 5. Student activity per course
-    run_sql("""
-    CREATE TABLE IF NOT EXISTS gold.student_activity_summary AS
-    SELECT
-        s.student_id,
-        s.name AS student_name,
-        c.course_title,
-        SUM(a.video_watched_min) AS total_minutes_watched,
-        AVG(a.quiz_score) AS avg_quiz_score,
-        AVG(a.assignment_score) AS avg_assignment_score
-    FROM silver.students s
-    JOIN silver.activity a ON s.student_id = a.student_id
-    JOIN silver.courses c ON a.course_id = c.course_id
-    GROUP BY s.student_id, s.name, c.course_title;
-    """)
+    GoldTable("student_activity_summary", """
+        DROP TABLE IF EXISTS gold.student_activity_summary;
+        CREATE TABLE gold.student_activity_summary AS
+        SELECT
+            s.student_id,
+            s.name AS student_name,
+            c.course_title,
+            SUM(a.video_watched_min) AS total_minutes_watched,
+            AVG(a.quiz_score) AS avg_quiz_score,
+            AVG(a.assignment_score) AS avg_assignment_score
+        FROM silver.students s
+        JOIN silver.activity a ON s.student_key = a.student_key
+        JOIN silver.courses c ON a.course_key = c.course_key
+        GROUP BY s.student_id, s.name, c.course_title;
+    """, []),
 
     # 6. Top courses by enrollments
-    run_sql("""
-    CREATE TABLE IF NOT EXISTS gold.top_courses AS
-    SELECT 
-        c.course_id,
-        c.course_title,
-        COUNT(e.enrollment_id) AS total_enrollments
-    FROM silver.courses c
-    JOIN silver.enrollments e ON c.course_id = e.course_id
-    GROUP BY c.course_id, c.course_title
-    ORDER BY total_enrollments DESC
-    LIMIT 5;
-    """)
+    GoldTable("top_courses", """
+        DROP TABLE IF EXISTS gold.top_courses;
+        CREATE TABLE gold.top_courses AS
+        SELECT 
+            c.course_id,
+            c.course_title,
+            COUNT(e.enrollment_id) AS total_enrollments
+        FROM silver.courses c
+        JOIN silver.enrollments e ON c.course_key = e.course_key
+        GROUP BY c.course_id, c.course_title
+        ORDER BY total_enrollments DESC
+        LIMIT 5;
+    """, []),
 
     # 7. Revenue by country
-    run_sql("""
-    CREATE TABLE IF NOT EXISTS gold.revenue_by_country AS
-    SELECT
-        s.country,
-        SUM(p.amount) AS total_revenue
-    FROM silver.students s
-    JOIN silver.payments p ON s.student_id = p.student_id
-    WHERE p.status = 'completed'
-    GROUP BY s.country
-    ORDER BY total_revenue DESC;
-    """)
+    GoldTable("revenue_by_country", """
+        DROP TABLE IF EXISTS gold.revenue_by_country;
+        CREATE TABLE gold.revenue_by_country AS
+        SELECT
+            s.country,
+            SUM(p.amount_usd) AS total_revenue
+        FROM silver.students s
+        JOIN silver.payments p ON s.student_key = p.student_key
+        WHERE p.status = 'Success'
+        GROUP BY s.country
+        ORDER BY total_revenue DESC;
+    """, []),
 
     # 8. Yearly enrollments
-    run_sql("""
-    CREATE TABLE IF NOT EXISTS gold.yearly_enrollments AS
-    SELECT
-        EXTRACT(YEAR FROM enrollment_date) AS year,
-        COUNT(*) AS total_enrollments
-    FROM silver.enrollments
-    GROUP BY year
-    ORDER BY year;
-    """)
+    GoldTable("yearly_enrollments", """
+        DROP TABLE IF EXISTS gold.yearly_enrollments;
+        CREATE TABLE gold.yearly_enrollments AS
+        SELECT
+            EXTRACT(YEAR FROM enrollment_date) AS year,
+            COUNT(*) AS total_enrollments
+        FROM silver.enrollments
+        GROUP BY year
+        ORDER BY year;
+    """, []),
 
     # 9. Top instructors by revenue
-    run_sql("""
-    CREATE TABLE IF NOT EXISTS gold.top_instructors AS
-    SELECT
-        i.instructor_id,
-        i.name AS instructor_name,
-        SUM(p.amount) AS total_revenue
-    FROM silver.instructors i
-    JOIN silver.courses c ON i.instructor_id = c.instructor_id
-    JOIN silver.payments p ON c.course_id = p.course_id
-    WHERE p.status = 'completed'
-    GROUP BY i.instructor_id, i.name
-    ORDER BY total_revenue DESC
-    LIMIT 5;
-    """)
+    GoldTable("top_instructors", """
+        DROP TABLE IF EXISTS gold.top_instructors;
+        CREATE TABLE gold.top_instructors AS
+        SELECT
+            i.instructor_id,
+            i.name AS instructor_name,
+            SUM(p.amount_usd) AS total_revenue
+        FROM silver.instructors i
+        JOIN silver.courses c ON i.instructor_key = c.instructor_key
+        JOIN silver.payments p ON c.course_key = p.course_key
+        WHERE p.status = 'Success'
+        GROUP BY i.instructor_id, i.name
+        ORDER BY total_revenue DESC
+        LIMIT 5;
+    """, []),
 
     # 10. Course difficulty distribution
-    run_sql("""
-    CREATE TABLE IF NOT EXISTS gold.course_difficulty_distribution AS
-    SELECT
-        difficulty_level,
-        COUNT(*) AS total_courses
-    FROM silver.courses
-    GROUP BY difficulty_level
-    ORDER BY total_courses DESC;
+    GoldTable("course_difficulty_distribution", """
+        DROP TABLE IF EXISTS gold.course_difficulty_distribution;
+        CREATE TABLE gold.course_difficulty_distribution AS
+        SELECT
+            difficulty_level,
+            COUNT(*) AS total_courses
+        FROM silver.courses
+        GROUP BY difficulty_level
+        ORDER BY total_courses DESC;
+    """, [])
+]
+
+
+# -------------------------------
+# The same tables read from the daily rollups (silver/rollups.py)
+# -------------------------------
+# Counts and sums of the rollups add up to exactly what the fact scans return; SUM over
+# BIGINT counts yields NUMERIC, hence the casts back to COUNT's BIGINT. Per-student tables
+# keep scanning the facts: there is no rollup at that grain.
+ROLLUP_SQL = {
+    "enrollments_per_course": """
+        DROP TABLE IF EXISTS gold.enrollments_per_course;
+        CREATE TABLE gold.enrollments_per_course AS
+        SELECT
+            c.course_title,
+            COALESCE(SUM(e.enrollments), 0)::BIGINT AS total_enrollments
+        FROM silver.courses c
+        LEFT JOIN rollup.enrollments_daily e ON c.course_key = e.course_key
+        GROUP BY c.course_title
+        ORDER BY total_enrollments DESC;
+    """,
+    "revenue_per_course": """
+        DROP TABLE IF EXISTS gold.revenue_per_course;
+        CREATE TABLE gold.revenue_per_course AS
+        SELECT
+            c.course_title,
+            SUM(p.amount_usd) AS total_revenue
+        FROM silver.courses c
+        JOIN rollup.payments_daily p ON c.course_key = p.course_key
+        WHERE p.status = 'Success'
+        GROUP BY c.course_title
+        ORDER BY total_revenue DESC;
+    """,
+    "enrollments_per_instructor": """
+        DROP TABLE IF EXISTS gold.enrollments_per_instructor;
+        CREATE TABLE gold.enrollments_per_instructor AS
+        SELECT
+            i.name AS instructor_name,
+            i.expertise_area,
+            COALESCE(SUM(e.enrollments), 0)::BIGINT AS total_enrollments
+        FROM silver.instructors i
+        LEFT JOIN silver.courses c ON i.instructor_key = c.instructor_key
+        LEFT JOIN rollup.enrollments_daily e ON c.course_key = e.course_key
+        GROUP BY i.name, i.expertise_area
+        ORDER BY total_enrollments DESC;
+    """,
+    "top_courses": """
+        DROP TABLE IF EXISTS gold.top_courses;
+        CREATE TABLE gold.top_courses AS
+        SELECT
+            c.course_id,
+            c.course_title,
+            SUM(e.enrollments)::BIGINT AS total_enrollments
+        FROM silver.courses c
+        JOIN rollup.enrollments_daily e ON c.course_key = e.course_key
+        GROUP BY c.course_id, c.course_title
+        ORDER BY total_enrollments DESC
+        LIMIT 5;
+    """,
+    "yearly_enrollments": """
+        DROP TABLE IF EXISTS gold.yearly_enrollments;
+        CREATE TABLE gold.yearly_enrollments AS
+        SELECT
+            EXTRACT(YEAR FROM day) AS year,
+            SUM(enrollments)::BIGINT AS total_enrollments
+        FROM rollup.enrollments_daily
+        GROUP BY year
+        ORDER BY year;
+    """,
+    "top_instructors": """
+        DROP TABLE IF EXISTS gold.top_instructors;
+        CREATE TABLE gold.top_instructors AS
+        SELECT
+            i.instructor_id,
+            i.name AS instructor_name,
+            SUM(p.amount_usd) AS total_revenue
+        FROM silver.instructors i
+        JOIN silver.courses c ON i.instructor_key = c.instructor_key
+        JOIN rollup.payments_daily p ON c.course_key = p.course_key
+        WHERE p.status = 'Success'
+        GROUP BY i.instructor_id, i.name
+        ORDER BY total_revenue DESC
+        LIMIT 5;
+    """
+}
+
+SOURCES = ["rollups", "silver"]
+
+
+def gold_tables(source="rollups"):
+    """GOLD_TABLES, with the tables that have a rollup form reading the rollups instead of the facts."""
+    if source == "silver":
+        return GOLD_TABLES
+    return [GoldTable(table.name, ROLLUP_SQL.get(table.name, table.sql), table.depends_on) for table in GOLD_TABLES]
+
+
+# -------------------------------
+# Period tables refreshed from the newest silver partitions only
+# -------------------------------
+# name -> (period column, partitioned silver table, SELECT of the rows from {since} on).
+# The date predicate lets PostgreSQL skip every older partition.
+RECENT_REFRESH = {
+    "yearly_enrollments": ("year", "enrollments", """
+        SELECT
+            EXTRACT(YEAR FROM enrollment_date) AS year,
+            COUNT(*) AS total_enrollments
+        FROM silver.enrollments
+        WHERE enrollment_date >= DATE '{since}'
+        GROUP BY year
     """)
+}
+
+
+def recent_refresh_tables(partitions):
+    """GoldTables that recompute the years covered by the `partitions` newest partitions
+    (rounded down to whole years); a table that doesn't exist yet gets its full build."""
+    engine = get_engine()
+    full_builds = {table.name: table for table in GOLD_TABLES}
+    tables = []
+    for name, (period, source, select_sql) in RECENT_REFRESH.items():
+        since = recent_since(engine, source, partitions)
+        with connection() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (f"gold.{name}",))
+            exists = cursor.fetchone()[0]
+        if since is None or not exists:
+            tables.append(full_builds[name])
+            continue
+        since = since.replace(month=1, day=1)
+        tables.append(GoldTable(name, f"""
+            DELETE FROM gold.{name} WHERE {period} >= {since.year};
+            INSERT INTO gold.{name}
+            {select_sql.format(since=since)};
+        """, []))
+        print(f"   {name}: refreshing from {since} (newest {partitions} partition(s) of silver.{source})")
+    return tables
+
+
+# -------------------------------
+# Build Gold Schema & Tables
+# -------------------------------
+def build_gold(workers=DEFAULT_WORKERS, publish=False, recent_partitions=None, source="rollups"):
+    # Create gold schema
+    run_sql("CREATE SCHEMA IF NOT EXISTS gold;")
+    if source == "rollups":
+        ensure_rollups(get_engine())
+    tables = gold_tables(source)
+
+    with track("stage", "gold", backend="publish" if publish else "tables", source=source):
+        if publish:
+            status = publish_gold(tables, workers=workers)
+        elif recent_partitions:
+            status = run_dag(recent_refresh_tables(recent_partitions), workers=workers)
+        else:
+            status = run_dag(tables, workers=workers)
 
-    print("🎉 Gold tables created successfully!")
+    failed = sorted(name for name, result in status.items() if result != "ok")
+    if failed:
+        print(f"❌ Gold tables failed: {', '.join(failed)}")
+    else:
+        print("🎉 Gold tables created successfully!")
 
 
 # -------------------------------
 # Run the build_gold function
 # -------------------------------
 if __name__ == "__main__":
-    build_gold()
-    cursor.close()
-    connection.close()
+    parser = argparse.ArgumentParser(description="Build the gold tables")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="gold tables built concurrently")
+    parser.add_argument("--publish", action="store_true",
+                        help="rebuild every table into a staging schema, validate, then swap it in for gold")
+    parser.add_argument("--recent-partitions", type=int,
+                        help="only refresh the period tables, from this many of the newest silver partitions")
+    parser.add_argument("--source", choices=SOURCES, default="rollups",
+                        help="rollups: aggregate the daily rollups; silver: scan the silver fact tables")
+    args = parser.parse_args()
+    build_gold(workers=args.workers, publish=args.publish, recent_partitions=args.recent_partitions,
+               source=args.source)
+    dispose()
     print("🔒 PostgreSQL connection closed.")
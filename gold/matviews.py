@@ -0,0 +1,61 @@
+from collections import namedtuple
+
+from db import connection
+from gold.gold_dag import GoldTable
+
+# -------------------------------
+# Gold aggregates as materialized views
+# -------------------------------
+# REFRESH ... CONCURRENTLY swaps in the new contents without an exclusive lock, so readers
+# keep seeing the previous data until the refresh commits. It needs a unique index on each view.
+MatView = namedtuple("MatView", ["name", "select_sql", "unique_key", "depends_on"])
+
+
+def relkinds(schema="gold"):
+    # pg_class.relkind: r = table, m = materialized view, v = view
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT c.relname, c.relkind
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = %s AND c.relkind IN ('r', 'm', 'v')
+        """, (schema,))
+        return dict(cur.fetchall())
+
+
+def create_sql(view, schema="gold"):
+    key = ", ".join(view.unique_key)
+    return f"""
+    CREATE MATERIALIZED VIEW {schema}.{view.name} AS
+    {view.select_sql}
+    WITH DATA;
+    CREATE UNIQUE INDEX {view.name}_key ON {schema}.{view.name} ({key});
+    """
+
+
+def matview_dag(views, schema="gold"):
+    """One GoldTable per view: missing views (or tables left by the table backend)
+    are created, existing views are refreshed concurrently."""
+    existing = relkinds(schema)
+    tables = []
+    for view in views:
+        kind = existing.get(view.name)
+        if kind == "m":
+            sql = f"REFRESH MATERIALIZED VIEW CONCURRENTLY {schema}.{view.name};"
+        elif kind == "r":
+            sql = f"DROP TABLE {schema}.{view.name};" + create_sql(view, schema)
+        else:
+            sql = create_sql(view, schema)
+        tables.append(GoldTable(view.name, sql, view.depends_on))
+    return tables
+
+
+def drop_matviews(names, schema="gold"):
+    """Drop the given materialized views, so the table backend can recreate them as tables."""
+    existing = relkinds(schema)
+    dropped = [name for name in names if existing.get(name) == "m"]
+    if dropped:
+        with connection() as conn, conn.cursor() as cur:
+            cur.execute(f"DROP MATERIALIZED VIEW {', '.join(f'{schema}.{name}' for name in dropped)} CASCADE;")
+            conn.commit()
+    return dropped
@@ -1,18 +1,28 @@
 import pandas as pd
-import psycopg2
+import argparse
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from db import get_engine, dispose
+from gold.export_parquet import export_table_parquet, DEFAULT_CHUNKSIZE, DEFAULT_COMPRESSION
+from gold.export_copy import export_tables, DEFAULT_WORKERS
+
+parser = argparse.ArgumentParser(description="Export the gold tables to files")
+parser.add_argument("--format", choices=["csv", "parquet", "copy"], default="csv",
+                    help="output file format (copy: CSV streamed by the server with COPY TO, tables in parallel)")
+parser.add_argument("--compression", default=DEFAULT_COMPRESSION, help="Parquet compression codec")
+parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="rows fetched per chunk for Parquet")
+parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="tables exported concurrently with copy")
+parser.add_argument("--force", action="store_true", help="re-export tables even if unchanged since the last copy export")
+args = parser.parse_args()
 
 # Output folder (Downloads/gold_csv)
 output_folder = "/home/nineleaps/Downloads/gold_csv"
 os.makedirs(output_folder, exist_ok=True)
 
-# DB connection
-conn = psycopg2.connect(
-    host="localhost",
-    database="mydb",
-    user="keerthana.s",
-    password="MyStrongPassword123"
-)
+# DB connection (shared pooled engine, settings in db.py)
+engine = get_engine()
 
 # Gold tables list for education schema
 tables = [
@@ -29,17 +39,33 @@ tables = [
 ]
 
 # Export loop
-for table in tables:
-    try:
-        df = pd.read_sql(f"SELECT * FROM gold.{table};", conn)
-        if not df.empty:
-            filepath = f"{output_folder}/{table}.csv"
-            df.to_csv(filepath, index=False)
-            print(f"{table}.csv exported to {filepath} successfully!")
-        else:
-            print(f"⚠️ {table} exists but is empty.")
-    except Exception as e:
-        print(f"⚠️ Skipping {table}: {e}")
+if args.format == "copy":
+    # Unchanged tables (same row count and content hash) are skipped
+    export_tables(tables, output_folder, workers=args.workers, force=args.force)
+else:
+    for table in tables:
+        if args.format == "parquet":
+            try:
+                rows = export_table_parquet(engine, table, output_folder, chunksize=args.chunksize,
+                                            compression=args.compression)
+                if rows:
+                    print(f"{table} exported to Parquet ({rows} rows) successfully!")
+                else:
+                    print(f"⚠️ {table} exists but is empty.")
+            except Exception as e:
+                print(f"⚠️ Skipping {table}: {e}")
+            continue
+
+        try:
+            df = pd.read_sql(f"SELECT * FROM gold.{table};", engine)
+            if not df.empty:
+                filepath = f"{output_folder}/{table}.csv"
+                df.to_csv(filepath, index=False)
+                print(f"{table}.csv exported to {filepath} successfully!")
+            else:
+                print(f"⚠️ {table} exists but is empty.")
+        except Exception as e:
+            print(f"⚠️ Skipping {table}: {e}")
 
 # Close connection
-conn.close()
+dispose()
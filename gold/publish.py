@@ -0,0 +1,182 @@
+import re
+
+from db import connection
+from gold.gold_dag import GoldTable, run_dag, DEFAULT_WORKERS
+from run_metrics import track
+
+# -------------------------------
+# Atomic publish: build into a shadow schema, validate, swap
+# -------------------------------
+LIVE_SCHEMA = "gold"
+STAGING_SCHEMA = "gold_staging"
+PREVIOUS_SCHEMA = "gold_previous"   # kept until the next publish, for a quick manual rollback
+
+# A staged table may not lose more than this share of the live table's rows
+DEFAULT_MAX_SHRINK = 0.5
+# Gold tables that may publish empty, e.g. when their filter can legitimately match nothing;
+# an empty staged table outside this list blocks the publish
+ALLOWED_EMPTY = set()
+LOCK_TIMEOUT = "5s"
+
+RELATION_TYPES = {"r": "TABLE", "v": "VIEW", "m": "MATERIALIZED VIEW"}
+
+# Pieces of the GRANT statements generated from an aclexplode() row `a`
+GRANTEE = "CASE WHEN a.grantee = 0 THEN 'PUBLIC' ELSE quote_ident(pg_get_userbyid(a.grantee)) END"
+GRANT_OPTION = "CASE WHEN a.is_grantable THEN ' WITH GRANT OPTION' ELSE '' END"
+DEFAULT_ACL_OBJECTS = "CASE d.defaclobjtype WHEN 'r' THEN 'TABLES' WHEN 'S' THEN 'SEQUENCES' " \
+                      "WHEN 'f' THEN 'FUNCTIONS' WHEN 'T' THEN 'TYPES' END"
+
+
+def shadow_sql(sql, schema=STAGING_SCHEMA):
+    # Every gold.<name> reference (targets and gold-on-gold reads) points at the shadow schema
+    return re.sub(r"\bgold\.", f"{schema}.", sql)
+
+
+def execute(*statements):
+    with connection() as conn, conn.cursor() as cur:
+        for statement in statements:
+            cur.execute(statement)
+        conn.commit()
+
+
+def table_counts(schema, names):
+    counts = {}
+    with connection() as conn, conn.cursor() as cur:
+        for name in names:
+            cur.execute("SELECT to_regclass(%s) IS NOT NULL", (f"{schema}.{name}",))
+            if cur.fetchone()[0]:
+                cur.execute(f"SELECT COUNT(*) FROM {schema}.{name}")
+                counts[name] = cur.fetchone()[0]
+    return counts
+
+
+def validate(names, max_shrink=DEFAULT_MAX_SHRINK, allowed_empty=ALLOWED_EMPTY):
+    """Every staged table must exist, hold rows (unless listed in allowed_empty), and not
+    shrink by more than max_shrink against the live table."""
+    staged = table_counts(STAGING_SCHEMA, names)
+    live = table_counts(LIVE_SCHEMA, names)
+    problems = []
+    for name in names:
+        rows, before = staged.get(name), live.get(name)
+        if rows is None:
+            problems.append(f"{name} missing")
+        elif rows == 0 and name not in allowed_empty:
+            problems.append(f"{name} empty")
+        elif before and rows < before * (1 - max_shrink):
+            problems.append(f"{name} shrank from {before} to {rows} rows")
+        print(f"   {name:<28} live {before if before is not None else '-':>10} staged {rows if rows is not None else '-':>10}")
+    return problems
+
+
+# -------------------------------
+# Privileges and dependencies: what a schema rename would otherwise lose
+# -------------------------------
+# Privileges belong to the schema and table objects, so the renamed-away live schema takes
+# them along; the staging schema and its fresh tables must be granted the same first.
+def schema_grant_statements(cur, source, target):
+    """GRANTs giving schema `target` the privileges and the default privileges of `source`."""
+    cur.execute(f"""
+        SELECT format('GRANT %%s ON SCHEMA %%I TO %%s%%s', a.privilege_type, %(target)s, {GRANTEE}, {GRANT_OPTION})
+        FROM pg_namespace n, aclexplode(n.nspacl) a
+        WHERE n.nspname = %(source)s AND a.grantee <> n.nspowner
+        UNION ALL
+        SELECT format('ALTER DEFAULT PRIVILEGES FOR ROLE %%I IN SCHEMA %%I GRANT %%s ON %%s TO %%s%%s',
+                      pg_get_userbyid(d.defaclrole), %(target)s, a.privilege_type, {DEFAULT_ACL_OBJECTS},
+                      {GRANTEE}, {GRANT_OPTION})
+        FROM pg_default_acl d
+        JOIN pg_namespace n ON n.oid = d.defaclnamespace, aclexplode(d.defaclacl) a
+        WHERE n.nspname = %(source)s
+    """, {"source": source, "target": target})
+    return [statement for (statement,) in cur.fetchall()]
+
+
+def table_grant_statements(cur, source, target, names):
+    """GRANTs repeating on target.<name> what source.<name> grants, for each of `names`."""
+    cur.execute(f"""
+        SELECT format('GRANT %%s ON %%I.%%I TO %%s%%s', a.privilege_type, %(target)s, c.relname,
+                      {GRANTEE}, {GRANT_OPTION})
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace, aclexplode(c.relacl) a
+        WHERE n.nspname = %(source)s AND c.relname = ANY(%(names)s) AND a.grantee <> c.relowner
+          AND to_regclass(format('%%I.%%I', %(target)s, c.relname)) IS NOT NULL
+    """, {"source": source, "target": target, "names": list(names)})
+    return [statement for (statement,) in cur.fetchall()]
+
+
+def outside_dependents(cur, schema, names=None):
+    """Views and materialized views that depend on tables of `schema` (only on `names` when
+    given) without being one of those tables themselves. They reference the tables by OID:
+    after a swap they would read the previous tables, and dropping those would drop them."""
+    cur.execute("""
+        SELECT DISTINCT format('%%I.%%I', vn.nspname, v.relname)
+        FROM pg_depend d
+        JOIN pg_rewrite w ON d.classid = 'pg_rewrite'::regclass AND w.oid = d.objid
+        JOIN pg_class v ON v.oid = w.ev_class
+        JOIN pg_namespace vn ON vn.oid = v.relnamespace
+        JOIN pg_class t ON d.refclassid = 'pg_class'::regclass AND t.oid = d.refobjid
+        JOIN pg_namespace tn ON tn.oid = t.relnamespace
+        WHERE tn.nspname = %(schema)s AND v.oid <> t.oid
+          AND (%(names)s::text[] IS NULL OR t.relname = ANY(%(names)s::text[]))
+          AND NOT (vn.nspname = %(schema)s AND (%(names)s::text[] IS NULL OR v.relname = ANY(%(names)s::text[])))
+        ORDER BY 1
+    """, {"schema": schema, "names": None if names is None else list(names)})
+    return [name for (name,) in cur.fetchall()]
+
+
+def dependency_problems(names):
+    with connection() as conn, conn.cursor() as cur:
+        live = outside_dependents(cur, LIVE_SCHEMA, names)
+        previous = outside_dependents(cur, PREVIOUS_SCHEMA)
+    problems = [f"{view} depends on a rebuilt {LIVE_SCHEMA} table (recreate it after publishing)" for view in live]
+    problems += [f"{view} depends on {PREVIOUS_SCHEMA}, which the publish drops" for view in previous]
+    return problems
+
+
+def swap(names):
+    """Move the staging schema into place in one short transaction. Live objects
+    this build does not produce are carried over, so other builders' tables survive,
+    and the rebuilt tables keep the grants of the tables they replace."""
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+        for statement in table_grant_statements(cur, LIVE_SCHEMA, STAGING_SCHEMA, names):
+            cur.execute(statement)
+        cur.execute("""
+            SELECT c.relname, c.relkind FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = %s AND c.relkind IN ('r', 'v', 'm') AND NOT (c.relname = ANY(%s))
+        """, (LIVE_SCHEMA, list(names)))
+        for other, kind in cur.fetchall():
+            cur.execute(f'ALTER {RELATION_TYPES[kind]} {LIVE_SCHEMA}."{other}" SET SCHEMA {STAGING_SCHEMA}')
+        cur.execute(f"ALTER SCHEMA {LIVE_SCHEMA} RENAME TO {PREVIOUS_SCHEMA}")
+        cur.execute(f"ALTER SCHEMA {STAGING_SCHEMA} RENAME TO {LIVE_SCHEMA}")
+        conn.commit()
+
+
+def publish_gold(tables, workers=DEFAULT_WORKERS, max_shrink=DEFAULT_MAX_SHRINK):
+    """Build `tables` into the staging schema, validate the row counts and swap it
+    in for the live gold schema. Returns the run_dag status; live gold is left
+    untouched if any table fails or fails validation."""
+    names = [table.name for table in tables]
+    execute(f"DROP SCHEMA IF EXISTS {STAGING_SCHEMA} CASCADE", f"CREATE SCHEMA {STAGING_SCHEMA}",
+            f"CREATE SCHEMA IF NOT EXISTS {LIVE_SCHEMA}")
+    # Before the build, so the staged tables are created under the live default privileges
+    with connection() as conn, conn.cursor() as cur:
+        for statement in schema_grant_statements(cur, LIVE_SCHEMA, STAGING_SCHEMA):
+            cur.execute(statement)
+        conn.commit()
+
+    status = run_dag([GoldTable(t.name, shadow_sql(t.sql), t.depends_on) for t in tables], workers=workers)
+    if any(result != "ok" for result in status.values()):
+        print(f"❌ Staged build failed, {LIVE_SCHEMA} left as it was.")
+        return status
+
+    problems = validate(names, max_shrink) + dependency_problems(names)
+    if problems:
+        print(f"❌ Validation failed, {LIVE_SCHEMA} left as it was: {'; '.join(problems)}")
+        return {name: "failed" for name in names}
+
+    with track("publish", LIVE_SCHEMA, statements=len(names)):
+        execute(f"DROP SCHEMA IF EXISTS {PREVIOUS_SCHEMA} CASCADE")
+        swap(names)
+    print(f"✅ {STAGING_SCHEMA} published as {LIVE_SCHEMA} (previous version kept in {PREVIOUS_SCHEMA})")
+    return status
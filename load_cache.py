@@ -0,0 +1,89 @@
+import hashlib
+import os
+
+from sqlalchemy import text
+
+# ---------------------------
+# Content-hash cache of raw input files
+# ---------------------------
+# One row per (layer, table): the file's size, mtime and content hash when it was last
+# loaded, and how many rows that load produced. An unchanged file skips the whole load.
+CACHE_SCHEMA = "meta"
+CACHE_TABLE = f"{CACHE_SCHEMA}.load_cache"
+
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def ensure_cache_table(engine):
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {CACHE_SCHEMA}"))
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {CACHE_TABLE} (
+                layer TEXT NOT NULL,
+                table_name TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size BIGINT NOT NULL,
+                mtime DOUBLE PRECISION NOT NULL,
+                content_hash TEXT NOT NULL,
+                rows BIGINT,
+                loaded_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                PRIMARY KEY (layer, table_name)
+            )
+        """))
+
+
+def content_hash(path):
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_signature(path, previous=None):
+    stat = os.stat(path)
+    signature = {"path": os.path.abspath(path), "size": stat.st_size, "mtime": stat.st_mtime}
+    # Same size and mtime as last time: trust the stored hash instead of re-reading the file
+    if previous and all(previous[key] == signature[key] for key in ("path", "size", "mtime")):
+        signature["content_hash"] = previous["content_hash"]
+    else:
+        signature["content_hash"] = content_hash(path)
+    return signature
+
+
+def cached_signatures(engine, layer):
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text(f"SELECT table_name, path, size, mtime, content_hash FROM {CACHE_TABLE} WHERE layer = :layer"),
+            {"layer": layer}
+        ).mappings()
+        return {row["table_name"]: dict(row) for row in rows}
+
+
+def changed_files(engine, layer, paths, force=False):
+    """Split {table: path} into ({table: signature} to load, [tables] unchanged since their last load)."""
+    previous = {} if force else cached_signatures(engine, layer)
+    changed, unchanged = {}, []
+    for table_name, path in paths.items():
+        before = previous.get(table_name)
+        signature = file_signature(path, before)
+        if before and before["path"] == signature["path"] and before["content_hash"] == signature["content_hash"]:
+            unchanged.append(table_name)
+            if before["mtime"] != signature["mtime"]:
+                # Touched but identical: remember the new mtime so the next run skips hashing
+                record_load(engine, layer, table_name, signature)
+        else:
+            changed[table_name] = signature
+    return changed, unchanged
+
+
+def record_load(engine, layer, table_name, signature, rows=None):
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            INSERT INTO {CACHE_TABLE} (layer, table_name, path, size, mtime, content_hash, rows)
+            VALUES (:layer, :table_name, :path, :size, :mtime, :content_hash, :rows)
+            ON CONFLICT (layer, table_name) DO UPDATE
+            SET path = EXCLUDED.path, size = EXCLUDED.size, mtime = EXCLUDED.mtime,
+                content_hash = EXCLUDED.content_hash, rows = COALESCE(EXCLUDED.rows, {CACHE_TABLE}.rows),
+                loaded_at = now()
+        """), {"layer": layer, "table_name": table_name, "rows": rows, **signature})
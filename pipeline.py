@@ -0,0 +1,368 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from threading import Lock
+
+from db import get_engine, connection, connect_count, POOL_SIZE
+from etl import BRONZE_TABLES, SILVER, SILVER_CSV_FOLDER, GOLD_INPUTS, GOLD_TABLES, existing_gold_tables, \
+    load_bronze_table, run_sql
+from bronze.stream_load import DEFAULT_CHUNKSIZE
+from bronze.arrow_cache import iter_arrow
+from silver.bulk_upsert import bulk_upsert, DEFAULT_BATCH_SIZE
+from silver.cleaning import SILVER_SPECS, read_raw, clean_frame
+from silver.validation import validate_frame, reference_keys, quarantine
+from silver.schema import (
+    SILVER_PRIMARY_KEYS, SILVER_UNIQUE_IDS, ensure_silver_tables, ensure_primary_keys, create_silver_indexes,
+    stored_frame
+)
+from silver.partitions import ensure_partitions_for, detached_before
+from silver.rollups import ensure_rollups, rollup_days, refresh_rollups
+from silver.fx import fx_rates, add_amount_usd, load_fx_rates
+from silver.surrogate_keys import add_surrogate_keys
+from gold.gold_dag import check_dag, stale_tables
+from changed_keys import ensure_changed_keys_table, record_changed_keys
+from load_cache import ensure_cache_table, changed_files, record_load
+from run_metrics import track, start_run, run_failed, write_prometheus_textfile
+from watermarks import (
+    WATERMARK_COLUMNS, ensure_state_table, get_watermark, set_watermark, rows_past_watermark, high_water
+)
+
+# ---------------------------
+# Asyncio pipeline runner: read chunk -> clean -> write, every table at once
+# ---------------------------
+# Each silver table is three tasks joined by bounded queues: once QUEUE_SIZE chunks wait
+# for the writer, the reader stops parsing, so memory stays at a few chunks per table.
+# Parsing and cleaning run on a thread pool; writes go through the pooled engine (db.py),
+# at most POOL_SIZE - 1 at a time so one connection stays free for watermarks and keys.
+# Bronze tables stream in the background, and each gold table starts as soon as the
+# silver and gold tables it reads are committed.
+DEFAULT_QUEUE_SIZE = 4
+DEFAULT_THREADS = 4
+BRONZE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bronze")
+
+
+class StageClock:
+    """Where one stage's time went: busy in the executor, idle waiting for input (or a
+    free connection), blocked waiting for room in the next queue."""
+
+    def __init__(self, name):
+        self.name = name
+        self.busy = self.idle = self.blocked = 0.0
+        self.chunks = 0
+
+    async def get(self, queue):
+        start = time.perf_counter()
+        item = await queue.get()
+        self.idle += time.perf_counter() - start
+        return item
+
+    async def put(self, queue, item):
+        start = time.perf_counter()
+        await queue.put(item)
+        self.blocked += time.perf_counter() - start
+
+    async def acquire(self, semaphore):
+        start = time.perf_counter()
+        await semaphore.acquire()
+        self.idle += time.perf_counter() - start
+
+    async def work(self, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = await offload(func, *args, **kwargs)
+        self.busy += time.perf_counter() - start
+        return result
+
+
+async def offload(func, *args, **kwargs):
+    # Everything blocking (parsing, pandas, database calls) runs on the loop's thread pool
+    return await asyncio.get_running_loop().run_in_executor(None, partial(func, *args, **kwargs))
+
+
+class AsyncPipeline:
+    def __init__(self, csv_folder, bronze_folder=None, full_refresh=False, force=False,
+                 chunksize=DEFAULT_CHUNKSIZE, batch_size=DEFAULT_BATCH_SIZE, queue_size=DEFAULT_QUEUE_SIZE):
+        if POOL_SIZE < 2:
+            raise ValueError("the async runner needs ETL_DB_POOL_SIZE >= 2 (one connection stays free for watermarks)")
+        self.csv_folder = csv_folder
+        self.bronze_folder = bronze_folder
+        self.full_refresh = full_refresh
+        self.force = force or full_refresh
+        self.chunksize = chunksize
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.engine = get_engine()
+        self.clocks = []
+        # meta.changed_keys is shared: concurrent upserts of overlapping keys could deadlock
+        self.changed_keys_lock = Lock()
+
+    # ---------------- Bronze: whole tables, streamed, one at a time ----------------
+    async def bronze_table(self, table_name, path, signature):
+        # A streamed bronze load creates its table and COPYs on one connection
+        async with self.bronze_lock, self.db_slots:
+            _, rows, _ = await offload(load_bronze_table, table_name, path, full_refresh=self.full_refresh,
+                                       stream=True, chunksize=self.chunksize, engine=self.engine,
+                                       signature=signature)
+        await offload(record_load, self.engine, "bronze", table_name, signature, rows)
+
+    # ---------------- Silver: read chunk -> validate + clean -> upsert ----------------
+    async def read_chunks(self, path, spec, signature, out, clock, state):
+        # Record batches of the memory-mapped Arrow copy when it matches the CSV, else parsed chunks
+        reader = await clock.work(iter_arrow, path, self.chunksize, spec["categoricals"], signature)
+        state["source"] = "csv" if reader is None else "arrow"
+        if reader is None:
+            reader = await clock.work(read_raw, path, spec, self.chunksize)
+        try:
+            while (chunk := await clock.work(next, reader, None)) is not None:
+                clock.chunks += 1
+                await clock.put(out, chunk)
+        finally:
+            reader.close()
+        await clock.put(out, None)
+
+    async def clean_chunks(self, table_name, key_sets, detached, rates, mark, inp, out, clock, state):
+        spec = SILVER_SPECS[table_name]
+        column = WATERMARK_COLUMNS[table_name]
+
+        def clean(chunk):
+            if mark is not None:
+                chunk = rows_past_watermark(chunk, column, mark)
+            valid, rejects = validate_frame(chunk, table_name, key_sets, detached)
+            # Chunks only drop duplicates among themselves; the upsert keeps the first across chunks
+            return add_amount_usd(clean_frame(valid, spec), spec, rates), rejects, len(chunk), high_water(chunk, column)
+
+        while (chunk := await clock.get(inp)) is not None:
+            df, rejects, rows_in, chunk_mark = await clock.work(clean, chunk)
+            clock.chunks += 1
+            state["rows_in"] += rows_in
+            if chunk_mark is not None and (state["mark"] is None or chunk_mark > state["mark"]):
+                state["mark"] = chunk_mark
+            await clock.put(out, (df, rejects))
+        await clock.put(out, None)
+
+    async def write_chunks(self, table_name, inp, clock, state):
+        def write(df, rejects):
+            # Unseen IDs get their keys here, while the chunk holds a connection slot
+            df = add_surrogate_keys(self.engine, df)
+            ensure_partitions_for(self.engine, table_name, df)
+            inserted, _ = bulk_upsert(self.engine, stored_frame(df, table_name), table_name,
+                                      SILVER_PRIMARY_KEYS[table_name], schema=SILVER,
+                                      batch_size=self.batch_size, unique_cols=SILVER_UNIQUE_IDS.get(table_name))
+            # Every row of the chunk counts, inserted or not, so a rerun after a failure
+            # between the upsert and the rollup refresh still refreshes those days
+            with self.changed_keys_lock:
+                record_changed_keys(self.engine, table_name, df)
+            return inserted, quarantine(self.engine, table_name, rejects, schema=SILVER), rollup_days(table_name, df)
+
+        while (item := await clock.get(inp)) is not None:
+            await clock.acquire(self.db_slots)
+            try:
+                inserted, rejected, days = await clock.work(write, *item)
+            finally:
+                self.db_slots.release()
+            clock.chunks += 1
+            state["rows_out"] += inserted
+            state["rows_rejected"] += rejected
+            state["days"].update(days)
+
+    async def silver_table(self, table_name, path, signature):
+        spec = SILVER_SPECS[table_name]
+        clocks = [StageClock(f"{table_name}.{stage}") for stage in ("read", "clean", "write")]
+        state = {"rows_in": 0, "rows_out": 0, "rows_rejected": 0, "mark": None, "days": set(), "source": None}
+
+        with track("table_load", f"silver.{table_name}", bytes_read=os.path.getsize(path), runner="async") as event:
+            try:
+                mark = None if self.full_refresh else await offload(get_watermark, self.engine, SILVER, table_name)
+                key_sets = await offload(reference_keys, self.engine, os.path.dirname(path), table_name)
+                detached = await offload(detached_before, self.engine, table_name)
+                rates = await offload(fx_rates, self.engine)
+
+                raw, cleaned = asyncio.Queue(self.queue_size), asyncio.Queue(self.queue_size)
+                async with asyncio.TaskGroup() as group:
+                    group.create_task(self.read_chunks(path, spec, signature, raw, clocks[0], state))
+                    group.create_task(self.clean_chunks(table_name, key_sets, detached, rates, mark, raw, cleaned,
+                                                        clocks[1], state))
+                    group.create_task(self.write_chunks(table_name, cleaned, clocks[2], state))
+
+                if state["mark"] is not None:
+                    await offload(set_watermark, self.engine, SILVER, table_name,
+                                  WATERMARK_COLUMNS[table_name], state["mark"])
+                # Daily rollups once per table, for every day any chunk touched
+                await offload(refresh_rollups, self.engine, table_name, sorted(state["days"]))
+                await offload(record_load, self.engine, SILVER, table_name, signature, state["rows_in"])
+                # Fresh statistics (and indexes) before any gold table reads it
+                await offload(create_silver_indexes, self.engine, [table_name])
+            finally:
+                event.update(rows_in=state["rows_in"], rows_out=state["rows_out"],
+                             rows_rejected=state["rows_rejected"], source=state["source"])
+                for kind in ("busy", "idle", "blocked"):
+                    event[f"{kind}_s"] = {clock.name.split(".")[1]: round(getattr(clock, kind), 4) for clock in clocks}
+                self.clocks.extend(clocks)
+        print(f"✅ {table_name}: {state['rows_out']} inserted, {state['rows_rejected']} rejected")
+
+    # ---------------- Gold: each table once its inputs are committed ----------------
+    def build_gold_table(self, table):
+        with track("gold_table", table.name, runner="async") as event, connection() as conn, conn.cursor() as cur:
+            try:
+                cur.execute(table.sql)
+                event["statements"] = 1
+                event["rows_out"] = cur.rowcount if cur.rowcount >= 0 else None
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    async def gold_table(self, table, rebuild):
+        inputs = GOLD_INPUTS.get(table.name, []) + list(table.depends_on)
+        results = await asyncio.gather(*(self.done[name] for name in inputs))
+        if any(result != "ok" for result in results):
+            print(f"⏭️ {table.name} skipped (upstream failed)")
+            return "skipped"
+        if table.name not in rebuild:
+            print(f"⏭️ {table.name} inputs unchanged, skipped")
+            return "ok"
+        clock = StageClock(f"{table.name}.gold")
+        await clock.acquire(self.db_slots)
+        try:
+            await clock.work(self.build_gold_table, table)
+            clock.chunks = 1
+        finally:
+            self.db_slots.release()
+        self.clocks.append(clock)
+        print(f"✅ {table.name} built in {clock.busy:.2f}s")
+        return "ok"
+
+    # ---------------- Orchestration ----------------
+    def finish(self, name, task):
+        # The outcome every downstream task waits on; failures are reported here, not raised
+        future = asyncio.get_running_loop().create_future()
+
+        def done(task):
+            if task.cancelled() or task.exception() is not None:
+                print(f"❌ {name} failed: {'cancelled' if task.cancelled() else task.exception()}")
+                future.set_result("failed")
+            else:
+                future.set_result(task.result() or "ok")
+
+        task.add_done_callback(done)
+        return future
+
+    async def run(self, threads=DEFAULT_THREADS):
+        # Every offloaded database call holds a pool connection and the pool never overflows, so
+        # threads beyond POOL_SIZE could only queue on the pool (and time out there)
+        if threads > POOL_SIZE:
+            print(f"⚠️ {threads} threads capped at ETL_DB_POOL_SIZE ({POOL_SIZE})")
+            threads = POOL_SIZE
+        self.threads = threads
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=threads))
+        self.db_slots = asyncio.Semaphore(POOL_SIZE - 1)
+        self.bronze_lock = asyncio.Lock()
+        engine = self.engine
+
+        await offload(ensure_state_table, engine)
+        await offload(ensure_changed_keys_table, engine)
+        await offload(ensure_cache_table, engine)
+        await offload(ensure_silver_tables, engine)
+        await offload(ensure_primary_keys, engine)
+        await offload(ensure_rollups, engine)
+        # Rates before any silver table: the payments chunks are converted with them
+        await offload(load_fx_rates, engine, self.csv_folder)
+        await offload(run_sql, "CREATE SCHEMA IF NOT EXISTS bronze; CREATE SCHEMA IF NOT EXISTS gold;")
+
+        bronze_paths = {}
+        for table_name, file_name in ({} if self.bronze_folder is None else BRONZE_TABLES).items():
+            path = os.path.join(self.bronze_folder, file_name)
+            if not os.path.exists(path):
+                print(f"CSV not found: {path}, skipping...")
+                continue
+            bronze_paths[table_name] = path
+        silver_paths = {table_name: os.path.join(self.csv_folder, spec["source"])
+                        for table_name, spec in SILVER_SPECS.items()}
+        bronze_changed, _ = await offload(changed_files, engine, "bronze", bronze_paths, self.force)
+        silver_changed, unchanged = await offload(changed_files, engine, SILVER, silver_paths, self.force)
+        for table_name in unchanged:
+            print(f"⏭️ {table_name} unchanged since its last load, skipped")
+
+        names = check_dag(GOLD_TABLES)
+        rebuild = set(names) if self.force else (
+            stale_tables(GOLD_TABLES, GOLD_INPUTS, silver_changed) | (set(names) - await offload(existing_gold_tables, names))
+        )
+
+        self.done = {}
+        loop = asyncio.get_running_loop()
+        tasks = []
+        for table_name in SILVER_SPECS:
+            if table_name in silver_changed:
+                task = loop.create_task(self.silver_table(table_name, silver_paths[table_name],
+                                                          silver_changed[table_name]))
+                self.done[table_name] = self.finish(table_name, task)
+                tasks.append(task)
+            else:
+                self.done[table_name] = loop.create_future()
+                self.done[table_name].set_result("ok")
+        for table in GOLD_TABLES:
+            task = loop.create_task(self.gold_table(table, rebuild))
+            self.done[table.name] = self.finish(table.name, task)
+            tasks.append(task)
+        for table_name, signature in bronze_changed.items():
+            task = loop.create_task(self.bronze_table(table_name, bronze_paths[table_name], signature))
+            # Nothing waits on a bronze table, but its outcome is part of the run's status
+            self.done[table_name] = self.finish(table_name, task)
+            tasks.append(task)
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return {name: future.result() for name, future in self.done.items()}
+
+    def report(self):
+        print(f"   {'stage':<34} {'chunks':>7} {'busy':>8} {'idle':>8} {'blocked':>8}")
+        for clock in sorted(self.clocks, key=lambda clock: clock.idle, reverse=True):
+            print(f"   ⏱️ {clock.name:<32} {clock.chunks:>7} {clock.busy:>7.2f}s {clock.idle:>7.2f}s "
+                  f"{clock.blocked:>7.2f}s")
+
+
+# ---------------------------
+# Main execution
+# ---------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run bronze, silver and gold as one overlapping asyncio pipeline")
+    parser.add_argument("--csv-folder", default=SILVER_CSV_FOLDER, help="raw CSVs for the silver load")
+    parser.add_argument("--bronze-folder", default=BRONZE_FOLDER, help="raw CSVs for the bronze load")
+    parser.add_argument("--skip-bronze", action="store_true", help="only run silver and gold")
+    parser.add_argument("--full-refresh", action="store_true",
+                        help="ignore high-water marks and reload every table in full")
+    parser.add_argument("--force", action="store_true",
+                        help="reload tables even if their input file is unchanged since the last load")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="rows per parsed chunk")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="rows per COPY batch")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE,
+                        help="chunks buffered between two stages before the upstream stage waits")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS,
+                        help="threads for parsing, cleaning and database calls (at most ETL_DB_POOL_SIZE)")
+    parser.add_argument("--run-log", help="JSON-lines run log (default: logs/etl_runs.jsonl)")
+    parser.add_argument("--prometheus-textfile", help="also write run metrics in Prometheus textfile format")
+    args = parser.parse_args()
+
+    run_id = start_run(args.run_log)
+    pipeline = AsyncPipeline(args.csv_folder, None if args.skip_bronze else args.bronze_folder,
+                             full_refresh=args.full_refresh, force=args.force, chunksize=args.chunksize,
+                             batch_size=args.batch_size, queue_size=args.queue_size)
+    start = time.perf_counter()
+    with track("stage", "pipeline", runner="async"):
+        status = asyncio.run(pipeline.run(threads=args.threads))
+    pipeline.report()
+    print(f"   ⏱️ wall time {time.perf_counter() - start:.2f}s with {pipeline.threads} thread(s)")
+
+    with track("connections", "pipeline") as event:
+        event["connects"] = connect_count()
+    print(f"🔌 {connect_count()} database connection(s) opened")
+
+    if args.prometheus_textfile:
+        write_prometheus_textfile(args.prometheus_textfile, run_id)
+    failed = sorted(name for name, result in status.items() if result != "ok")
+    if failed or run_failed(run_id):
+        print(f"❌ Pipeline finished with errors ({', '.join(failed) or 'see the run log'}), run {run_id}.")
+        sys.exit(1)
+    print("🎉 Pipeline completed successfully!")
@@ -0,0 +1,122 @@
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# ---------------------------
+# Structured run metrics (JSON lines + optional Prometheus textfile)
+# ---------------------------
+# Every stage, table load, upsert and SQL statement is one event:
+#   run_id, kind, name, started_at, duration_s, rows_in, rows_out, bytes_read, statements, status[, error]
+# Worker processes inherit ETL_RUN_ID / ETL_RUN_LOG, so their events land in the same run.
+DEFAULT_RUN_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "etl_runs.jsonl")
+
+_write_lock = threading.Lock()
+
+
+def start_run(log_path=None):
+    os.environ["ETL_RUN_ID"] = uuid.uuid4().hex[:12]
+    os.environ["ETL_RUN_LOG"] = log_path or DEFAULT_RUN_LOG
+    return os.environ["ETL_RUN_ID"]
+
+
+def run_id():
+    # Runs started without start_run() still get an id, shared with any child process
+    return os.environ.setdefault("ETL_RUN_ID", uuid.uuid4().hex[:12])
+
+
+def run_log_path():
+    return os.environ.get("ETL_RUN_LOG", DEFAULT_RUN_LOG)
+
+
+def statement_name(sql):
+    # First non-blank line of the statement, enough to tell statements apart in the log
+    first_line = next((line.strip() for line in sql.strip().splitlines() if line.strip()), "")
+    return first_line[:80]
+
+
+def _write_event(event):
+    path = run_log_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    line = json.dumps(event, default=str) + "\n"
+    with _write_lock:
+        # One append per event; O_APPEND keeps lines whole across processes
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+@contextmanager
+def track(kind, name, **fields):
+    """Record one unit of work. The caller fills in rows_in, rows_out,
+    bytes_read and statements on the yielded event; exceptions are
+    recorded as status "error" and re-raised."""
+    event = {
+        "run_id": run_id(),
+        "kind": kind,
+        "name": name,
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+        "rows_in": None,
+        "rows_out": None,
+        "bytes_read": None,
+        "statements": 0,
+        **fields
+    }
+    start = time.perf_counter()
+    try:
+        yield event
+        event["status"] = "ok"
+    except Exception as e:
+        event["status"] = "error"
+        event["error"] = str(e)
+        raise
+    finally:
+        event["duration_s"] = round(time.perf_counter() - start, 4)
+        _write_event(event)
+
+
+def run_events(current_run_id=None):
+    current_run_id = current_run_id or run_id()
+    path = run_log_path()
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [event for event in map(json.loads, f) if event["run_id"] == current_run_id]
+
+
+def run_failed(current_run_id=None):
+    return any(event["status"] == "error" for event in run_events(current_run_id))
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def write_prometheus_textfile(path, current_run_id=None):
+    """Write the run's stage and table events in the node_exporter textfile format."""
+    events = [event for event in run_events(current_run_id) if event["kind"] != "sql"]
+    lines = [
+        "# HELP etl_duration_seconds Wall time of an ETL stage or table step in the last run.",
+        "# TYPE etl_duration_seconds gauge",
+        "# HELP etl_rows_out Rows written by an ETL stage or table step in the last run.",
+        "# TYPE etl_rows_out gauge",
+        "# HELP etl_success 1 if the ETL stage or table step succeeded in the last run.",
+        "# TYPE etl_success gauge",
+        "# HELP etl_db_connects Physical database connections opened during the last run.",
+        "# TYPE etl_db_connects gauge"
+    ]
+    for event in events:
+        labels = f'kind="{_label(event["kind"])}",name="{_label(event["name"])}"'
+        lines.append(f"etl_duration_seconds{{{labels}}} {event['duration_s']}")
+        if event.get("rows_out") is not None:
+            lines.append(f"etl_rows_out{{{labels}}} {event['rows_out']}")
+        lines.append(f"etl_success{{{labels}}} {1 if event['status'] == 'ok' else 0}")
+        if event.get("connects") is not None:
+            lines.append(f"etl_db_connects{{{labels}}} {event['connects']}")
+
+    # Write then rename, so the collector never reads a half-written file
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(path + ".tmp", path)
@@ -0,0 +1,71 @@
+import io
+
+from run_metrics import track
+
+# ---------------------------
+# Bulk upsert (COPY + INSERT ... SELECT ... ON CONFLICT)
+# ---------------------------
+DEFAULT_BATCH_SIZE = 10000
+
+
+def bulk_upsert(engine, df, table_name, conflict_cols, schema="silver", batch_size=DEFAULT_BATCH_SIZE,
+                unique_cols=None):
+    """Stream df into a temp staging table with COPY, then merge it into
+    schema.table_name with a single INSERT ... ON CONFLICT DO NOTHING.
+
+    unique_cols: columns that must stay unique although the conflict target is wider (the ID
+    of a partitioned table, whose primary key includes the partition date). Staged rows whose
+    unique_cols are already stored are skipped too; the table is locked against concurrent
+    writers meanwhile, so two loads can't both insert the same ID.
+
+    Returns (inserted, skipped) row counts.
+    """
+    with track("append_safely", f"{schema}.{table_name}") as event:
+        event["rows_in"] = len(df)
+        if df.empty:
+            event["rows_out"] = 0
+            return 0, 0
+
+        columns = ", ".join(f'"{col}"' for col in df.columns)
+        keys = ", ".join(f'"{col}"' for col in conflict_cols)
+        staging = f"stage_{table_name}"
+
+        raw_conn = engine.raw_connection()
+        cur = raw_conn.cursor()
+        try:
+            cur.execute(f'CREATE TEMP TABLE "{staging}" (LIKE {schema}."{table_name}" INCLUDING DEFAULTS) ON COMMIT DROP;')
+            event["statements"] += 1
+
+            # Each batch goes over the wire as one COPY FROM STDIN
+            for start in range(0, len(df), batch_size):
+                buffer = io.StringIO()
+                df.iloc[start:start + batch_size].to_csv(buffer, index=False, header=False)
+                buffer.seek(0)
+                cur.copy_expert(f'COPY "{staging}" ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+                event["statements"] += 1
+
+            where = ""
+            if unique_cols:
+                # Readers are not blocked; only other writers wait for this transaction
+                cur.execute(f'LOCK TABLE {schema}."{table_name}" IN SHARE ROW EXCLUSIVE MODE;')
+                event["statements"] += 1
+                matches = " AND ".join(f's."{col}" = t."{col}"' for col in unique_cols)
+                where = f'WHERE NOT EXISTS (SELECT 1 FROM {schema}."{table_name}" t WHERE {matches})'
+            cur.execute(f"""
+                INSERT INTO {schema}."{table_name}" ({columns})
+                SELECT {columns} FROM "{staging}" s
+                {where}
+                ON CONFLICT ({keys}) DO NOTHING;
+            """)
+            event["statements"] += 1
+            inserted = cur.rowcount
+            raw_conn.commit()
+        except Exception:
+            raw_conn.rollback()
+            raise
+        finally:
+            cur.close()
+            raw_conn.close()
+
+        event["rows_out"] = inserted
+        return inserted, len(df) - inserted
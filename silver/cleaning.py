@@ -0,0 +1,103 @@
+import pandas as pd
+
+from bronze.arrow_cache import read_arrow
+
+# ---------------------------
+# Declarative cleaning specs for the silver tables
+# ---------------------------
+# source:       raw CSV file name
+# key:          columns that identify a row (duplicates dropped; the upsert conflict target is
+#               SILVER_PRIMARY_KEYS, which adds the partition date on the fact tables)
+# fill:         defaults for missing values
+# dtypes:       compact target dtypes, applied after filling
+# categoricals: low-cardinality columns, plus foreign-key IDs (S034231, C044256, ...)
+#               which repeat across fact rows and are stored once per distinct value
+# dates:        parsed once, as YYYY-MM-DD
+# usd:          (amount, currency, date) columns converted into amount_usd (see silver/fx.py)
+SILVER_SPECS = {
+    "students": {
+        "source": "students_raw.csv",
+        "key": ["student_id"],
+        "fill": {"name": "Unknown", "age": 0, "gender": "Unknown", "country": "Unknown", "subscription_type": "free"},
+        "dtypes": {"age": "int16"},
+        "categoricals": ["gender", "country", "subscription_type"],
+        "dates": ["signup_date"]
+    },
+    "instructors": {
+        "source": "instructors_raw.csv",
+        "key": ["instructor_id"],
+        "fill": {"name": "Unknown", "expertise_area": "General", "rating": 0},
+        "dtypes": {"rating": "float64"},
+        "categoricals": ["expertise_area"],
+        "dates": ["join_date"]
+    },
+    "courses": {
+        "source": "courses_raw.csv",
+        "key": ["course_id"],
+        "fill": {"category": "General", "difficulty_level": "Beginner", "duration_hours": 0, "price": 0},
+        "dtypes": {"duration_hours": "float64", "price": "float64"},
+        "categoricals": ["category", "difficulty_level", "instructor_id"],
+        "dates": []
+    },
+    "enrollments": {
+        "source": "enrollments_raw.csv",
+        "key": ["enrollment_id"],
+        "fill": {"status": "active", "progress_percent": 0},
+        "dtypes": {"progress_percent": "int16"},
+        "categoricals": ["student_id", "course_id", "status"],
+        "dates": ["enrollment_date"]
+    },
+    "activity": {
+        "source": "activity_raw.csv",
+        "key": ["activity_id"],
+        "fill": {"video_watched_min": 0, "quiz_score": 0, "assignment_score": 0},
+        "dtypes": {"video_watched_min": "int32", "quiz_score": "int16", "assignment_score": "int16"},
+        "categoricals": ["student_id", "course_id"],
+        "dates": ["timestamp"]
+    },
+    "payments": {
+        "source": "payments_raw.csv",
+        "key": ["payment_id"],
+        "fill": {"amount": 0, "currency": "USD"},
+        "dtypes": {"amount": "float64"},
+        "categoricals": ["student_id", "course_id", "currency", "status"],
+        "dates": ["payment_date"],
+        "usd": ["amount", "currency", "payment_date"]
+    }
+}
+
+
+def read_raw(path, spec, chunksize=None):
+    # Categoricals are built while parsing, so repeated strings are stored once
+    # (per chunk when chunksize is set: the result is then an iterator of frames)
+    return pd.read_csv(path, dtype={column: "category" for column in spec["categoricals"]}, chunksize=chunksize)
+
+
+def clean_frame(df, spec):
+    df = df.drop_duplicates(subset=spec["key"])
+
+    # Fill values must exist as categories before fillna can use them
+    fill = {column: value for column, value in spec["fill"].items() if column in df.columns}
+    widened = {
+        column: df[column].cat.add_categories([value])
+        for column, value in fill.items()
+        if isinstance(df[column].dtype, pd.CategoricalDtype) and value not in df[column].cat.categories
+    }
+    df = df.assign(**widened).fillna(fill)
+
+    dates = {
+        column: pd.to_datetime(df[column], format="%Y-%m-%d", errors="coerce")
+        for column in spec["dates"] if column in df.columns
+    }
+    dtypes = {column: dtype for column, dtype in spec["dtypes"].items() if column in df.columns}
+    return df.assign(**dates).astype(dtypes)
+
+
+def load_raw(path, spec):
+    # Memory-mapped Arrow copy from the bronze load when it still matches the CSV
+    df = read_arrow(path, spec["categoricals"])
+    return read_raw(path, spec) if df is None else df
+
+
+def load_clean(path, spec):
+    return clean_frame(load_raw(path, spec), spec)
@@ -0,0 +1,256 @@
+import argparse
+import io
+import os
+import sys
+from decimal import Decimal, ROUND_HALF_UP
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from changed_keys import record_changed_keys
+from run_metrics import track
+from silver.rollups import ensure_rollups, refresh_rollup_days
+from silver.validation import CURRENCIES
+
+# ---------------------------
+# FX rates: payment amounts normalised to USD once, during the silver load
+# ---------------------------
+# silver.fx_rates holds the USD value of one unit of a currency per day, loaded from
+# fx_rates.csv (currency, rate_date, usd_rate). A payment converts at the latest rate on or
+# before its date, at most MAX_RATE_AGE_DAYS old (weekends and holidays have no rate);
+# without one its amount_usd stays NULL until a later rate load fills it in.
+# Python rounds like the SQL conversion: half away from zero, on the stored precisions
+# (amounts NUMERIC(12, 2), rates NUMERIC(18, 8)), so both paths give the same cents.
+FX_SOURCE = "fx_rates.csv"
+BASE_CURRENCY = "USD"
+MAX_RATE_AGE_DAYS = 7
+
+# Rates per source (the database or a CSV path), read once per process:
+# {currency: (sorted rate days as datetime64[D], usd rates as float64)}
+_rate_cache = {}
+_rate_cache_lock = Lock()
+
+
+def near_tie(scaled):
+    """Whether non-negative values, scaled so the rounding digit is the units, lie within float
+    error of a half (wide enough for the error of large values, too)."""
+    return np.abs(scaled - np.floor(scaled) - 0.5) < np.maximum(1e-6, scaled * 1e-12)
+
+
+def round_half_up(values, decimals):
+    """values rounded half away from zero, like PostgreSQL's ROUND(numeric). Floats are rounded
+    directly, except near a tie, where the decimal value decides: 2.675 is stored as
+    2.67499999..., which float rounding would send down."""
+    values = np.asarray(values, dtype="float64")
+    scaled = np.abs(values) * 10.0 ** decimals
+    rounded = np.floor(scaled + 0.5)
+    quantum = Decimal(1).scaleb(-decimals)
+    for i in np.flatnonzero(near_tie(scaled)):
+        exact = abs(Decimal(repr(float(values[i])))).quantize(quantum, rounding=ROUND_HALF_UP)
+        rounded[i] = float(exact.scaleb(decimals))
+    return np.copysign(rounded / 10.0 ** decimals, values)
+
+
+def exact_usd(amounts, rates):
+    """amounts * rates rounded half away from zero to cents, from their decimal values."""
+    cents = Decimal("0.01")
+    return np.array([
+        float((Decimal(repr(float(amount))) * Decimal(repr(float(rate)))).quantize(cents, rounding=ROUND_HALF_UP))
+        for amount, rate in zip(amounts, rates)
+    ])
+
+
+def read_fx_csv(path):
+    """Rates from an fx_rates.csv; rows with an unknown currency, a bad date or a
+    non-positive rate are skipped, and the last row wins for a repeated (currency, day)."""
+    rates = pd.read_csv(path, dtype={"currency": "string"})
+    rates = rates.assign(
+        currency=rates["currency"].str.strip().str.upper(),
+        rate_date=pd.to_datetime(rates["rate_date"], format="%Y-%m-%d", errors="coerce"),
+        usd_rate=round_half_up(pd.to_numeric(rates["usd_rate"], errors="coerce"), 8)
+    )
+    valid = rates["currency"].isin(CURRENCIES) & rates["rate_date"].notna() & (rates["usd_rate"] > 0)
+    if not valid.all():
+        print(f"⚠️ {path}: {int((~valid).sum())} invalid rate row(s) skipped")
+    return rates[valid].drop_duplicates(["currency", "rate_date"], keep="last")[["currency", "rate_date", "usd_rate"]]
+
+
+def rate_arrays(rates):
+    rates = rates.sort_values(["currency", "rate_date"])
+    return {
+        currency: (group["rate_date"].to_numpy(dtype="datetime64[D]"), group["usd_rate"].to_numpy(dtype="float64"))
+        for currency, group in rates.groupby("currency", sort=False)
+    }
+
+
+def cached_rates(source, read):
+    with _rate_cache_lock:
+        if source not in _rate_cache:
+            _rate_cache[source] = rate_arrays(read())
+        return _rate_cache[source]
+
+
+def clear_fx_cache():
+    with _rate_cache_lock:
+        _rate_cache.clear()
+
+
+def fx_rates(engine):
+    """The rates in silver.fx_rates, cached for the life of the process."""
+    def read():
+        with engine.connect() as conn:
+            rates = pd.read_sql(text("SELECT currency, rate_date, usd_rate::float8 AS usd_rate FROM silver.fx_rates"),
+                                conn)
+        return rates.assign(rate_date=pd.to_datetime(rates["rate_date"]))
+    return cached_rates("silver.fx_rates", read)
+
+
+def csv_fx_rates(csv_folder):
+    """The rates in <csv_folder>/fx_rates.csv (none if it doesn't exist), cached like fx_rates."""
+    path = os.path.join(csv_folder, FX_SOURCE)
+    if not os.path.exists(path):
+        return {}
+    return cached_rates(os.path.abspath(path), lambda: read_fx_csv(path))
+
+
+def usd_amounts(amounts, currencies, days, rates):
+    """amounts converted to USD and rounded to cents (see round_half_up); NaN where no recent
+    rate exists.
+
+    One searchsorted per currency over its sorted rate days finds every row's rate at once."""
+    # As stored in silver.payments.amount
+    amounts = round_half_up(amounts, 2)
+    days = np.asarray(days, dtype="datetime64[D]")
+    usd = np.full(len(amounts), np.nan)
+    max_age = np.timedelta64(MAX_RATE_AGE_DAYS, "D")
+    currencies = pd.Series(currencies, dtype="object")
+    for currency, rows in currencies.groupby(currencies, sort=False).indices.items():
+        if currency == BASE_CURRENCY:
+            usd[rows] = amounts[rows]
+            continue
+        if currency not in rates:
+            continue
+        rate_days, values = rates[currency]
+        position = np.searchsorted(rate_days, days[rows], side="right") - 1
+        found = position >= 0
+        position = position.clip(0)
+        found &= days[rows] - rate_days[position] <= max_age
+        rows, rates_found = rows[found], values[position[found]]
+        product = amounts[rows] * rates_found
+        usd[rows] = round_half_up(product, 2)
+        # A float product is not the decimal one; near a tie, the exact product decides
+        tie = near_tie(np.abs(product) * 100)
+        usd[rows[tie]] = exact_usd(amounts[rows[tie]], rates_found[tie])
+    return usd
+
+
+def add_amount_usd(df, spec, rates):
+    """df with its amounts converted into amount_usd, for specs with a "usd" entry
+    (amount, currency and date columns); other frames are returned unchanged."""
+    if "usd" not in spec:
+        return df
+    amount, currency, date = spec["usd"]
+    usd = usd_amounts(df[amount].to_numpy(dtype="float64", na_value=np.nan), df[currency].to_numpy(),
+                      pd.to_datetime(df[date]).to_numpy(), rates)
+    missing = int((np.isnan(usd) & df[amount].notna().to_numpy()).sum())
+    if missing:
+        print(f"⚠️ {missing} amount(s) without an FX rate within {MAX_RATE_AGE_DAYS} days, amount_usd left NULL")
+    return df.assign(amount_usd=usd)
+
+
+def convert_stored_payments(engine, recompute=False):
+    """Set amount_usd on stored payments from silver.fx_rates: those still without one, or
+    all of them with `recompute` (after rates were corrected). The same rule as usd_amounts,
+    in SQL; payments whose value changed are recorded for incremental gold and their days'
+    rollups are refreshed in the same transaction, so a failed refresh also undoes the update
+    and the next run converts those payments again. Returns the rows updated."""
+    with track("fx", "silver.payments.amount_usd", recompute=recompute) as event:
+        with engine.begin() as conn:
+            changed = pd.DataFrame(conn.execute(text(f"""
+                WITH converted AS (
+                    SELECT p.payment_id, p.payment_date, ROUND(p.amount * CASE
+                        WHEN p.currency = :base THEN 1
+                        ELSE (SELECT r.usd_rate FROM silver.fx_rates r
+                              WHERE r.currency = p.currency AND r.rate_date <= p.payment_date
+                                AND r.rate_date >= p.payment_date - :max_age
+                              ORDER BY r.rate_date DESC LIMIT 1)
+                    END, 2) AS amount_usd
+                    FROM silver.payments p
+                    {"" if recompute else "WHERE p.amount_usd IS NULL"}
+                ), updated AS (
+                    UPDATE silver.payments p SET amount_usd = c.amount_usd
+                    FROM converted c
+                    WHERE p.payment_id = c.payment_id AND p.payment_date = c.payment_date
+                      AND p.amount_usd IS DISTINCT FROM c.amount_usd
+                    RETURNING p.student_key, p.course_key, p.payment_date
+                )
+                -- The IDs of the changed keys, through the key maps
+                SELECT s.student_id, k.course_id, u.payment_date FROM updated u
+                LEFT JOIN silver.student_keys s USING (student_key)
+                LEFT JOIN silver.course_keys k USING (course_key)
+            """), {"base": BASE_CURRENCY, "max_age": MAX_RATE_AGE_DAYS}).all(),
+                columns=["student_id", "course_id", "payment_date"])
+            refresh_rollup_days(conn, "payments", sorted(set(changed["payment_date"])))
+        event["rows_out"] = len(changed)
+    if not changed.empty:
+        record_changed_keys(engine, "payments", changed)
+        print(f"✅ silver.payments: amount_usd set on {len(changed)} stored payment(s)")
+    return len(changed)
+
+
+def load_fx_rates(engine, csv_folder):
+    """Upsert <csv_folder>/fx_rates.csv into silver.fx_rates, where a corrected rate replaces
+    the old one, then convert the stored payments that need it. Returns the rates written."""
+    path = os.path.join(csv_folder, FX_SOURCE)
+    if not os.path.exists(path):
+        print(f"⚠️ {path} not found: only {BASE_CURRENCY} payments get an amount_usd")
+        return 0
+    rates = read_fx_csv(path)
+    with track("table_load", "silver.fx_rates", bytes_read=os.path.getsize(path)) as event:
+        event["rows_in"] = len(rates)
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TEMP TABLE stage_fx_rates (LIKE silver.fx_rates) ON COMMIT DROP"))
+            # One COPY into the staging table, like bulk_upsert
+            buffer = io.StringIO()
+            rates.assign(rate_date=rates["rate_date"].dt.strftime("%Y-%m-%d")).to_csv(buffer, index=False, header=False)
+            buffer.seek(0)
+            cur = conn.connection.cursor()
+            try:
+                cur.copy_expert("COPY stage_fx_rates (currency, rate_date, usd_rate) FROM STDIN WITH (FORMAT csv)",
+                                buffer)
+            finally:
+                cur.close()
+            # xmax is set on rows the upsert updated, i.e. rates that were corrected
+            corrected = conn.execute(text("""
+                INSERT INTO silver.fx_rates SELECT * FROM stage_fx_rates
+                ON CONFLICT (currency, rate_date) DO UPDATE SET usd_rate = EXCLUDED.usd_rate
+                WHERE fx_rates.usd_rate <> EXCLUDED.usd_rate
+                RETURNING xmax <> 0
+            """)).scalars().all()
+        event["rows_out"] = len(corrected)
+        event["rates_corrected"] = sum(corrected)
+    clear_fx_cache()
+    print(f"✅ fx_rates: {len(corrected) - sum(corrected)} new, {sum(corrected)} corrected")
+    convert_stored_payments(engine, recompute=any(corrected))
+    return len(corrected)
+
+
+if __name__ == "__main__":
+    from db import get_engine
+    from silver.schema import ensure_silver_tables
+
+    parser = argparse.ArgumentParser(description="Load the FX rates and convert stored payments to USD")
+    parser.add_argument("--csv-folder", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                                                             "bronze"), help=f"folder with {FX_SOURCE}")
+    parser.add_argument("--recompute", action="store_true", help="recompute amount_usd of every stored payment")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    ensure_silver_tables(engine)
+    ensure_rollups(engine)
+    load_fx_rates(engine, args.csv_folder)
+    if args.recompute:
+        convert_stored_payments(engine, recompute=True)
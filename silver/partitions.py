@@ -0,0 +1,159 @@
+import argparse
+import os
+import re
+import sys
+
+import pandas as pd
+from sqlalchemy import text
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from run_metrics import track
+from silver.rollups import drop_rollup_range
+from watermarks import ensure_state_table, get_watermark, set_watermark
+
+# ---------------------------
+# Monthly range partitions of the silver fact tables
+# ---------------------------
+# The parent table routes every row to the partition of its month; loads create the
+# partitions a batch needs before upserting. Partitions are named <table>_pYYYYMM, so old
+# months can be detached (and archived or dropped) without touching the rest.
+SILVER_PARTITIONS = {
+    "enrollments": "enrollment_date",
+    "activity": "timestamp",
+    "payments": "payment_date"
+}
+
+ARCHIVE_SCHEMA = "silver_archive"
+
+# The unique-ID check of the upsert (SILVER_UNIQUE_IDS) only sees attached partitions, so a
+# re-sent row from a detached month would be inserted again. Detaching records the first month
+# still attached per table (in the watermark state table), and validation rejects rows dated
+# before it ("<date column>:detached"): once a month is detached, it can't be loaded again.
+DETACHED_LAYER = "silver_detached"
+
+
+def partition_name(table, month):
+    return f"{table}_p{month.strftime('%Y%m')}"
+
+
+def is_partitioned(conn, table):
+    return conn.execute(text("""
+        SELECT c.relkind = 'p' FROM pg_class c
+        WHERE c.oid = to_regclass(:table)
+    """), {"table": f"silver.{table}"}).scalar() or False
+
+
+def list_partitions(conn, table):
+    """{month (pd.Period): partition name} of silver.<table>, oldest first."""
+    names = conn.execute(text("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(:table)
+    """), {"table": f"silver.{table}"}).scalars()
+    months = {}
+    for name in names:
+        match = re.fullmatch(rf"{table}_p(\d{{4}})(\d{{2}})", name)
+        if match:
+            months[pd.Period(year=int(match[1]), month=int(match[2]), freq="M")] = name
+    return dict(sorted(months.items()))
+
+
+def months_in(df, column):
+    return set(pd.to_datetime(df[column]).dropna().dt.to_period("M"))
+
+
+def create_partitions(conn, table, months):
+    """Create the missing monthly partitions of silver.<table> for `months` on conn."""
+    missing = sorted(set(months) - set(list_partitions(conn, table)))
+    if not missing:
+        return 0
+    with track("partitions", f"silver.{table}", statements=len(missing)) as event:
+        for month in missing:
+            conn.execute(text(f"""
+                CREATE TABLE IF NOT EXISTS silver.{partition_name(table, month)}
+                PARTITION OF silver.{table}
+                FOR VALUES FROM ('{month.start_time.date()}') TO ('{(month + 1).start_time.date()}')
+            """))
+        event["rows_out"] = len(missing)
+    print(f"✅ silver.{table}: {len(missing)} partition(s) created ({missing[0]} .. {missing[-1]})")
+    return len(missing)
+
+
+def ensure_partitions(engine, table, months):
+    with engine.begin() as conn:
+        return create_partitions(conn, table, months)
+
+
+def ensure_partitions_for(engine, table, df):
+    """Partitions for every month in df; a no-op for tables that aren't partitioned."""
+    if table in SILVER_PARTITIONS and not df.empty:
+        return ensure_partitions(engine, table, months_in(df, SILVER_PARTITIONS[table]))
+    return 0
+
+
+def recent_since(engine, table, count):
+    """First day of the `count` newest partitions of silver.<table> (None if it has none),
+    for refreshes that only read recent months."""
+    with engine.connect() as conn:
+        months = list(list_partitions(conn, table))
+    return months[-count:][0].start_time.date() if months and count > 0 else None
+
+
+def detached_before(engine, table):
+    """First day (YYYY-MM-DD) silver.<table> still accepts rows for after a detach, or None."""
+    if table not in SILVER_PARTITIONS:
+        return None
+    return get_watermark(engine, DETACHED_LAYER, table)
+
+
+def detach_partitions(engine, table, before, archive_schema=ARCHIVE_SCHEMA, drop=False):
+    """Detach the partitions of silver.<table> for months before `before` (a pd.Period), then
+    move them into archive_schema, or drop them. Loads reject rows dated before `before` from
+    then on (see DETACHED_LAYER). Returns the partition names."""
+    # The boundary is recorded first: if the detach then fails, rows of months still attached
+    # are rejected until it is rerun, but a detached month is never reloaded
+    ensure_state_table(engine)
+    boundary = str(before.start_time.date())
+    current = detached_before(engine, table)
+    if current is None or boundary > current:
+        set_watermark(engine, DETACHED_LAYER, table, SILVER_PARTITIONS[table], boundary)
+    with engine.begin() as conn:
+        partitions = list_partitions(conn, table)
+        old = [name for month, name in partitions.items() if month < before]
+        with track("partitions", f"silver.{table}.detach", statements=len(old)) as event:
+            if old and not drop:
+                conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {archive_schema}"))
+            for name in old:
+                conn.execute(text(f"ALTER TABLE silver.{table} DETACH PARTITION silver.{name}"))
+                if drop:
+                    conn.execute(text(f"DROP TABLE silver.{name}"))
+                else:
+                    conn.execute(text(f"ALTER TABLE silver.{name} SET SCHEMA {archive_schema}"))
+            event["rows_out"] = len(old)
+    if old:
+        # The rollups follow the facts, so gold built from them stays identical
+        drop_rollup_range(engine, table, next(iter(partitions)).start_time.date(), before.start_time.date())
+    where = "dropped" if drop else f"moved to {archive_schema}"
+    print(f"✅ silver.{table}: {len(old)} partition(s) before {before} detached and {where}")
+    return old
+
+
+if __name__ == "__main__":
+    from db import get_engine
+
+    parser = argparse.ArgumentParser(description="List or detach the monthly partitions of the silver fact tables")
+    parser.add_argument("--tables", nargs="+", choices=list(SILVER_PARTITIONS), default=list(SILVER_PARTITIONS))
+    parser.add_argument("--detach-before", help="detach partitions for months before YYYY-MM")
+    parser.add_argument("--archive-schema", default=ARCHIVE_SCHEMA, help="schema detached partitions move to")
+    parser.add_argument("--drop", action="store_true", help="drop detached partitions instead of archiving them")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    for table in args.tables:
+        if args.detach_before:
+            detach_partitions(engine, table, pd.Period(args.detach_before, freq="M"),
+                              archive_schema=args.archive_schema, drop=args.drop)
+        else:
+            with engine.connect() as conn:
+                months = list(list_partitions(conn, table))
+            print(f"silver.{table}: {len(months)} partition(s)" + (f", {months[0]} .. {months[-1]}" if months else ""))
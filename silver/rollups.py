@@ -0,0 +1,171 @@
+import argparse
+import os
+import re
+import sys
+from collections import namedtuple
+
+import pandas as pd
+from sqlalchemy import text
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from run_metrics import track
+
+# ---------------------------
+# Daily rollups of the silver fact tables
+# ---------------------------
+# One row per day and grain (surrogate keys, not text IDs), with sums and counts rather than
+# averages, so any coarser aggregate (per course, per year, ...) gives exactly what a scan of
+# the facts would.
+# The silver loads recompute the days they touched; gold reads the rollups instead of the facts.
+# Only grains that compress well have a rollup: per student and day there is about one fact
+# row, so such a rollup would double the write cost without making any read cheaper.
+# source: silver fact table; date_column: its day; select_sql: the rollup of the rows matching {where}
+Rollup = namedtuple("Rollup", ["source", "date_column", "ddl", "select_sql"])
+
+ROLLUP_SCHEMA = "rollup"
+
+ROLLUPS = {
+    "payments_daily": Rollup("payments", "payment_date", """
+        CREATE TABLE IF NOT EXISTS rollup.payments_daily (
+            day DATE NOT NULL,
+            course_key INTEGER,
+            status TEXT,
+            currency TEXT,
+            payments BIGINT NOT NULL,
+            amount NUMERIC,
+            amount_usd NUMERIC
+        )
+    """, """
+        SELECT payment_date, course_key, status, currency, COUNT(*), SUM(amount), SUM(amount_usd)
+        FROM silver.payments
+        {where}
+        GROUP BY payment_date, course_key, status, currency
+    """),
+    "enrollments_daily": Rollup("enrollments", "enrollment_date", """
+        CREATE TABLE IF NOT EXISTS rollup.enrollments_daily (
+            day DATE NOT NULL,
+            course_key INTEGER,
+            status TEXT,
+            enrollments BIGINT NOT NULL,
+            progress_sum BIGINT,
+            progress_count BIGINT NOT NULL
+        )
+    """, """
+        SELECT enrollment_date, course_key, status, COUNT(*), SUM(progress_percent), COUNT(progress_percent)
+        FROM silver.enrollments
+        {where}
+        GROUP BY enrollment_date, course_key, status
+    """)
+}
+
+
+# Indexes besides the one on day: the payment status filter, like silver.payments has
+ROLLUP_INDEXES = {
+    "payments_daily": [["status", "course_key"]]
+}
+
+
+def rollup_columns(rollup):
+    # Column names declared in the DDL, one per line after the opening parenthesis
+    return re.findall(r"^\s*(\w+) [A-Z]", rollup.ddl.split("(", 1)[1], re.MULTILINE)
+
+
+def rollups_of(table):
+    return {name: rollup for name, rollup in ROLLUPS.items() if rollup.source == table}
+
+
+def rebuild_rollup(conn, name):
+    rollup = ROLLUPS[name]
+    with track("rollup", f"{ROLLUP_SCHEMA}.{name}", full=True) as event:
+        conn.execute(text(f"TRUNCATE {ROLLUP_SCHEMA}.{name}"))
+        event["rows_out"] = conn.execute(text(
+            f"INSERT INTO {ROLLUP_SCHEMA}.{name} {rollup.select_sql.format(where='')}"
+        )).rowcount
+        event["statements"] = 2
+    return event["rows_out"]
+
+
+def ensure_rollups(engine):
+    """Create the rollup tables; any table that didn't exist yet, or whose columns changed
+    since it was created, is (re)built from silver."""
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ROLLUP_SCHEMA}"))
+        for name, rollup in ROLLUPS.items():
+            columns = conn.execute(text("""
+                SELECT column_name FROM information_schema.columns
+                WHERE table_schema = :schema AND table_name = :name ORDER BY ordinal_position
+            """), {"schema": ROLLUP_SCHEMA, "name": name}).scalars().all()
+            exists = columns == rollup_columns(rollup)
+            if columns and not exists:
+                conn.execute(text(f"DROP TABLE {ROLLUP_SCHEMA}.{name}"))
+            conn.execute(text(rollup.ddl))
+            for columns in [["day"]] + ROLLUP_INDEXES.get(name, []):
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name}_{'_'.join(columns)}_idx "
+                                  f"ON {ROLLUP_SCHEMA}.{name} ({', '.join(columns)})"))
+            if not exists and conn.execute(text(f"SELECT to_regclass('silver.{rollup.source}') IS NOT NULL")).scalar():
+                print(f"✅ {ROLLUP_SCHEMA}.{name}: {rebuild_rollup(conn, name)} rows built from silver.{rollup.source}")
+
+
+def days_in(df, column):
+    return sorted(set(pd.to_datetime(df[column]).dropna().dt.date))
+
+
+def refresh_rollup_days(conn, table, days):
+    """Recompute the rollups of silver.<table> for `days` (dates) from the facts on conn; the
+    date predicate keeps the scan to those days' partitions. Returns the rows written."""
+    rollups = rollups_of(table)
+    if not rollups or not days:
+        return 0
+    days = list(days)
+    rows = 0
+    for name, rollup in rollups.items():
+        with track("rollup", f"{ROLLUP_SCHEMA}.{name}", days=len(days)) as event:
+            conn.execute(text(f"DELETE FROM {ROLLUP_SCHEMA}.{name} WHERE day = ANY(:days)"), {"days": days})
+            where = f'WHERE "{rollup.date_column}" = ANY(:days)'
+            event["rows_out"] = conn.execute(text(
+                f"INSERT INTO {ROLLUP_SCHEMA}.{name} {rollup.select_sql.format(where=where)}"
+            ), {"days": days}).rowcount
+            event["statements"] = 2
+            rows += event["rows_out"]
+    return rows
+
+
+def refresh_rollups(engine, table, days):
+    with engine.begin() as conn:
+        return refresh_rollup_days(conn, table, days)
+
+
+def rollup_days(table, df):
+    """Days present in df (rows loaded into silver.<table>) that its rollups must recompute."""
+    rollups = rollups_of(table)
+    if not rollups or df.empty:
+        return []
+    return days_in(df, next(iter(rollups.values())).date_column)
+
+
+def refresh_rollups_for(engine, table, df):
+    return refresh_rollups(engine, table, rollup_days(table, df))
+
+
+def drop_rollup_range(engine, table, start, end):
+    """Remove the rollup rows of silver.<table> for days in [start, end), e.g. after the
+    facts for those months were detached."""
+    with engine.begin() as conn:
+        for name in rollups_of(table):
+            conn.execute(text(f"DELETE FROM {ROLLUP_SCHEMA}.{name} WHERE day >= :start AND day < :end"),
+                         {"start": start, "end": end})
+
+
+if __name__ == "__main__":
+    from db import get_engine
+
+    parser = argparse.ArgumentParser(description="Create the daily rollup tables, or rebuild them from silver")
+    parser.add_argument("--rebuild", action="store_true", help="recompute every rollup from the silver facts")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    ensure_rollups(engine)
+    if args.rebuild:
+        with engine.begin() as conn:
+            for name in ROLLUPS:
+                print(f"✅ {ROLLUP_SCHEMA}.{name}: {rebuild_rollup(conn, name)} rows")
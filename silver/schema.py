@@ -0,0 +1,382 @@
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+from sqlalchemy import text
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from run_metrics import track
+from silver.partitions import SILVER_PARTITIONS, is_partitioned, create_partitions
+from silver.surrogate_keys import SURROGATE_KEYS, backfill_keys, with_ids
+
+# ---------------------------
+# Silver table definitions
+# ---------------------------
+# The fact tables are range-partitioned by month (see silver/partitions.py); a primary key
+# on a partitioned table has to include the partition column.
+# Next to each student, course and instructor ID sits its integer surrogate key
+# (see silver/surrogate_keys.py), which gold joins on. The fact tables store only the keys:
+# their IDs map back through silver.<dimension>_keys.
+SILVER_DDL = {
+    "students": """
+        CREATE TABLE IF NOT EXISTS silver.students (
+            student_id TEXT PRIMARY KEY,
+            name TEXT,
+            age INTEGER,
+            gender TEXT,
+            country TEXT,
+            signup_date DATE,
+            subscription_type TEXT,
+            student_key INTEGER
+        )
+    """,
+    "instructors": """
+        CREATE TABLE IF NOT EXISTS silver.instructors (
+            instructor_id TEXT PRIMARY KEY,
+            name TEXT,
+            expertise_area TEXT,
+            rating NUMERIC,
+            join_date DATE,
+            instructor_key INTEGER
+        )
+    """,
+    "courses": """
+        CREATE TABLE IF NOT EXISTS silver.courses (
+            course_id TEXT PRIMARY KEY,
+            course_title TEXT,
+            category TEXT,
+            difficulty_level TEXT,
+            duration_hours NUMERIC,
+            price NUMERIC,
+            instructor_id TEXT,
+            course_key INTEGER,
+            instructor_key INTEGER
+        )
+    """,
+    "enrollments": """
+        CREATE TABLE IF NOT EXISTS silver.enrollments (
+            enrollment_id TEXT NOT NULL,
+            enrollment_date DATE NOT NULL,
+            status TEXT,
+            progress_percent INTEGER,
+            student_key INTEGER,
+            course_key INTEGER,
+            PRIMARY KEY (enrollment_id, enrollment_date)
+        ) PARTITION BY RANGE (enrollment_date)
+    """,
+    "activity": """
+        CREATE TABLE IF NOT EXISTS silver.activity (
+            activity_id TEXT NOT NULL,
+            video_watched_min INTEGER,
+            quiz_score INTEGER,
+            assignment_score INTEGER,
+            "timestamp" DATE NOT NULL,
+            student_key INTEGER,
+            course_key INTEGER,
+            PRIMARY KEY (activity_id, "timestamp")
+        ) PARTITION BY RANGE ("timestamp")
+    """,
+    "payments": """
+        CREATE TABLE IF NOT EXISTS silver.payments (
+            payment_id TEXT NOT NULL,
+            amount NUMERIC(12, 2),
+            currency TEXT,
+            payment_date DATE NOT NULL,
+            status TEXT,
+            amount_usd NUMERIC(12, 2),
+            student_key INTEGER,
+            course_key INTEGER,
+            PRIMARY KEY (payment_id, payment_date)
+        ) PARTITION BY RANGE (payment_date)
+    """,
+    # Reference data: USD value of one unit of a currency per day (see silver/fx.py)
+    "fx_rates": """
+        CREATE TABLE IF NOT EXISTS silver.fx_rates (
+            currency TEXT NOT NULL,
+            rate_date DATE NOT NULL,
+            usd_rate NUMERIC(18, 8) NOT NULL CHECK (usd_rate > 0),
+            PRIMARY KEY (currency, rate_date)
+        )
+    """,
+    # Surrogate key maps: ID -> compact integer key
+    "student_keys": """
+        CREATE TABLE IF NOT EXISTS silver.student_keys (
+            student_key INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            student_id TEXT NOT NULL UNIQUE
+        )
+    """,
+    "course_keys": """
+        CREATE TABLE IF NOT EXISTS silver.course_keys (
+            course_key INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            course_id TEXT NOT NULL UNIQUE
+        )
+    """,
+    "instructor_keys": """
+        CREATE TABLE IF NOT EXISTS silver.instructor_keys (
+            instructor_key INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            instructor_id TEXT NOT NULL UNIQUE
+        )
+    """
+}
+
+# Columns added after a table was first released, added in place to existing tables
+# (surrogate keys of rows already stored are filled in from their IDs)
+SILVER_ADDED_COLUMNS = {
+    "students": {"student_key": "INTEGER"},
+    "instructors": {"instructor_key": "INTEGER"},
+    "courses": {"course_key": "INTEGER", "instructor_key": "INTEGER"},
+    "enrollments": {"student_key": "INTEGER", "course_key": "INTEGER"},
+    "activity": {"student_key": "INTEGER", "course_key": "INTEGER"},
+    "payments": {"amount_usd": "NUMERIC(12, 2)", "student_key": "INTEGER", "course_key": "INTEGER"}
+}
+
+# ID columns a table's source rows carry but the table no longer stores, dropped from existing
+# tables once their keys are filled in (and from each frame before it is written, see stored_frame)
+SILVER_DROPPED_COLUMNS = {
+    "enrollments": ["student_id", "course_id"],
+    "activity": ["student_id", "course_id"],
+    "payments": ["student_id", "course_id"]
+}
+
+
+# ---------------------------
+# Keys and indexes
+# ---------------------------
+# Primary keys (also the ON CONFLICT target of the bulk upsert)
+SILVER_PRIMARY_KEYS = {
+    "students": ["student_id"],
+    "instructors": ["instructor_id"],
+    "courses": ["course_id"],
+    "enrollments": ["enrollment_id", "enrollment_date"],
+    "activity": ["activity_id", "timestamp"],
+    "payments": ["payment_id", "payment_date"],
+    "fx_rates": ["currency", "rate_date"],
+    "student_keys": ["student_key"],
+    "course_keys": ["course_key"],
+    "instructor_keys": ["instructor_key"]
+}
+
+# On the partitioned fact tables the primary key has to include the partition date, so it no
+# longer keeps an ID unique: a row re-sent with a corrected date would be stored as a second
+# fact. The loads skip rows whose ID is already stored instead (bulk_upsert's unique_cols).
+SILVER_UNIQUE_IDS = {
+    table: [column for column in SILVER_PRIMARY_KEYS[table] if column != date_column]
+    for table, date_column in SILVER_PARTITIONS.items()
+}
+
+# Secondary indexes: the surrogate keys gold joins and groups on, plus the
+# successful-payments filter and the per-year enrollment rollups.
+# No foreign-key constraints: tables load in parallel, so a fact row may land before its dimension.
+SILVER_INDEXES = {
+    "students": [["student_key"]],
+    "instructors": [["instructor_key"]],
+    "courses": [["course_key"], ["instructor_key"]],
+    "enrollments": [["student_key"], ["course_key"], ["enrollment_date"]],
+    "activity": [["student_key"], ["course_key"]],
+    "payments": [["student_key"], ["course_key"], ["status", "course_key"]]
+}
+
+# Text-ID indexes replaced by the surrogate-key ones above, dropped where they still exist
+RETIRED_SILVER_INDEXES = {
+    "courses": [["instructor_id"]],
+    "enrollments": [["student_id"], ["course_id"]],
+    "activity": [["student_id"], ["course_id"]],
+    "payments": [["student_id"], ["course_id"], ["status", "course_id"]]
+}
+
+
+def index_name(table, columns):
+    return f"{table}_{'_'.join(columns)}_idx"
+
+
+def table_columns(conn, table):
+    return conn.execute(text("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = 'silver' AND table_name = :table ORDER BY ordinal_position
+    """), {"table": table}).scalars().all()
+
+
+def stored_frame(df, table_name):
+    """df without the columns silver.<table_name> doesn't store (SILVER_DROPPED_COLUMNS)."""
+    return df.drop(columns=SILVER_DROPPED_COLUMNS.get(table_name, []), errors="ignore")
+
+
+def ensure_silver_tables(engine):
+    """Create the silver tables and migrate existing ones in one transaction: added columns are
+    created, their surrogate keys filled in from the IDs, then the dropped ID columns removed,
+    so a failed migration leaves every table as it was and the next run starts it over."""
+    with engine.begin() as conn:
+        conn.execute(text("CREATE SCHEMA IF NOT EXISTS silver"))
+        for ddl in SILVER_DDL.values():
+            conn.execute(text(ddl))
+        added, backfill, dropped = {}, {}, []
+        for table in SILVER_ADDED_COLUMNS.keys() | SILVER_DROPPED_COLUMNS.keys():
+            existing = set(table_columns(conn, table))
+            for column, column_type in SILVER_ADDED_COLUMNS.get(table, {}).items():
+                if column not in existing:
+                    conn.execute(text(f"ALTER TABLE silver.{table} ADD COLUMN {column} {column_type}"))
+                    added.setdefault(table, []).append(column)
+            # Keys of new key columns, and of every ID column about to be dropped
+            backfill[table] = [
+                id_column for id_column in SURROGATE_KEYS if id_column in existing and (
+                    SURROGATE_KEYS[id_column][1] in added.get(table, [])
+                    or id_column in SILVER_DROPPED_COLUMNS.get(table, [])
+                )
+            ]
+        for table, id_columns in backfill.items():
+            for id_column in id_columns:
+                backfill_keys(conn, table, id_column)
+            existing = set(table_columns(conn, table))
+            for column in SILVER_DROPPED_COLUMNS.get(table, []):
+                if column in existing:
+                    conn.execute(text(f"ALTER TABLE silver.{table} DROP COLUMN {column}"))
+                    dropped.append(table)
+        legacy = [table for table in SILVER_PARTITIONS if not is_partitioned(conn, table)]
+    # A dropped column stays in the stored rows until they are rewritten (partitioning a
+    # legacy table rewrites it anyway); that rewrite locks the table, so it is left to --rewrite
+    for table in sorted(set(dropped) - set(legacy)):
+        print(f"⚠️ silver.{table}: ID columns dropped; run `python silver/schema.py --rewrite` "
+              f"to reclaim their space (locks the table while it runs)")
+    for table in legacy:
+        partition_existing(engine, table)
+    if added:
+        create_silver_indexes(engine, list(added))
+
+
+def rewrite_tables(engine, tables=None):
+    """Rewrite silver tables (default: those that lost columns) with VACUUM FULL, so dropped
+    columns stop taking space in the stored rows. Each table is held under an ACCESS EXCLUSIVE
+    lock while it is copied, blocking loads and gold reads alike, and needs free disk for a
+    full copy, so run it in a maintenance window."""
+    tables = tables or list(SILVER_DROPPED_COLUMNS)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for table in tables:
+            with track("vacuum", f"silver.{table}"):
+                conn.execute(text(f"VACUUM FULL silver.{table}"))
+            print(f"✅ silver.{table}: rewritten")
+
+
+def partition_existing(engine, table):
+    """Move a fact table created before partitioning into a partitioned copy of itself,
+    in one transaction. Rows without a partition date can't be stored any more and are
+    quarantined in that same transaction, so a failed quarantine leaves the table as it was."""
+    from silver.validation import quarantine
+
+    column = SILVER_PARTITIONS[table]
+    keys = ", ".join(f'"{key}"' for key in SILVER_PRIMARY_KEYS[table])
+    with track("partitions", f"silver.{table}.migrate") as event:
+        with engine.begin() as conn:
+            undated = pd.read_sql(text(f'SELECT * FROM silver.{table} WHERE "{column}" IS NULL'), conn)
+            months = conn.execute(text(f"""
+                SELECT DISTINCT date_trunc('month', "{column}")::date FROM silver.{table}
+                WHERE "{column}" IS NOT NULL
+            """)).scalars().all()
+
+            conn.execute(text(f"ALTER TABLE silver.{table} RENAME TO {table}_unpartitioned"))
+            conn.execute(text(f"ALTER TABLE silver.{table}_unpartitioned DROP CONSTRAINT IF EXISTS {table}_pkey"))
+            conn.execute(text(SILVER_DDL[table]))
+            create_partitions(conn, table, {pd.Period(month, freq="M") for month in months})
+
+            columns = ", ".join(f'"{name}"' for name in table_columns(conn, table))
+            event["rows_out"] = conn.execute(text(f"""
+                INSERT INTO silver.{table} ({columns})
+                SELECT {columns} FROM silver.{table}_unpartitioned
+                WHERE "{column}" IS NOT NULL
+                ON CONFLICT ({keys}) DO NOTHING
+            """)).rowcount
+            # Only the source columns, like every other quarantined row
+            undated = with_ids(conn, undated).drop(columns=list(SILVER_ADDED_COLUMNS.get(table, {})),
+                                                   errors="ignore")
+            quarantine(conn, table, undated.assign(reason=f"{column}:missing"))
+            conn.execute(text(f"DROP TABLE silver.{table}_unpartitioned"))
+    create_silver_indexes(engine, [table])
+    print(f"✅ silver.{table}: partitioned by month ({event['rows_out']} rows, {len(months)} partition(s), "
+          f"{len(undated)} undated row(s) quarantined)")
+
+
+def ensure_primary_keys(engine):
+    """Add the primary key to silver tables that were created without one."""
+    with engine.begin() as conn:
+        for table, columns in SILVER_PRIMARY_KEYS.items():
+            has_key = conn.execute(text("""
+                SELECT 1 FROM pg_constraint
+                WHERE conrelid = to_regclass(:table) AND contype = 'p'
+            """), {"table": f"silver.{table}"}).scalar()
+            if not has_key:
+                keys = ", ".join(f'"{column}"' for column in columns)
+                conn.execute(text(f"ALTER TABLE silver.{table} ADD PRIMARY KEY ({keys})"))
+                print(f"✅ silver.{table}: primary key added")
+
+
+def drop_silver_indexes(engine):
+    """Drop the secondary indexes before a bulk load; primary keys stay for ON CONFLICT."""
+    with track("indexes", "silver.drop") as event, engine.begin() as conn:
+        for table, indexes in SILVER_INDEXES.items():
+            for columns in indexes:
+                conn.execute(text(f"DROP INDEX IF EXISTS silver.{index_name(table, columns)}"))
+                event["statements"] += 1
+
+
+def create_silver_indexes(engine, tables=None):
+    """Create any missing secondary index, then ANALYZE so the planner sees the new data and indexes.
+    With `tables`, only those silver tables are indexed and analyzed."""
+    tables = list(SILVER_DDL) if tables is None else list(tables)
+    with track("indexes", "silver.create", tables=tables) as event, engine.begin() as conn:
+        for table in tables:
+            for columns in RETIRED_SILVER_INDEXES.get(table, []):
+                conn.execute(text(f"DROP INDEX IF EXISTS silver.{index_name(table, columns)}"))
+                event["statements"] += 1
+            for columns in SILVER_INDEXES.get(table, []):
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS {index_name(table, columns)} ON silver.{table} ({', '.join(columns)})"
+                ))
+                event["statements"] += 1
+        for table in tables:
+            conn.execute(text(f"ANALYZE silver.{table}"))
+            event["statements"] += 1
+    print(f"✅ Silver indexes ready and statistics refreshed in {event['duration_s']:.2f}s")
+
+
+def compare_gold_build(engine, backend="tables"):
+    """Time a full gold build without and then with the secondary indexes."""
+    from gold.etl import build_gold
+
+    timings = {}
+    for label, prepare in (("without indexes", drop_silver_indexes), ("with indexes", create_silver_indexes)):
+        prepare(engine)
+        with engine.begin() as conn:
+            for table in SILVER_DDL:
+                conn.execute(text(f"ANALYZE silver.{table}"))
+        start = time.perf_counter()
+        build_gold(backend=backend)
+        timings[label] = time.perf_counter() - start
+
+    before, after = timings["without indexes"], timings["with indexes"]
+    change = (after - before) / before * 100 if before else 0
+    print(f"⏱️ gold build without indexes {before:.2f}s, with indexes {after:.2f}s ({change:+.1f}%)")
+    return timings
+
+
+if __name__ == "__main__":
+    from db import get_engine
+
+    parser = argparse.ArgumentParser(description="Create the silver tables, keys and indexes")
+    parser.add_argument("--compare-gold", action="store_true",
+                        help="time a full gold build without and with the secondary indexes")
+    parser.add_argument("--gold-backend", choices=["tables", "matviews"], default="tables",
+                        help="gold backend used by --compare-gold")
+    parser.add_argument("--rewrite", action="store_true",
+                        help="VACUUM FULL the tables that lost columns (locks each table while it runs)")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    ensure_silver_tables(engine)
+    ensure_primary_keys(engine)
+    if args.rewrite:
+        rewrite_tables(engine)
+    if args.compare_gold:
+        compare_gold_build(engine, backend=args.gold_backend)
+    else:
+        create_silver_indexes(engine)
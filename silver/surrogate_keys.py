@@ -0,0 +1,184 @@
+import argparse
+import io
+import os
+import sys
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from run_metrics import track
+
+# ---------------------------
+# Integer surrogate keys for the dimension IDs
+# ---------------------------
+# Each student, course and instructor ID (S034231, C044256, ...) gets a compact INTEGER key
+# the first time any silver table sees it: a fact row may arrive before its dimension row.
+# The mapping is stored in silver.<dimension>_keys. Every process mirrors it as sorted NumPy
+# arrays, so a batch is mapped with one searchsorted per column over its distinct IDs, and
+# only IDs the cache hasn't seen go to the database.
+# ID column -> (key map table, key column)
+SURROGATE_KEYS = {
+    "student_id": ("student_keys", "student_key"),
+    "course_id": ("course_keys", "course_key"),
+    "instructor_id": ("instructor_keys", "instructor_key")
+}
+
+KEY_COLUMNS = {key: (table, column) for column, (table, key) in SURROGATE_KEYS.items()}
+
+
+class KeyCache:
+    """In-process copy of the key maps: per ID column, the IDs in sorted order and their keys."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.arrays = {}
+        self.lock = Lock()
+
+    def load(self, column):
+        table, key = SURROGATE_KEYS[column]
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(f"SELECT {column}, {key} FROM silver.{table}")).all()
+        self.merge(column, [row[0] for row in rows], [row[1] for row in rows])
+
+    def merge(self, column, ids, keys):
+        known_ids, known_keys = self.arrays.get(column, (np.array([], dtype=str), np.array([], dtype="int32")))
+        ids = np.concatenate([known_ids, np.array(ids, dtype=str)])
+        keys = np.concatenate([known_keys, np.array(keys, dtype="int32")])
+        # NumPy's order, not the database collation's, since lookups use searchsorted
+        order = np.argsort(ids, kind="stable")
+        self.arrays[column] = (ids[order], keys[order])
+
+    def lookup(self, column, ids):
+        """(keys, found) for an array of distinct IDs."""
+        known_ids, known_keys = self.arrays[column]
+        if not len(known_ids):
+            return np.zeros(len(ids), dtype="int32"), np.zeros(len(ids), dtype=bool)
+        position = np.searchsorted(known_ids, ids).clip(max=len(known_ids) - 1)
+        return known_keys[position], known_ids[position] == ids
+
+    def keys_for(self, column, values):
+        """Integer keys (nullable Int32) for a Series of IDs; unseen IDs are assigned keys first."""
+        codes, ids = pd.factorize(values)
+        if not len(ids):
+            return pd.array([pd.NA] * len(codes), dtype="Int32")
+        ids = np.asarray(ids, dtype=str)
+        with self.lock:
+            if column not in self.arrays:
+                self.load(column)
+            keys, found = self.lookup(column, ids)
+            if not found.all():
+                self.merge(column, *assign_keys(self.engine, column, ids[~found]))
+                keys, found = self.lookup(column, ids)
+        result = pd.array(keys[codes], dtype="Int32")
+        result[codes < 0] = pd.NA
+        return result
+
+
+_cache = None
+_cache_lock = Lock()
+
+
+def key_cache(engine):
+    """The process-wide KeyCache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None or _cache.engine is not engine:
+            _cache = KeyCache(engine)
+        return _cache
+
+
+def clear_key_cache():
+    global _cache
+    with _cache_lock:
+        _cache = None
+
+
+def assign_keys(engine, column, ids):
+    """Give each ID in `ids` a key (IDs another process just mapped keep theirs);
+    returns (ids, keys) as stored."""
+    table, key = SURROGATE_KEYS[column]
+    with track("surrogate_keys", f"silver.{table}", rows_in=len(ids)) as event:
+        raw_conn = engine.raw_connection()
+        cur = raw_conn.cursor()
+        try:
+            cur.execute(f"CREATE TEMP TABLE stage_{table} ({column} TEXT) ON COMMIT DROP")
+            buffer = io.StringIO("".join(f"{value}\n" for value in ids))
+            cur.copy_expert(f"COPY stage_{table} FROM STDIN", buffer)
+            # Sorted, so concurrent loads take the unique-index locks in the same order
+            cur.execute(f"""
+                INSERT INTO silver.{table} ({column})
+                SELECT {column} FROM stage_{table} ORDER BY {column}
+                ON CONFLICT ({column}) DO NOTHING
+            """)
+            event["rows_out"] = cur.rowcount
+            cur.execute(f"SELECT m.{column}, m.{key} FROM silver.{table} m JOIN stage_{table} s USING ({column})")
+            rows = cur.fetchall()
+            raw_conn.commit()
+        except Exception:
+            raw_conn.rollback()
+            raise
+        finally:
+            cur.close()
+            raw_conn.close()
+        event["statements"] = 4
+    return [row[0] for row in rows], [row[1] for row in rows]
+
+
+def add_surrogate_keys(engine, df):
+    """df with a key column next to each dimension ID column it has (student_id -> student_key, ...)."""
+    cache = key_cache(engine)
+    return df.assign(**{
+        key: cache.keys_for(column, df[column])
+        for column, (_, key) in SURROGATE_KEYS.items() if column in df.columns
+    })
+
+
+def with_ids(conn, df):
+    """df with the ID column of each key column it has (student_key -> student_id, ...), mapped
+    back through silver.<dimension>_keys, e.g. for fact rows read back from silver."""
+    for key, (table, column) in KEY_COLUMNS.items():
+        if key in df.columns and column not in df.columns:
+            keys = [int(value) for value in df[key].dropna().unique()]
+            ids = dict(conn.execute(text(f"SELECT {key}, {column} FROM silver.{table} WHERE {key} = ANY(:keys)"),
+                                    {"keys": keys}).all())
+            df = df.assign(**{column: df[key].map(ids)})
+    return df
+
+
+def backfill_keys(conn, table_name, column):
+    """Set the key of `column` on the stored rows of silver.<table_name> that have none, in SQL,
+    e.g. after the key column was added to an existing table; returns the rows updated."""
+    table, key = SURROGATE_KEYS[column]
+    with track("surrogate_keys", f"silver.{table_name}.{key}") as event:
+        conn.execute(text(f"""
+            INSERT INTO silver.{table} ({column})
+            SELECT DISTINCT {column} FROM silver.{table_name}
+            WHERE {column} IS NOT NULL ORDER BY {column}
+            ON CONFLICT ({column}) DO NOTHING
+        """))
+        event["rows_out"] = conn.execute(text(f"""
+            UPDATE silver.{table_name} t SET {key} = m.{key}
+            FROM silver.{table} m
+            WHERE m.{column} = t.{column} AND t.{key} IS NULL
+        """)).rowcount
+        event["statements"] = 2
+    print(f"✅ silver.{table_name}: {key} set on {event['rows_out']} row(s)")
+    return event["rows_out"]
+
+
+if __name__ == "__main__":
+    from db import get_engine
+    from silver.schema import ensure_silver_tables
+
+    parser = argparse.ArgumentParser(description="Create the surrogate key maps and report their sizes")
+    parser.parse_args()
+
+    engine = get_engine()
+    ensure_silver_tables(engine)
+    with engine.connect() as conn:
+        for column, (table, key) in SURROGATE_KEYS.items():
+            count, largest = conn.execute(text(f"SELECT COUNT(*), MAX({key}) FROM silver.{table}")).one()
+            print(f"silver.{table}: {count} {column}(s), largest {key} {largest}")
@@ -0,0 +1,181 @@
+import os
+from threading import RLock
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from run_metrics import run_id
+from silver.cleaning import SILVER_SPECS, load_raw
+from silver.partitions import SILVER_PARTITIONS
+
+# ---------------------------
+# Vectorized validation rules for the silver tables
+# ---------------------------
+# required:   columns that must be present (keys, foreign keys, partition dates)
+# numeric:    columns that must parse as numbers
+# ranges:     inclusive (low, high) bounds, None for open-ended; missing values pass (they get filled)
+# enums:      allowed values
+# references: column -> silver table whose key it must exist in
+# Dates come from SILVER_SPECS: a value that isn't YYYY-MM-DD is rejected instead of becoming NULL.
+
+# Valid dimension keys per (CSV folder, table), for the current run only (see dimension_keys);
+# reentrant, since validating courses needs the instructor keys
+_key_cache = {}
+_key_cache_lock = RLock()
+
+CURRENCIES = ["USD", "EUR", "GBP", "INR", "JPY", "CNY", "CAD", "AUD", "CHF", "SGD", "BRL", "ZAR", "AED", "MXN"]
+
+SILVER_RULES = {
+    "students": {
+        "required": ["student_id"],
+        "numeric": ["age"],
+        "ranges": {"age": (0, 120)},
+        "enums": {},
+        "references": {}
+    },
+    "instructors": {
+        "required": ["instructor_id"],
+        "numeric": ["rating"],
+        "ranges": {"rating": (0, 5)},
+        "enums": {},
+        "references": {}
+    },
+    "courses": {
+        "required": ["course_id"],
+        "numeric": ["duration_hours", "price"],
+        "ranges": {"duration_hours": (0, None), "price": (0, None)},
+        "enums": {},
+        "references": {"instructor_id": "instructors"}
+    },
+    "enrollments": {
+        "required": ["enrollment_id", "student_id", "course_id", "enrollment_date"],
+        "numeric": ["progress_percent"],
+        "ranges": {"progress_percent": (0, 100)},
+        "enums": {},
+        "references": {"student_id": "students", "course_id": "courses"}
+    },
+    "activity": {
+        "required": ["activity_id", "student_id", "course_id", "timestamp"],
+        "numeric": ["video_watched_min", "quiz_score", "assignment_score"],
+        "ranges": {"video_watched_min": (0, None), "quiz_score": (0, 100), "assignment_score": (0, 100)},
+        "enums": {},
+        "references": {"student_id": "students", "course_id": "courses"}
+    },
+    "payments": {
+        "required": ["payment_id", "student_id", "course_id", "payment_date"],
+        "numeric": ["amount"],
+        "ranges": {"amount": (0, None)},
+        "enums": {"currency": CURRENCIES},
+        "references": {"student_id": "students", "course_id": "courses"}
+    }
+}
+
+
+def validate_frame(df, table_name, key_sets=None, detached_before=None):
+    """Split a raw frame into (valid rows, rejected rows with a `reason`).
+
+    Every rule is one vectorized mask over the whole frame. Reasons read "<column>:<code>",
+    joined with ";" when a row breaks several rules. Numeric columns of the valid rows
+    come back already converted. key_sets maps a table name to its known keys; references
+    to tables missing from key_sets are not checked. detached_before (YYYY-MM-DD, see
+    silver/partitions.py) rejects fact rows dated before it: their month was detached.
+    """
+    rules = SILVER_RULES[table_name]
+    key_sets = key_sets or {}
+    failures = {}
+    converted = {}
+
+    for column in rules["required"]:
+        if column in df.columns:
+            failures[f"{column}:missing"] = df[column].isna()
+
+    for column in rules["numeric"]:
+        if column in df.columns:
+            converted[column] = pd.to_numeric(df[column], errors="coerce")
+            failures[f"{column}:not_numeric"] = df[column].notna() & converted[column].isna()
+
+    for column, (low, high) in rules["ranges"].items():
+        if column in converted:
+            values = converted[column]
+            out = pd.Series(False, index=df.index)
+            if low is not None:
+                out |= values < low
+            if high is not None:
+                out |= values > high
+            failures[f"{column}:out_of_range"] = out
+
+    for column, allowed in rules["enums"].items():
+        if column in df.columns:
+            failures[f"{column}:unknown_value"] = df[column].notna() & ~df[column].isin(allowed)
+
+    for column, table in rules["references"].items():
+        if column in df.columns and table in key_sets:
+            failures[f"{column}:unknown_{table}"] = df[column].notna() & ~df[column].isin(key_sets[table])
+
+    for column in SILVER_SPECS[table_name]["dates"]:
+        if column in df.columns:
+            parsed = pd.to_datetime(df[column], format="%Y-%m-%d", errors="coerce")
+            failures[f"{column}:bad_date"] = df[column].notna() & parsed.isna()
+            if detached_before is not None and column == SILVER_PARTITIONS.get(table_name):
+                failures[f"{column}:detached"] = parsed < pd.Timestamp(detached_before)
+
+    bad = np.zeros(len(df), dtype=bool)
+    for mask in failures.values():
+        bad |= mask.to_numpy()
+
+    valid = df[~bad].assign(**{column: values[~bad] for column, values in converted.items()})
+    rejects = df[bad]
+    if bad.any():
+        # Reasons are only spelled out for the (few) rejected rows
+        codes = pd.DataFrame({code: np.where(mask.to_numpy()[bad], code, None) for code, mask in failures.items()},
+                             index=rejects.index)
+        rejects = rejects.assign(reason=codes.apply(lambda row: ";".join(row.dropna()), axis=1))
+    else:
+        rejects = rejects.assign(reason=pd.Series(dtype=object))
+    return valid, rejects
+
+
+def dimension_keys(engine, csv_folder, table):
+    """Keys a reference to silver.<table> may point at: what silver already holds plus the
+    rows of this run's <table> file that pass validation themselves (tables load in
+    parallel, so a fact may be validated before its dimension is loaded; a quarantined
+    dimension row is no valid reference). Read once per run and CSV folder."""
+    cache_key = (os.path.abspath(csv_folder), table)
+    with _key_cache_lock:
+        if _key_cache.get("run_id") != run_id():
+            _key_cache.clear()
+            _key_cache["run_id"] = run_id()
+        if cache_key not in _key_cache:
+            spec = SILVER_SPECS[table]
+            key = spec["key"][0]
+            with engine.connect() as conn:
+                stored = pd.read_sql(text(f"SELECT {key} FROM silver.{table}"), conn)[key]
+            path = os.path.join(csv_folder, spec["source"])
+            incoming = pd.Series(dtype=object)
+            if os.path.exists(path):
+                # The dimension's own references (courses -> instructors) come from the cache too
+                valid, _ = validate_frame(load_raw(path, spec), table, reference_keys(engine, csv_folder, table))
+                incoming = valid[key]
+            _key_cache[cache_key] = pd.Index(pd.concat([stored.astype(str), incoming.dropna().astype(str)]).unique())
+        return _key_cache[cache_key]
+
+
+def reference_keys(engine, csv_folder, table_name):
+    """{referenced table: its valid keys} for validate_frame, see dimension_keys."""
+    return {table: dimension_keys(engine, csv_folder, table)
+            for table in set(SILVER_RULES[table_name]["references"].values())}
+
+
+def quarantine(engine, table_name, rejects, schema="silver"):
+    """Append rejected rows to <schema>.<table>_rejects, every source column as text.
+    `engine` may also be a connection, to quarantine inside its transaction."""
+    if rejects.empty:
+        return 0
+    out = rejects.astype("string")
+    out = out.astype(object).where(out.notna(), None).assign(
+        run_id=run_id(), rejected_at=pd.Timestamp.now(tz="UTC")
+    )
+    out.to_sql(f"{table_name}_rejects", engine, schema=schema, if_exists="append", index=False)
+    print(f"⚠️ {table_name}: {len(out)} row(s) quarantined in {schema}.{table_name}_rejects")
+    return len(out)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules import each other from the repository root (from silver.cleaning import ...)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+from gold.frames import compare_frames
+
+
+def frame(**columns):
+    return pd.DataFrame(columns)
+
+
+def test_row_order_does_not_matter():
+    expected = frame(course_id=["C1", "C2"], revenue=[1.5, 2.0])
+    actual = frame(course_id=["C2", "C1"], revenue=[2.0, 1.5])
+    assert compare_frames(expected, actual, ["course_id"]) is None
+
+
+def test_numbers_match_within_tolerance_and_nulls_match():
+    expected = frame(course_id=["C1", "C2"], revenue=["10.10", None])
+    actual = frame(course_id=["C1", "C2"], revenue=[10.1 + 1e-12, np.nan])
+    assert compare_frames(expected, actual, ["course_id"]) is None
+
+
+def test_differences_are_reported():
+    expected = frame(course_id=["C1", "C2"], title=["A", "B"], revenue=[1.0, 2.0])
+    assert compare_frames(expected, expected[["course_id", "revenue"]], ["course_id"]).startswith("columns differ")
+    assert compare_frames(expected, expected.head(1), ["course_id"]) == "row count differs: 2 vs 1"
+    assert compare_frames(expected, expected.assign(revenue=[1.0, 2.1]), ["course_id"]) == "revenue differs in 1 row(s)"
+    assert compare_frames(expected, expected.assign(title=["A", "X"]), ["course_id"]) == "title differs in 1 row(s)"
@@ -0,0 +1,37 @@
+import numpy as np
+
+from silver.fx import MAX_RATE_AGE_DAYS, usd_amounts
+
+RATES = {"EUR": (np.array(["2024-01-01", "2024-01-10"], dtype="datetime64[D]"), np.array([1.1, 1.2]))}
+
+
+def days(*values):
+    return np.array(values, dtype="datetime64[D]")
+
+
+def test_base_currency_is_kept_and_rounded():
+    assert usd_amounts([10.004, 2.5], ["USD", "USD"], days("2024-01-01", "2024-01-02"), {}).tolist() == [10.0, 2.5]
+
+
+def test_latest_rate_on_or_before_the_day_is_used():
+    usd = usd_amounts([10, 10, 10], ["EUR"] * 3, days("2024-01-01", "2024-01-08", "2024-01-10"), RATES)
+    assert usd.tolist() == [11.0, 11.0, 12.0]
+
+
+def test_rates_older_than_the_lookback_are_not_used():
+    last = np.datetime64("2024-01-10") + np.timedelta64(MAX_RATE_AGE_DAYS, "D")
+    usd = usd_amounts([10, 10], ["EUR", "EUR"], np.array([last, last + 1]), RATES)
+    assert usd[0] == 12.0
+    assert np.isnan(usd[1])
+
+
+def test_no_rate_gives_nan():
+    usd = usd_amounts([10, 10], ["EUR", "GBP"], days("2023-12-31", "2024-01-05"), RATES)
+    assert np.isnan(usd).all()
+
+
+def test_half_cents_round_away_from_zero_like_sql():
+    # 2.675 and 10.01 * 0.5 = 5.005 are just below the tie as floats; ROUND(numeric, 2) gives .68 and .01
+    rates = {"EUR": (days("2024-01-01"), np.array([0.5]))}
+    usd = usd_amounts([2.675, 10.01, 0.125], ["USD", "EUR", "EUR"], days("2024-01-01", "2024-01-01", "2024-01-01"), rates)
+    assert usd.tolist() == [2.68, 5.01, 0.07]
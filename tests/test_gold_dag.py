@@ -0,0 +1,38 @@
+import pytest
+
+from gold.gold_dag import GoldTable, check_dag, stale_tables, subset
+
+
+def table(name, *depends_on):
+    return GoldTable(name, f"SELECT '{name}'", list(depends_on))
+
+
+def test_check_dag_orders_dependencies_first():
+    order = check_dag([table("dashboard", "payments", "activity"), table("payments"), table("activity", "payments")])
+    assert set(order) == {"dashboard", "payments", "activity"}
+    assert order.index("payments") < order.index("activity") < order.index("dashboard")
+
+
+def test_check_dag_rejects_undeclared_dependencies():
+    with pytest.raises(ValueError, match="undeclared"):
+        check_dag([table("dashboard", "payments")])
+
+
+def test_check_dag_rejects_cycles():
+    with pytest.raises(ValueError, match="cycle"):
+        check_dag([table("a", "b"), table("b", "a"), table("c")])
+
+
+TABLES = [table("payments"), table("activity"), table("dashboard", "payments", "activity"), table("ages")]
+INPUTS = {"payments": ["payments"], "activity": ["activity"], "dashboard": ["students"], "ages": ["students"]}
+
+
+def test_stale_tables_follow_changed_inputs_downstream():
+    assert stale_tables(TABLES, INPUTS, ["payments"]) == {"payments", "dashboard"}
+    assert stale_tables(TABLES, INPUTS, ["students"]) == {"dashboard", "ages"}
+    assert stale_tables(TABLES, INPUTS, []) == set()
+
+
+def test_subset_drops_dependencies_outside_it():
+    tables = subset(TABLES, {"activity", "dashboard"})
+    assert [(t.name, t.depends_on) for t in tables] == [("activity", []), ("dashboard", ["activity"])]
@@ -0,0 +1,47 @@
+import load_cache
+from load_cache import content_hash, file_signature, changed_files
+
+
+def write(path, content):
+    path.write_text(content)
+    return str(path)
+
+
+def test_file_signature_hashes_the_content(tmp_path):
+    path = write(tmp_path / "a.csv", "id\n1\n")
+    signature = file_signature(path)
+    assert signature["size"] == 5 and signature["content_hash"] == content_hash(path)
+
+
+def test_file_signature_trusts_the_previous_hash_only_for_the_same_size_and_mtime(tmp_path):
+    path = write(tmp_path / "a.csv", "id\n1\n")
+    previous = dict(file_signature(path), content_hash="stored")
+    assert file_signature(path, previous)["content_hash"] == "stored"
+    previous["mtime"] -= 1
+    assert file_signature(path, previous)["content_hash"] == content_hash(path)
+
+
+def test_changed_files_skips_files_whose_content_is_unchanged(tmp_path, monkeypatch):
+    same = write(tmp_path / "same.csv", "id\n1\n")
+    edited = write(tmp_path / "edited.csv", "id\n1\n")
+    touched = write(tmp_path / "touched.csv", "id\n1\n")
+    new = write(tmp_path / "new.csv", "id\n1\n")
+    stored = {name: file_signature(path) for name, path in (("same", same), ("edited", edited), ("touched", touched))}
+    stored["touched"]["mtime"] -= 1
+    write(tmp_path / "edited.csv", "id\n2\n")
+    recorded = []
+    monkeypatch.setattr(load_cache, "cached_signatures", lambda engine, layer: stored)
+    monkeypatch.setattr(load_cache, "record_load", lambda engine, layer, table, signature: recorded.append(table))
+
+    changed, unchanged = changed_files(None, "bronze", {"same": same, "edited": edited, "touched": touched, "new": new})
+    assert sorted(changed) == ["edited", "new"]
+    assert sorted(unchanged) == ["same", "touched"]
+    # Touched but identical: the new mtime is stored so the next run needn't hash it again
+    assert recorded == ["touched"]
+
+
+def test_changed_files_with_force_loads_everything(tmp_path, monkeypatch):
+    path = write(tmp_path / "a.csv", "id\n1\n")
+    monkeypatch.setattr(load_cache, "cached_signatures", lambda engine, layer: {"a": file_signature(path)})
+    changed, unchanged = changed_files(None, "bronze", {"a": path}, force=True)
+    assert list(changed) == ["a"] and unchanged == []
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+import silver.surrogate_keys as surrogate_keys
+from silver.surrogate_keys import KeyCache
+
+
+def cache(ids, keys):
+    result = KeyCache(engine=None)
+    result.merge("student_id", ids, keys)
+    return result
+
+
+def test_lookup_finds_known_ids_in_any_order():
+    keys, found = cache(["S3", "S1", "S2"], [3, 1, 2]).lookup("student_id", np.array(["S2", "S3", "S1"]))
+    assert found.all()
+    assert keys.tolist() == [2, 3, 1]
+
+
+def test_lookup_misses_unknown_ids_before_between_and_after_the_known_ones():
+    keys, found = cache(["S2", "S4"], [2, 4]).lookup("student_id", np.array(["S1", "S3", "S4", "S5"]))
+    assert found.tolist() == [False, False, True, False]
+    assert keys[2] == 4
+
+
+def test_lookup_on_an_empty_map_finds_nothing():
+    keys, found = cache([], []).lookup("student_id", np.array(["S1"]))
+    assert not found.any()
+
+
+def test_keys_for_assigns_only_unseen_ids(monkeypatch):
+    assigned = []
+
+    def assign_keys(engine, column, ids):
+        assigned.extend(ids)
+        return list(ids), [10 + i for i in range(len(ids))]
+
+    monkeypatch.setattr(surrogate_keys, "assign_keys", assign_keys)
+    key_cache = cache(["S1"], [1])
+    keys = key_cache.keys_for("student_id", pd.Series(["S1", "S7", None, "S7"]))
+    assert assigned == ["S7"]
+    assert keys.tolist() == [1, 10, pd.NA, 10]
+    # The new key is cached: a second batch needs no assignment
+    assert key_cache.keys_for("student_id", pd.Series(["S7"])).tolist() == [10]
+    assert assigned == ["S7"]
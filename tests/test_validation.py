@@ -0,0 +1,76 @@
+import pandas as pd
+
+from silver.validation import validate_frame
+
+KEY_SETS = {"students": pd.Index(["S1", "S2"]), "courses": pd.Index(["C1"])}
+
+
+def payments(**columns):
+    row = {"payment_id": "P1", "student_id": "S1", "course_id": "C1", "amount": "10.5",
+           "currency": "USD", "payment_date": "2024-01-19", "status": "Success"}
+    count = max(len(values) for values in columns.values()) if columns else 1
+    return pd.DataFrame({column: columns.get(column, [value] * count) for column, value in row.items()})
+
+
+def reasons(rejects):
+    return dict(zip(rejects["payment_id"], rejects["reason"]))
+
+
+def test_valid_rows_pass_with_numeric_columns_converted():
+    valid, rejects = validate_frame(payments(), "payments", KEY_SETS)
+    assert len(valid) == 1 and rejects.empty
+    assert valid["amount"].tolist() == [10.5]
+    assert "reason" in rejects.columns
+
+
+def test_reason_codes():
+    df = payments(payment_id=["P1", "P2", "P3", "P4"],
+                  amount=["abc", "-1", "5", "5"],
+                  currency=["USD", "USD", "XYZ", "USD"],
+                  payment_date=["2024-01-19", "2024-01-19", "2024-01-19", "19/01/2024"])
+    valid, rejects = validate_frame(df, "payments", KEY_SETS)
+    assert valid.empty
+    assert reasons(rejects) == {
+        "P1": "amount:not_numeric",
+        "P2": "amount:out_of_range",
+        "P3": "currency:unknown_value",
+        "P4": "payment_date:bad_date"
+    }
+
+
+def test_fact_rows_need_their_partition_date():
+    _, rejects = validate_frame(payments(payment_date=[None]), "payments", KEY_SETS)
+    assert reasons(rejects) == {"P1": "payment_date:missing"}
+
+
+def test_rows_before_the_detach_boundary_are_rejected():
+    df = payments(payment_id=["P1", "P2", "P3"], payment_date=["2024-02-29", "2024-03-01", "2024-03-02"])
+    valid, rejects = validate_frame(df, "payments", KEY_SETS, detached_before="2024-03-01")
+    assert valid["payment_id"].tolist() == ["P2", "P3"]
+    assert reasons(rejects) == {"P1": "payment_date:detached"}
+
+
+def test_several_failures_are_joined():
+    df = payments(amount=["-1"], currency=["XYZ"])
+    _, rejects = validate_frame(df, "payments", KEY_SETS)
+    assert reasons(rejects) == {"P1": "amount:out_of_range;currency:unknown_value"}
+
+
+def test_range_bounds_are_inclusive_and_missing_values_pass():
+    df = pd.DataFrame({"student_id": ["S1", "S2", "S3", "S4", "S5"], "age": ["0", "120", "121", "-1", None]})
+    valid, rejects = validate_frame(df, "students")
+    assert valid["student_id"].tolist() == ["S1", "S2", "S5"]
+    assert dict(zip(rejects["student_id"], rejects["reason"])) == {"S3": "age:out_of_range", "S4": "age:out_of_range"}
+
+
+def test_references_are_checked_against_the_key_sets():
+    df = payments(payment_id=["P1", "P2", "P3"], student_id=["S2", "S9", "S1"], course_id=["C1", "C1", "C9"])
+    valid, rejects = validate_frame(df, "payments", KEY_SETS)
+    assert valid["payment_id"].tolist() == ["P1"]
+    assert reasons(rejects) == {"P2": "student_id:unknown_students", "P3": "course_id:unknown_courses"}
+
+
+def test_references_without_key_set_are_not_checked():
+    df = payments(student_id=["S9"])
+    valid, rejects = validate_frame(df, "payments", {"courses": KEY_SETS["courses"]})
+    assert len(valid) == 1 and rejects.empty
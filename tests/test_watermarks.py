@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+from watermarks import high_water, rows_past_watermark
+
+
+def test_high_water_is_the_largest_id_as_text():
+    df = pd.DataFrame({"payment_id": ["P000002", None, "P000010", "P000001"]})
+    assert high_water(df, "payment_id") == "P000010"
+
+
+def test_high_water_of_no_ids_is_none():
+    assert high_water(pd.DataFrame({"payment_id": [None, np.nan]}), "payment_id") is None
+
+
+def test_without_a_mark_every_row_is_kept():
+    df = pd.DataFrame({"payment_id": ["P000001", "P000002"]})
+    assert rows_past_watermark(df, "payment_id", None) is df
+
+
+def test_only_rows_past_the_mark_are_kept():
+    df = pd.DataFrame({"payment_id": ["P000001", "P000002", "P000003"]})
+    assert rows_past_watermark(df, "payment_id", "P000002")["payment_id"].tolist() == ["P000003"]
+
+
+def test_rows_without_an_id_are_kept_for_validation():
+    # Not compared as the text "nan" or "<NA>", which sort on either side of the IDs
+    for values in (["P000001", None, np.nan, "P000003"], pd.array(["P000001", None, pd.NA, "P000003"], dtype="string")):
+        kept = rows_past_watermark(pd.DataFrame({"payment_id": values}), "payment_id", "P000002")
+        assert kept.index.tolist() == [1, 2, 3]
@@ -0,0 +1,64 @@
+from sqlalchemy import text
+
+# ---------------------------
+# High-water marks for incremental loads
+# ---------------------------
+STATE_SCHEMA = "meta"
+STATE_TABLE = f"{STATE_SCHEMA}.load_watermarks"
+
+# Column whose max value marks how far each table has been loaded.
+# IDs are zero-padded (S000001, A000001, P000001, ...) so they compare correctly as text.
+WATERMARK_COLUMNS = {
+    "students": "student_id",
+    "instructors": "instructor_id",
+    "courses": "course_id",
+    "enrollments": "enrollment_id",
+    "activity": "activity_id",
+    "payments": "payment_id"
+}
+
+
+def ensure_state_table(engine):
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {STATE_SCHEMA}"))
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+                layer TEXT NOT NULL,
+                table_name TEXT NOT NULL,
+                column_name TEXT NOT NULL,
+                high_water TEXT,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                PRIMARY KEY (layer, table_name)
+            )
+        """))
+
+
+def get_watermark(engine, layer, table_name):
+    with engine.connect() as conn:
+        return conn.execute(
+            text(f"SELECT high_water FROM {STATE_TABLE} WHERE layer = :layer AND table_name = :table_name"),
+            {"layer": layer, "table_name": table_name}
+        ).scalar()
+
+
+def set_watermark(engine, layer, table_name, column_name, value):
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            INSERT INTO {STATE_TABLE} (layer, table_name, column_name, high_water)
+            VALUES (:layer, :table_name, :column_name, :high_water)
+            ON CONFLICT (layer, table_name) DO UPDATE
+            SET column_name = EXCLUDED.column_name, high_water = EXCLUDED.high_water, updated_at = now()
+        """), {"layer": layer, "table_name": table_name, "column_name": column_name, "high_water": str(value)})
+
+
+def high_water(df, column):
+    values = df[column].dropna().astype(str)
+    return values.max() if not values.empty else None
+
+
+def rows_past_watermark(df, column, mark):
+    # Rows without a value can't be placed against the mark: they stay, as on a full load
+    if mark is None:
+        return df
+    values = df[column]
+    return df[values.isna() | (values.astype(str) > mark)]